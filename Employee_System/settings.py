@@ -69,11 +69,22 @@ INSTALLED_APPS = [
 ]
 AUTH_USER_MODEL = "accounts.Employee"
 ASGI_APPLICATION = 'Employee_System.asgi.application'
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# Presence broadcasts from management commands (the stale-session sweeper)
+# and from other processes only reach sockets through a shared layer, so
+# deployments set REDIS_URL; the in-memory layer is for a single local process
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [os.environ['REDIS_URL']]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
     }
-}
 #so that django will use this customer user model
 # that we made instead of default basic one
 
@@ -86,6 +97,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'history.middleware.AuditBufferMiddleware',
 
 ]
 AUTHENTICATION_BACKENDS = [
@@ -135,6 +147,9 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # On-disk test database so the concurrent clock-in tests get SQLite's
+            # normal busy-wait locking instead of in-memory shared-cache table locks
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
@@ -211,6 +226,23 @@ if 'cloudinary_storage' in INSTALLED_APPS:
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Attendance and employee history older than this many days are moved to the
+# archive tables by `manage.py archive_old_records`. Only ever raise it after
+# moving archived rows back, reads assume nothing newer is archived.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 730))
+
+# Employee history rows are buffered per request/transaction (history.audit).
+# With AUDIT_BACKGROUND_FLUSH a writer thread inserts them; at most
+# AUDIT_QUEUE_SIZE batches wait for it, and a request finding the queue full
+# for AUDIT_QUEUE_TIMEOUT seconds writes its batch itself.
+AUDIT_BACKGROUND_FLUSH = os.environ.get('AUDIT_BACKGROUND_FLUSH') == 'True'
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 100))
+AUDIT_QUEUE_TIMEOUT = float(os.environ.get('AUDIT_QUEUE_TIMEOUT', 2))
+
+# `manage.py take_employee_snapshots` (run daily) re-snapshots employees whose
+# latest snapshot is this old; "as of" lookups replay at most this much history.
+HISTORY_SNAPSHOT_INTERVAL_DAYS = int(os.environ.get('HISTORY_SNAPSHOT_INTERVAL_DAYS', 30))
 #here my settings
 # Temporarily add this to debug
 print("DEBUG:", DEBUG)
@@ -1,8 +1,17 @@
 # accounts/apps.py
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
 
     def ready(self):
-        import accounts.signals
\ No newline at end of file
+        import accounts.signals
+        post_migrate.connect(install_employee_search, sender=self)
+
+
+def install_employee_search(sender, using, **kwargs):
+    # SQLite table rebuilds drop the search triggers, so repair them after every migrate
+    from accounts.search import install_search_index
+    install_search_index(connections[using])
@@ -0,0 +1,143 @@
+"""
+Bulk onboarding of employees from CSV.
+
+Rows are validated up front, slugs for the whole file come from one prefix
+query, passwords are hashed in a process pool (hashing is CPU-bound and
+dominates the run), and employees go in with bulk_create in chunks inside
+one transaction, so a bad file inserts nothing.
+
+Model imports stay inside the functions so this module can be loaded by
+the spawned hashing workers before Django is set up.
+"""
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+IMPORT_BATCH_SIZE = 500
+
+# The admin upload hashes in the web request, one row after another, so it
+# stays small; bigger files go through manage.py import_employees and its pool
+ADMIN_IMPORT_MAX_ROWS = 50
+ADMIN_IMPORT_MAX_BYTES = 64 * 1024
+
+IMPORT_FIELDS = [
+    'email', 'first_name', 'last_name', 'position', 'department', 'salary', 'hourly_rate',
+    'weekly_hours', 'phone_number', 'emergency_contact', 'date_hired', 'address',
+    'vacation_days', 'sick_leaves',
+]
+REQUIRED_COLUMNS = ['email', 'first_name', 'last_name', 'position', 'department', 'phone_number', 'emergency_contact']
+
+
+class EmployeeImportError(ValueError):
+    """Raised with every bad row of a file; nothing is imported"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'line {line}: {message}' for line, message in errors))
+
+
+def _init_hash_worker():
+    # The pool spawns fresh interpreters, which start without configured apps
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password for each raw password, in a pool of worker processes.
+    Empty passwords become unusable ones. workers=1 hashes in this process.
+
+    Workers are spawned rather than forked, so they never inherit the
+    caller's database connections, threads or event loop.
+    """
+    passwords = [password or None for password in passwords]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_hash_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def read_employee_csv(file):
+    """Rows of an employee CSV (path, text or binary file) as (line number, dict) pairs"""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, newline='', encoding='utf-8-sig') as handle:
+            return read_employee_csv(handle)
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+    reader = csv.DictReader(file)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise EmployeeImportError([(1, f'missing column(s) {", ".join(missing)}')])
+    return [(line, row) for line, row in enumerate(reader, start=2)]
+
+
+def build_employees(rows):
+    """
+    Unsaved, validated Employee instances for (line, row) pairs plus their raw
+    passwords. Email clashes, inside the file or with existing employees, are
+    found with one query.
+    """
+    from .models import Employee
+
+    employees, passwords, errors = [], [], []
+    seen = {}
+    for line, row in rows:
+        values = {
+            field: row[field].strip() for field in IMPORT_FIELDS
+            if (row.get(field) or '').strip()
+        }
+        if 'email' in values:
+            values['email'] = Employee.objects.normalize_email(values['email'])
+        employee = Employee(**values)
+        try:
+            employee.full_clean(exclude=['password', 'slug'], validate_unique=False)
+        except ValidationError as e:
+            errors.append((line, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in e.message_dict.items())))
+            continue
+        employee.derive_pay_rates()
+
+        if employee.email in seen:
+            errors.append((line, f'email {employee.email} already on line {seen[employee.email]}'))
+            continue
+        seen[employee.email] = line
+        employees.append(employee)
+        passwords.append((row.get('password') or '').strip())
+
+    existing = Employee.objects.filter(email__in=list(seen)).values_list('email', flat=True)
+    errors.extend((seen[email], f'email {email} already exists') for email in existing)
+    if errors:
+        raise EmployeeImportError(sorted(errors))
+    return employees, passwords
+
+
+def import_employees(rows, batch_size=IMPORT_BATCH_SIZE, workers=None):
+    """
+    Create employees for (line, row) pairs from read_employee_csv.
+
+    Raises EmployeeImportError listing every bad row before anything is
+    written. Returns the created employees.
+    """
+    from .models import Employee, allocate_slugs
+
+    employees, passwords = build_employees(rows)
+    if not employees:
+        return []
+
+    slugs = allocate_slugs([(employee.first_name, employee.last_name) for employee in employees])
+    hashes = hash_passwords(passwords, workers)
+    for employee, slug, password in zip(employees, slugs, hashes):
+        employee.slug = slug
+        employee.password = password
+
+    with transaction.atomic():
+        return Employee.objects.bulk_create(employees, batch_size=batch_size)
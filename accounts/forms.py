@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth import get_user_model, authenticate
 from django_otp.plugins.otp_totp.models import TOTPDevice
 
+from accounts.bulk_import import ADMIN_IMPORT_MAX_BYTES, ADMIN_IMPORT_MAX_ROWS, EmployeeImportError, read_employee_csv
 from accounts.models import Employee
 
 User = get_user_model()
@@ -146,4 +147,29 @@ class RegisterForm(forms.ModelForm):
 
         if commit:
             employee.save()
-        return employee
\ No newline at end of file
+        return employee
+
+class EmployeeImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label='CSV file',
+        help_text='Columns: email, first_name, last_name, position, department, phone_number, '
+                  'emergency_contact; optional salary, hourly_rate, weekly_hours, date_hired, '
+                  'address, vacation_days, sick_leaves, password. '
+                  f'At most {ADMIN_IMPORT_MAX_ROWS} employees per upload; import larger files '
+                  'with "manage.py import_employees".')
+
+    def clean_csv_file(self):
+        """The file's (line, row) pairs, refused past the admin upload limit"""
+        too_large = forms.ValidationError(
+            f'Uploads are limited to {ADMIN_IMPORT_MAX_ROWS} employees. '
+            'Import larger files with "manage.py import_employees".')
+        csv_file = self.cleaned_data['csv_file']
+        if csv_file.size > ADMIN_IMPORT_MAX_BYTES:
+            raise too_large
+        try:
+            rows = read_employee_csv(csv_file)
+        except EmployeeImportError as e:
+            raise forms.ValidationError([f'Line {line}: {message}' for line, message in e.errors])
+        if len(rows) > ADMIN_IMPORT_MAX_ROWS:
+            raise too_large
+        return rows
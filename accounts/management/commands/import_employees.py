@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.bulk_import import IMPORT_BATCH_SIZE, EmployeeImportError, import_employees, read_employee_csv
+
+
+class Command(BaseCommand):
+    """Bulk onboarding of employees from a CSV file."""
+    help = 'Creates employees from a CSV file. Nothing is imported if any row is invalid.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='CSV with a header row, see accounts.bulk_import.IMPORT_FIELDS.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Employees per INSERT.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: CPU count).')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        try:
+            rows = read_employee_csv(options['csv_path'])
+            created = import_employees(rows, options['batch_size'], options['workers'])
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["csv_path"]}: {e}')
+        except EmployeeImportError as e:
+            for line, message in e.errors:
+                self.stderr.write(f'  line {line}: {message}')
+            raise CommandError(f'{len(e.errors)} invalid row(s), nothing imported.')
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(created)} employees.'))
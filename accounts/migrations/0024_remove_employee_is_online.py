@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_alter_employee_salary'),
+        ('emp_management', '0002_employeepresence'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='employee',
+            name='is_online',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:20
+
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from accounts.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from accounts.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_remove_employee_is_online'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
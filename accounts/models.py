@@ -2,11 +2,13 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.db.models import Count, F, FilteredRelation, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Least
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 from Employee_System import settings
 from phonenumber_field.modelfields import PhoneNumberField
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from cloudinary.models import CloudinaryField
 
 
@@ -37,7 +39,106 @@ def get_current_date():
     return timezone.now().date()
 
 
-class UserManager(BaseUserManager):
+# SQLite refuses expressions nested deeper than 1000, which a long OR chain is
+SLUG_PREFIXES_PER_QUERY = 500
+
+
+def allocate_slugs(names):
+    """
+    Free slugs for a list of (first_name, last_name) pairs, in order. Taken
+    slugs are read with one prefix query per SLUG_PREFIXES_PER_QUERY distinct
+    names, instead of one query per collision. Collisions get -1, -2, ...
+    like they always have.
+    """
+    bases = [slugify(f"{first_name}-{last_name}") for first_name, last_name in names]
+    unique_bases = sorted(set(bases))
+    taken = set()
+    for i in range(0, len(unique_bases), SLUG_PREFIXES_PER_QUERY):
+        chunk = unique_bases[i:i + SLUG_PREFIXES_PER_QUERY]
+        prefixes = Q(slug__in=chunk)
+        for base in chunk:
+            prefixes |= Q(slug__startswith=f"{base}-")
+        taken.update(Employee.objects.filter(prefixes).values_list('slug', flat=True))
+
+    slugs = []
+    next_num = {}
+    for base in bases:
+        slug, num = base, next_num.get(base, 1)
+        while slug in taken:
+            slug = f"{base}-{num}"
+            num += 1
+        next_num[base] = num
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+class EmployeeQuerySet(models.QuerySet):
+    def with_current_attendance(self):
+        """
+        Attach this week's attendance (today included) in one prefetch query,
+        as current_week_attendance (newest first).
+
+        is_currently_working, get_current_work_duration, get_daily_working_hours,
+        get_weekly_working_hours, calculate_weekly_earnings and
+        get_pending_overtime_hours then answer from it without querying.
+        """
+        from accounts.payroll import get_week_range
+        from attendance.models import Attendance
+
+        week_start, week_end = get_week_range()
+        return self.prefetch_related(models.Prefetch(
+            'attendance_set',
+            queryset=Attendance.objects.filter(date__range=[week_start, week_end]).order_by('-date'),
+            to_attr='current_week_attendance',
+        ))
+
+    def with_work_stats(self, period='week'):
+        """
+        Annotate attendance totals for a period ('today', 'week', 'month' or a
+        (start_date, end_date) pair) in the same query as the employees:
+
+        days_present, worked_hours, total_overtime_hours, approved_overtime_hours,
+        pending_overtime_hours and estimated_earnings. Hours are split into
+        regular and overtime per day the way payroll does it, so
+        estimated_earnings matches calculate_payroll_breakdowns.
+        """
+        from accounts.payroll import HoursBetween, get_period_range
+
+        start_date, end_date = get_period_range(period)
+        closed = Q(period_attendance__time_in__isnull=False, period_attendance__time_out__isnull=False)
+        day_hours = HoursBetween('period_attendance__time_in', 'period_attendance__time_out')
+        expected_daily_hours = Cast('weekly_hours', models.FloatField()) / 5
+        overtime_hours = Greatest(day_hours - expected_daily_hours, Value(0.0))
+
+        def total(expression, condition=closed):
+            return Coalesce(Sum(expression, filter=condition), Value(0.0))
+
+        return self.alias(
+            period_attendance=FilteredRelation(
+                'attendance', condition=Q(attendance__date__range=[start_date, end_date])
+            ),
+        ).annotate(
+            days_present=Count('period_attendance', filter=Q(period_attendance__time_in__isnull=False)),
+            worked_hours=total(day_hours),
+            regular_hours=total(Least(day_hours, expected_daily_hours)),
+            total_overtime_hours=total(overtime_hours),
+            approved_overtime_hours=total(overtime_hours, closed & Q(period_attendance__overtime_approved=True)),
+            pending_overtime_hours=total(
+                Cast('period_attendance__overtime_hours', models.FloatField()),
+                Q(period_attendance__overtime_hours__gt=0,
+                  period_attendance__overtime_approved=False,
+                  period_attendance__overtime_rejected=False),
+            ),
+        ).annotate(
+            estimated_earnings=(
+                F('regular_hours') * Coalesce(Cast('hourly_rate', models.FloatField()), Value(0.0))
+                + F('approved_overtime_hours') * Coalesce(Cast('overtime_rate', models.FloatField()), Value(0.0))
+            ),
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(EmployeeQuerySet)):
     def create_user(self, email, password=None, is_active=True, is_staff=False, is_admin=False, is_superuser=False, **extra_fields):
         if not email:
             raise ValueError('Users must have an email address')
@@ -108,8 +209,6 @@ class Employee(AbstractBaseUser, PermissionsMixin):
     work_end_time = models.TimeField(default='17:00', help_text='Standard work end time')
     weekly_hours = models.DecimalField(max_digits=5, decimal_places=2, default=40.00, help_text='Expected weekly work hours')
 
-    # Online Status (based on attendance)
-    is_online = models.BooleanField(default=False)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
 
     staff = models.BooleanField(default=False)
@@ -126,14 +225,13 @@ class Employee(AbstractBaseUser, PermissionsMixin):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(f"{self.first_name}-{self.last_name}")
-            slug = base_slug
-            num = 1
-            while Employee.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{num}"
-                num += 1
-            self.slug = slug
+            self.slug = allocate_slugs([(self.first_name, self.last_name)])[0]
 
+        self.derive_pay_rates()
+        super().save(*args, **kwargs)
+
+    def derive_pay_rates(self):
+        """Fill hourly_rate/salary from each other and overtime_rate from hourly_rate"""
         # Always recalculate hourly rate from weekly salary when salary is provided
         if self.salary and self.weekly_hours:
             # Calculate hourly rate from weekly salary
@@ -146,8 +244,6 @@ class Employee(AbstractBaseUser, PermissionsMixin):
         if self.hourly_rate:
             self.overtime_rate = float(self.hourly_rate) + 0.5
 
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return self.email
 
@@ -169,6 +265,14 @@ class Employee(AbstractBaseUser, PermissionsMixin):
     def is_active(self):
         return self.active
 
+    @property
+    def is_online(self):
+        """Online status from the presence store (select_related('presence') when listing)"""
+        try:
+            return self.presence.is_online
+        except ObjectDoesNotExist:
+            return False
+
     def get_full_name(self):
         """Return full name of employee"""
         return f"{self.first_name} {self.last_name}"
@@ -177,104 +281,70 @@ class Employee(AbstractBaseUser, PermissionsMixin):
         """Return formatted working hours"""
         return f"{self.work_start_time.strftime('%H:%M')} - {self.work_end_time.strftime('%H:%M')}"
 
+    def get_today_attendance(self):
+        """Today's Attendance record or None, from with_current_attendance() when it was used"""
+        from attendance.models import Attendance
+
+        today = timezone.now().date()
+        prefetched = getattr(self, 'current_week_attendance', None)
+        if prefetched is not None:
+            return next((record for record in prefetched if record.date == today), None)
+        return Attendance.objects.filter(employee=self, date=today).first()
+
     def is_currently_working(self):
         """Check if employee is currently at work based on today's attendance"""
-        try:
-            from attendance.models import Attendance
-            today_attendance = Attendance.objects.get(employee=self, date=timezone.now().date())
-            return today_attendance.time_in is not None and today_attendance.time_out is None
-        except:
-            return False
+        today_attendance = self.get_today_attendance()
+        return today_attendance is not None and today_attendance.time_in is not None and today_attendance.time_out is None
 
     def get_current_work_duration(self):
         """Get current work session duration if employee is currently working"""
-        if self.is_currently_working():
-            try:
-                from attendance.models import Attendance
-                today_attendance = Attendance.objects.get(employee=self, date=timezone.now().date())
-                if today_attendance.time_in:
-                    duration = timezone.now() - today_attendance.time_in
-                    total_minutes = int(duration.total_seconds() / 60)
-                    hours = total_minutes // 60
-                    minutes = total_minutes % 60
-                    return f"{hours}h {minutes}m"
-            except:
-                pass
+        today_attendance = self.get_today_attendance()
+        if today_attendance is not None and today_attendance.time_in and not today_attendance.time_out:
+            duration = timezone.now() - today_attendance.time_in
+            total_minutes = int(duration.total_seconds() / 60)
+            hours = total_minutes // 60
+            minutes = total_minutes % 60
+            return f"{hours}h {minutes}m"
         return "Not working"
 
     def calculate_payroll_breakdown(self, start_date=None, end_date=None):
         """Calculate detailed payroll breakdown including approved overtime"""
-        from attendance.models import Attendance
-        from datetime import datetime, timedelta
+        from accounts.payroll import get_week_range, get_payroll_records, summarize_payroll
 
         # Default to current week if no dates provided
         if not start_date or not end_date:
-            today = timezone.now().date()
-            start_date = today - timedelta(days=today.weekday())  # Monday
-            end_date = start_date + timedelta(days=6)  # Sunday
+            start_date, end_date = get_week_range()
 
         # Get all attendance records for the period
-        attendance_records = Attendance.objects.filter(
-            employee=self,
-            date__range=[start_date, end_date],
-            time_in__isnull=False,
-            time_out__isnull=False
-        )
+        attendance_records = get_payroll_records([self], start_date, end_date)
 
-        regular_hours = 0
-        approved_overtime_hours = 0
-        total_overtime_hours = 0  # For tracking purposes
-
-        for record in attendance_records:
-            # Calculate daily hours worked
-            duration = record.time_out - record.time_in
-            daily_hours = duration.total_seconds() / 3600
-
-            # Expected daily hours (weekly_hours / 5 days)
-            expected_daily_hours = float(self.weekly_hours) / 5
-
-            if daily_hours <= expected_daily_hours:
-                # All hours are regular
-                regular_hours += daily_hours
-            else:
-                # Split into regular and overtime
-                regular_hours += expected_daily_hours
-                overtime_for_day = daily_hours - expected_daily_hours
-                total_overtime_hours += overtime_for_day
-
-                # Only count overtime if approved
-                if record.overtime_approved:
-                    approved_overtime_hours += overtime_for_day
-
-        # Calculate pay amounts
-        regular_pay = regular_hours * float(self.hourly_rate) if self.hourly_rate else 0
-        overtime_pay = approved_overtime_hours * float(self.overtime_rate) if self.overtime_rate else 0
-        total_pay = regular_pay + overtime_pay
-
-        return {
-            'period_start': start_date,
-            'period_end': end_date,
-            'regular_hours': round(regular_hours, 2),
-            'approved_overtime_hours': round(approved_overtime_hours, 2),
-            'total_overtime_hours': round(total_overtime_hours, 2),  # For admin reference
-            'unapproved_overtime_hours': round(total_overtime_hours - approved_overtime_hours, 2),
-            'regular_pay': round(regular_pay, 2),
-            'overtime_pay': round(overtime_pay, 2),
-            'total_pay': round(total_pay, 2),
-            'hourly_rate': float(self.hourly_rate) if self.hourly_rate else 0,
-            'overtime_rate': float(self.overtime_rate) if self.overtime_rate else 0,
-        }
+        return summarize_payroll(
+            self,
+            (record[1:] for record in attendance_records),
+            start_date,
+            end_date
+        )
 
     def get_suggested_paycheck_amount(self, start_date=None, end_date=None):
         """Get suggested paycheck amount based on approved hours only"""
         breakdown = self.calculate_payroll_breakdown(start_date, end_date)
         return breakdown['total_pay']
 
+    def get_weekly_payroll_summary(self, week_start):
+        """Return the WeeklyPayrollSummary for the week starting on week_start, or None if it is missing or stale"""
+        from attendance.models import WeeklyPayrollSummary
+
+        summary = WeeklyPayrollSummary.objects.filter(employee=self, week_start=week_start).first()
+        if summary is None or summary.weekly_hours != self.weekly_hours:
+            return None
+        return summary
+
     def get_daily_working_hours(self):
         """Get today's working hours - returns '0 hours' if no attendance or 0 hours worked"""
         try:
-            from attendance.models import Attendance
-            today_attendance = Attendance.objects.get(employee=self, date=timezone.now().date())
+            today_attendance = self.get_today_attendance()
+            if today_attendance is None:
+                return "0 hours"
 
             if today_attendance.time_in and today_attendance.time_out:
                 # Calculate completed work hours
@@ -301,12 +371,20 @@ class Employee(AbstractBaseUser, PermissionsMixin):
             start_of_week = today - timedelta(days=today.weekday())  # Monday
             end_of_week = start_of_week + timedelta(days=6)  # Sunday
 
-            attendance_records = Attendance.objects.filter(
-                employee=self,
-                date__range=[start_of_week, end_of_week],
-                time_in__isnull=False,
-                time_out__isnull=False
-            )
+            prefetched = getattr(self, 'current_week_attendance', None)
+            if prefetched is not None:
+                attendance_records = [record for record in prefetched if record.time_in and record.time_out]
+            else:
+                summary = self.get_weekly_payroll_summary(start_of_week)
+                if summary is not None:
+                    return round(summary.worked_hours, 1)
+
+                attendance_records = Attendance.objects.filter(
+                    employee=self,
+                    date__range=[start_of_week, end_of_week],
+                    time_in__isnull=False,
+                    time_out__isnull=False
+                )
 
             total_hours = 0
             for record in attendance_records:
@@ -332,6 +410,7 @@ class Employee(AbstractBaseUser, PermissionsMixin):
     def get_pending_overtime_hours(self, start_date=None, end_date=None):
         """Get overtime hours pending approval"""
         from attendance.models import Attendance
+        from accounts.payroll import get_week_range, is_payroll_week
         from datetime import datetime, timedelta
 
         if not start_date or not end_date:
@@ -339,6 +418,18 @@ class Employee(AbstractBaseUser, PermissionsMixin):
             start_date = today - timedelta(days=today.weekday())
             end_date = start_date + timedelta(days=6)
 
+        prefetched = getattr(self, 'current_week_attendance', None)
+        if prefetched is not None and [start_date, end_date] == list(get_week_range()):
+            return sum(
+                record.overtime_hours for record in prefetched
+                if record.overtime_hours > 0 and not record.overtime_approved and not record.overtime_rejected
+            )
+
+        if is_payroll_week(start_date, end_date):
+            summary = self.get_weekly_payroll_summary(start_date)
+            if summary is not None:
+                return summary.pending_overtime_hours
+
         pending_records = Attendance.objects.filter(
             employee=self,
             date__range=[start_date, end_date],
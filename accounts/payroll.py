@@ -0,0 +1,290 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.db.models import FloatField, Func, QuerySet
+from django.utils import timezone
+
+
+class HoursBetween(Func):
+    """Hours from start to end (two datetime expressions), computed by the database as a float"""
+    arity = 2
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        start, end = self.source_expressions
+        return Func(end, start, template='(EXTRACT(EPOCH FROM (%(expressions)s)) / 3600.0)', arg_joiner=' - ',
+                    output_field=self.output_field).as_sql(compiler, connection, **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        start, end = self.source_expressions
+        return Func(end, start, template='((julianday(%(expressions)s)) * 24.0)', arg_joiner=') - julianday(',
+                    output_field=self.output_field).as_sql(compiler, connection, **extra_context)
+
+
+def get_period_range(period=None):
+    """
+    (start, end) dates for a work-stats period: 'today', 'week' (default),
+    'month', or an explicit (start_date, end_date) pair.
+    """
+    if isinstance(period, (tuple, list)):
+        return period[0], period[1]
+
+    today = timezone.now().date()
+    if period == 'today':
+        return today, today
+    if period == 'month':
+        next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return today.replace(day=1), next_month - timedelta(days=1)
+    if period in (None, 'week'):
+        return get_week_range(today)
+    raise ValueError(f'Unknown work stats period "{period}"')
+
+
+def get_week_range(day=None):
+    """Return the Monday and Sunday of the week containing the given day (default today)"""
+    if day is None:
+        day = timezone.now().date()
+    start_of_week = day - timedelta(days=day.weekday())  # Monday
+    end_of_week = start_of_week + timedelta(days=6)  # Sunday
+    return start_of_week, end_of_week
+
+
+def get_payroll_records(employees, start_date, end_date):
+    """
+    Completed attendance rows for the given employees as (employee_id, time_in, time_out, overtime_approved).
+
+    Archived attendance is included when the period reaches back that far.
+    """
+    from attendance.archive import iter_attendance_rows
+
+    if isinstance(employees, QuerySet):
+        employee_filter = {'employee__in': employees.values('pk')}
+    else:
+        employee_filter = {'employee__in': [employee.pk for employee in employees]}
+
+    # Same per-employee order as Attendance.Meta.ordering so the float sums match exactly
+    return iter_attendance_rows(
+        start_date,
+        ['employee_id', 'time_in', 'time_out', 'overtime_approved'],
+        ['employee_id', '-date'],
+        date__range=[start_date, end_date],
+        time_in__isnull=False,
+        time_out__isnull=False,
+        **employee_filter
+    )
+
+
+def accumulate_payroll_hours(weekly_hours, records):
+    """Sum regular, approved overtime and total overtime hours from (time_in, time_out, overtime_approved) rows"""
+    regular_hours = 0
+    approved_overtime_hours = 0
+    total_overtime_hours = 0  # For tracking purposes
+
+    for time_in, time_out, overtime_approved in records:
+        # Calculate daily hours worked
+        duration = time_out - time_in
+        daily_hours = duration.total_seconds() / 3600
+
+        # Expected daily hours (weekly_hours / 5 days)
+        expected_daily_hours = float(weekly_hours) / 5
+
+        if daily_hours <= expected_daily_hours:
+            # All hours are regular
+            regular_hours += daily_hours
+        else:
+            # Split into regular and overtime
+            regular_hours += expected_daily_hours
+            overtime_for_day = daily_hours - expected_daily_hours
+            total_overtime_hours += overtime_for_day
+
+            # Only count overtime if approved
+            if overtime_approved:
+                approved_overtime_hours += overtime_for_day
+
+    return regular_hours, approved_overtime_hours, total_overtime_hours
+
+
+def build_payroll_breakdown(employee, regular_hours, approved_overtime_hours, total_overtime_hours, start_date, end_date):
+    """Turn unrounded hour totals into the payroll breakdown dict using the employee's current rates"""
+    # Calculate pay amounts
+    regular_pay = regular_hours * float(employee.hourly_rate) if employee.hourly_rate else 0
+    overtime_pay = approved_overtime_hours * float(employee.overtime_rate) if employee.overtime_rate else 0
+    total_pay = regular_pay + overtime_pay
+
+    return {
+        'period_start': start_date,
+        'period_end': end_date,
+        'regular_hours': round(regular_hours, 2),
+        'approved_overtime_hours': round(approved_overtime_hours, 2),
+        'total_overtime_hours': round(total_overtime_hours, 2),  # For admin reference
+        'unapproved_overtime_hours': round(total_overtime_hours - approved_overtime_hours, 2),
+        'regular_pay': round(regular_pay, 2),
+        'overtime_pay': round(overtime_pay, 2),
+        'total_pay': round(total_pay, 2),
+        'hourly_rate': float(employee.hourly_rate) if employee.hourly_rate else 0,
+        'overtime_rate': float(employee.overtime_rate) if employee.overtime_rate else 0,
+    }
+
+
+def summarize_payroll(employee, records, start_date, end_date):
+    """Build the payroll breakdown dict for one employee from (time_in, time_out, overtime_approved) rows"""
+    hours = accumulate_payroll_hours(employee.weekly_hours, records)
+    return build_payroll_breakdown(employee, *hours, start_date, end_date)
+
+
+def calculate_payroll_breakdowns(employees, start_date=None, end_date=None):
+    """
+    Calculate payroll breakdowns for many employees at once.
+
+    Returns a dict mapping employee pk to the same breakdown that
+    Employee.calculate_payroll_breakdown produces, using a single
+    attendance query no matter how many employees are included.
+    """
+    # Default to current week if no dates provided
+    if not start_date or not end_date:
+        start_date, end_date = get_week_range()
+
+    records = get_payroll_records(employees, start_date, end_date)
+    employees = list(employees)
+
+    records_by_employee = {}
+    for employee_id, rows in groupby(records, key=lambda row: row[0]):
+        records_by_employee[employee_id] = [row[1:] for row in rows]
+
+    return {
+        employee.pk: summarize_payroll(employee, records_by_employee.get(employee.pk, []), start_date, end_date)
+        for employee in employees
+    }
+
+
+def compute_weekly_summaries(employee_ids, start_date, end_date):
+    """
+    Recompute weekly summary values straight from the attendance rows.
+
+    Returns a dict keyed by (employee_id, week_start) for every week in the
+    range that has at least one completed attendance row.
+    """
+    from accounts.models import Employee
+    from attendance.archive import iter_attendance_rows
+
+    weekly_hours_by_employee = dict(
+        Employee.objects.filter(pk__in=employee_ids).values_list('pk', 'weekly_hours')
+    )
+    records = iter_attendance_rows(
+        start_date,
+        ['employee_id', 'date', 'time_in', 'time_out', 'overtime_approved', 'overtime_rejected', 'overtime_hours'],
+        ['employee_id', '-date'],
+        employee_id__in=employee_ids,
+        date__range=[start_date, end_date],
+        time_in__isnull=False,
+        time_out__isnull=False,
+    )
+
+    def week_key(row):
+        return row[0], get_week_range(row[1])[0]
+
+    summaries = {}
+    for (employee_id, week_start), rows in groupby(records, key=week_key):
+        rows = list(rows)
+        weekly_hours = weekly_hours_by_employee[employee_id]
+        regular_hours, approved_overtime_hours, total_overtime_hours = accumulate_payroll_hours(
+            weekly_hours, ((row[2], row[3], row[4]) for row in rows)
+        )
+
+        worked_hours = 0
+        for row in rows:
+            worked_hours += (row[3] - row[2]).total_seconds() / 3600
+
+        summaries[(employee_id, week_start)] = {
+            'weekly_hours': weekly_hours,
+            'worked_hours': worked_hours,
+            'regular_hours': regular_hours,
+            'approved_overtime_hours': approved_overtime_hours,
+            'total_overtime_hours': total_overtime_hours,
+            'pending_overtime_hours': sum(
+                row[6] for row in rows if row[6] > 0 and not row[4] and not row[5]
+            ),
+        }
+    return summaries
+
+
+def refresh_weekly_summaries(keys):
+    """
+    Bring the WeeklyPayrollSummary rows for the given (employee_id, week_start)
+    pairs back in line with the attendance table.
+
+    Writes are done with a single upsert; weeks that no longer have any
+    completed attendance are stored as zero rows.
+    """
+    from attendance.models import WeeklyPayrollSummary
+
+    keys = set(keys)
+    if not keys:
+        return []
+
+    employee_ids = {employee_id for employee_id, _ in keys}
+    week_starts = {week_start for _, week_start in keys}
+    fresh = compute_weekly_summaries(
+        employee_ids, min(week_starts), max(week_starts) + timedelta(days=6)
+    )
+    weekly_hours_by_employee = None
+
+    summaries = []
+    for employee_id, week_start in keys:
+        values = fresh.get((employee_id, week_start))
+        if values is None:
+            if weekly_hours_by_employee is None:
+                from accounts.models import Employee
+                weekly_hours_by_employee = dict(
+                    Employee.objects.filter(pk__in=employee_ids).values_list('pk', 'weekly_hours')
+                )
+            if employee_id not in weekly_hours_by_employee:
+                # Employee was deleted, the summary went with it
+                continue
+            values = WeeklyPayrollSummary.empty_values(weekly_hours_by_employee[employee_id])
+        summaries.append(WeeklyPayrollSummary(employee_id=employee_id, week_start=week_start, **values))
+
+    return WeeklyPayrollSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['employee', 'week_start'],
+        update_fields=WeeklyPayrollSummary.SUMMARY_FIELDS + ['updated_at'],
+    )
+
+
+def get_weekly_payroll_breakdowns(employees, week_start=None):
+    """
+    Payroll breakdowns for a Monday-Sunday week served from WeeklyPayrollSummary.
+
+    Employees without a current summary row fall back to the set-based
+    calculation, so the result always matches calculate_payroll_breakdowns.
+    """
+    from attendance.models import WeeklyPayrollSummary
+
+    week_start, week_end = get_week_range(week_start)
+    employees = list(employees)
+
+    summaries = {
+        summary.employee_id: summary
+        for summary in WeeklyPayrollSummary.objects.filter(
+            employee__in=[employee.pk for employee in employees], week_start=week_start
+        )
+    }
+
+    breakdowns = {}
+    missing = []
+    for employee in employees:
+        summary = summaries.get(employee.pk)
+        if summary is None or summary.weekly_hours != employee.weekly_hours:
+            missing.append(employee)
+        else:
+            breakdowns[employee.pk] = summary.to_breakdown(employee)
+
+    if missing:
+        breakdowns.update(calculate_payroll_breakdowns(missing, week_start, week_end))
+    return breakdowns
+
+
+def is_payroll_week(start_date, end_date):
+    """True when the period is exactly one Monday-Sunday week"""
+    return start_date.weekday() == 0 and end_date == start_date + timedelta(days=6)
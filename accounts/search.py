@@ -0,0 +1,262 @@
+"""
+Ranked employee search.
+
+PostgreSQL gets GIN indexes over the searchable columns: a 'simple'
+tsvector expression for word/prefix matches and per-column pg_trgm
+indexes for typo-tolerant matches. SQLite gets an FTS5 shadow table kept in step with the employees
+table by triggers. Other backends fall back to icontains.
+"""
+import re
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Columns that make up an employee's search document
+SEARCH_FIELDS = ['first_name', 'last_name', 'department', 'position', 'slug']
+
+# Columns a misspelled term is compared with, word by word (PostgreSQL)
+FUZZY_FIELDS = ['first_name', 'last_name', 'department', 'position']
+
+# Cap on search_employee_ids (search_employees ranks in the database, uncapped)
+MAX_SEARCH_RESULTS = 500
+
+FTS_TABLE = 'accounts_employee_fts'
+SEARCH_INDEX = 'accounts_employee_search_idx'
+TRIGRAM_INDEX = 'accounts_employee_{column}_trgm_idx'
+# Whole-document trigram index, replaced by the per-column ones
+DOCUMENT_TRIGRAM_INDEX = 'accounts_employee_trgm_idx'
+
+
+def _employee_table():
+    from accounts.models import Employee
+
+    return Employee._meta.db_table
+
+
+def _columns(fields=SEARCH_FIELDS):
+    from accounts.models import Employee
+
+    return [Employee._meta.get_field(name).column for name in fields]
+
+
+def _document_sql(quote, table=None):
+    """
+    The concatenated search document, shared by the PostgreSQL indexes and
+    queries. Columns are qualified with table when given.
+    """
+    prefix = f'{table}.' if table else ''
+    return " || ' ' || ".join(f"coalesce({prefix}{quote(column)}::text, '')" for column in _columns())
+
+
+def install_search_index(conn=connection):
+    """
+    Create (or repair) the search index structures for the current backend.
+
+    Idempotent; run from a migration and again after every migrate, because
+    SQLite drops the triggers whenever Django rebuilds the employees table.
+    """
+    quote = conn.ops.quote_name
+    table_name = _employee_table()
+    table = quote(table_name)
+    columns = _columns()
+
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            document = _document_sql(quote)
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON {table} "
+                f"USING GIN (to_tsvector('simple'::regconfig, {document}))"
+            )
+            try:
+                # pg_trgm may not be available to this role; word search still works without it
+                with transaction.atomic(using=conn.alias):
+                    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                    cursor.execute(f'DROP INDEX IF EXISTS {DOCUMENT_TRIGRAM_INDEX}')
+                    for column in _columns(FUZZY_FIELDS):
+                        cursor.execute(
+                            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX.format(column=column)} ON {table} "
+                            f"USING GIN ({quote(column)} gin_trgm_ops)"
+                        )
+            except DatabaseError:
+                pass
+
+        elif conn.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{FTS_TABLE}_%'],
+            )
+            if cursor.fetchone()[0] == 3:
+                return
+
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{quote(column)}' for column in columns)
+            old_values = ', '.join(f'old.{quote(column)}' for column in columns)
+            delete_old = (
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+            )
+            insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {column_list}) VALUES (new.id, {new_values});"
+
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{column_list}, content='{table_name}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN {insert_new} END")
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN {delete_old} END")
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END"
+            )
+            # Triggers were missing, so the shadow table may be behind
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(conn=connection):
+    """Drop everything install_search_index created"""
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+            cursor.execute(f'DROP INDEX IF EXISTS {DOCUMENT_TRIGRAM_INDEX}')
+            for column in _columns(FUZZY_FIELDS):
+                cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX.format(column=column)}')
+        elif conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def get_search_terms(query):
+    """Lower-cased word tokens of a search box query"""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def _has_trigram(cursor):
+    cursor.execute(
+        'SELECT 1 FROM pg_indexes WHERE indexname = %s', [TRIGRAM_INDEX.format(column=_columns(FUZZY_FIELDS)[0])]
+    )
+    return cursor.fetchone() is not None
+
+
+def _fuzzy_sql(quote, terms, table=None):
+    """
+    (condition, params, score, params): every term is close to a word of one
+    of the FUZZY_FIELDS columns (pg_trgm word similarity, so a short term is
+    not drowned out by the rest of the column), and the summed closeness.
+    """
+    prefix = f'{table}.' if table else ''
+    columns = [f'{prefix}{quote(column)}' for column in _columns(FUZZY_FIELDS)]
+    condition = ' AND '.join(
+        '(' + ' OR '.join(f'%s <%% {column}' for column in columns) + ')' for _ in terms
+    )
+    score = ' + '.join(
+        f"coalesce(greatest({', '.join(f'word_similarity(%s, {column})' for column in columns)}), 0)"
+        for _ in terms
+    )
+    params = [term for term in terms for _ in columns]
+    return condition, params, score, params
+
+
+def _match_sql(cursor, terms):
+    """
+    (sql, params, rank, rank_params) of a query selecting the ids of the
+    employees that match every term, or None when the backend has no search
+    index. rank scores a row of the employees table, lowest for the best
+    match, so it can order any query over that table.
+    """
+    quote = connection.ops.quote_name
+    table = quote(_employee_table())
+
+    if connection.vendor == 'postgresql':
+        vector = f"to_tsvector('simple'::regconfig, {_document_sql(quote)})"
+        row_vector = f"to_tsvector('simple'::regconfig, {_document_sql(quote, table)})"
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        sql = f"SELECT id FROM {table}, to_tsquery('simple', %s) query WHERE {vector} @@ query"
+        rank = f"ts_rank({row_vector}, to_tsquery('simple', %s))"
+        if not _has_trigram(cursor):
+            return sql, [tsquery], f"-{rank}", [tsquery]
+        condition, params, _, _ = _fuzzy_sql(quote, terms)
+        _, _, score, score_params = _fuzzy_sql(quote, terms, table)
+        return f"{sql} OR ({condition})", [tsquery, *params], f"-({rank} + {score})", [tsquery, *score_params]
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return (
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [match],
+            f"(SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id)",
+            [match],
+        )
+    return None
+
+
+def search_employee_ids(query, limit=MAX_SEARCH_RESULTS):
+    """
+    Ids of employees matching the query, best match first.
+
+    Every term must match the start of a word (so results narrow while
+    typing); on PostgreSQL close misspellings also match through trigrams.
+    Returns None when the backend has no search index.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return []
+
+    with connection.cursor() as cursor:
+        match = _match_sql(cursor, terms)
+        if match is None:
+            return None
+        sql, params, rank, rank_params = match
+        table = connection.ops.quote_name(_employee_table())
+        try:
+            cursor.execute(
+                f"SELECT id FROM {table} WHERE id IN ({sql}) ORDER BY {rank}, id LIMIT %s",
+                [*params, *rank_params, limit],
+            )
+        except DatabaseError:
+            if connection.vendor != 'sqlite':
+                raise
+            # No FTS5 in this SQLite build
+            return None
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_employees(queryset, query):
+    """
+    Filter an Employee queryset by the search box query and order it by
+    rank. Matching and ranking both run in the database, so every match is
+    kept and paginates with the right total.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset.none()
+    with connection.cursor() as cursor:
+        match = _match_sql(cursor, terms)
+    if match is None:
+        return queryset.filter(_icontains_filter(query))
+    sql, params, rank, rank_params = match
+    return queryset.filter(pk__in=RawSQL(sql, params)).annotate(
+        search_rank=RawSQL(rank, rank_params),
+    ).order_by('search_rank', 'pk')
+
+
+def filter_by_employee_search(queryset, query, employee_field='employee'):
+    """
+    Filter any queryset with an employee relation by the search box query
+    (keeps its own ordering). The match runs as a subquery, so every
+    matching employee is kept.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset.none()
+    with connection.cursor() as cursor:
+        match = _match_sql(cursor, terms)
+    if match is None:
+        return queryset.filter(_icontains_filter(query, prefix=f'{employee_field}__'))
+    sql, params, _, _ = match
+    return queryset.filter(**{f'{employee_field}__in': RawSQL(sql, params)})
+
+
+def _icontains_filter(query, prefix=''):
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{prefix}{field}__icontains': query})
+    return condition
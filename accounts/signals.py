@@ -1,16 +1,15 @@
 # accounts/signals.py
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
+from emp_management.presence import set_online as set_presence
 from .models import Employee
 
 @receiver(user_logged_in)
 def set_online(sender, user, request, **kwargs):
-    user.is_online = True
-    user.save()
+    set_presence(user, True)
 
 @receiver(user_logged_out)
 def set_offline(sender, user, request, **kwargs):
     # This is a bit tricky, because user can be None.
     if user and user.is_authenticated:
-        user.is_online = False
-        user.save()
\ No newline at end of file
+        set_presence(user, False)
\ No newline at end of file
@@ -1,8 +1,18 @@
+import io
 import json
+from datetime import date, datetime, timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from accounts.bulk_import import ADMIN_IMPORT_MAX_ROWS, EmployeeImportError, import_employees, read_employee_csv
+from accounts.models import allocate_slugs
+from accounts.payroll import calculate_payroll_breakdowns
+from accounts.search import filter_by_employee_search, search_employee_ids, search_employees
+from attendance.models import Attendance
+
 User = get_user_model()
 
 
@@ -50,3 +60,235 @@ class LoginFlowTest(TestCase):
 ##PARA MATEST IF MAGREREDIRECT SA OTP PAGE IF DIFFERENT IP AND EMPLOYEES PAGE IF SAME IP
 #run lang command na
 # python manage.py test
+
+
+class PayrollEngineTest(TestCase):
+    def setUp(self):
+        self.start_date = date(2025, 3, 3)  # Monday
+        self.end_date = date(2025, 3, 9)
+        self.employees = [
+            User.objects.create_user(
+                email=f'payroll{i}@gmail.com',
+                password='password123',
+                first_name='Pay',
+                last_name=f'Roll{i}',
+                salary=400 + 37 * i,
+            )
+            for i in range(3)
+        ]
+        for i, employee in enumerate(self.employees):
+            for day in range(5):
+                work_date = self.start_date + timedelta(days=day)
+                time_in = timezone.make_aware(datetime(2025, 3, 3 + day, 8, 0))
+                attendance = Attendance.objects.create(
+                    employee=employee,
+                    date=work_date,
+                    time_in=time_in,
+                    time_out=time_in + timedelta(hours=7 + day, minutes=13 * i),
+                )
+                if day % 2:
+                    attendance.approve_overtime(approved_by=employee)
+
+    def test_matches_per_employee_breakdown(self):
+        breakdowns = calculate_payroll_breakdowns(
+            User.objects.filter(email__startswith='payroll'), self.start_date, self.end_date
+        )
+        for employee in self.employees:
+            self.assertEqual(
+                breakdowns[employee.pk],
+                employee.calculate_payroll_breakdown(self.start_date, self.end_date)
+            )
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            calculate_payroll_breakdowns(
+                User.objects.filter(email__startswith='payroll'), self.start_date, self.end_date
+            )
+
+    def test_work_stats_annotations_match_payroll(self):
+        breakdowns = calculate_payroll_breakdowns(
+            User.objects.filter(email__startswith='payroll'), self.start_date, self.end_date
+        )
+        with self.assertNumQueries(1):
+            employees = list(
+                User.objects.filter(email__startswith='payroll').with_work_stats((self.start_date, self.end_date))
+            )
+        self.assertEqual(len(employees), 3)
+        for employee in employees:
+            breakdown = breakdowns[employee.pk]
+            pending = sum(
+                float(record.overtime_hours)
+                for record in Attendance.objects.filter(employee=employee, overtime_approved=False)
+            )
+            self.assertEqual(employee.days_present, 5)
+            self.assertAlmostEqual(employee.worked_hours, breakdown['regular_hours'] + breakdown['total_overtime_hours'], delta=0.01)  # the breakdown rounds its parts
+            self.assertAlmostEqual(employee.approved_overtime_hours, breakdown['approved_overtime_hours'], places=2)
+            self.assertAlmostEqual(employee.pending_overtime_hours, pending, places=2)
+            self.assertAlmostEqual(employee.estimated_earnings, breakdown['total_pay'], places=1)
+
+    def test_work_stats_outside_period_are_zero(self):
+        employee = User.objects.filter(email__startswith='payroll').with_work_stats(
+            (self.end_date + timedelta(days=1), self.end_date + timedelta(days=7))
+        ).first()
+        self.assertEqual(employee.days_present, 0)
+        self.assertEqual(employee.worked_hours, 0)
+        self.assertEqual(employee.estimated_earnings, 0)
+
+
+class EmployeeSearchTest(TestCase):
+    def setUp(self):
+        self.maria = User.objects.create_user(
+            email='maria@gmail.com', password='password123', first_name='Maria', last_name='Santos',
+            department='Marketing', position='Designer',
+        )
+        self.mario = User.objects.create_user(
+            email='mario@gmail.com', password='password123', first_name='Mario', last_name='Reyes',
+            department='Finance', position='Marketing Analyst',
+        )
+        self.jose = User.objects.create_user(
+            email='jose@gmail.com', password='password123', first_name='Jose', last_name='Cruz',
+            department='Finance', position='Accountant',
+        )
+
+    def test_prefix_terms_all_have_to_match(self):
+        self.assertEqual(set(search_employee_ids('mar')), {self.maria.pk, self.mario.pk})
+        self.assertEqual(search_employee_ids('mar fin'), [self.mario.pk])
+        self.assertEqual(search_employee_ids('!!!'), [])
+        ranked = search_employees(User.objects.all(), 'marketing')
+        self.assertEqual(set(ranked), {self.maria, self.mario})
+
+    def test_ranking_runs_in_the_database(self):
+        for index in range(3):
+            User.objects.create_user(
+                email=f'analyst{index}@gmail.com', password='password123', first_name='Ana', last_name=f'Lyst{index}',
+                department='Finance', position='Analyst',
+            )
+        # One query however many employees match, and none are dropped
+        with self.assertNumQueries(1):
+            ranked = list(search_employees(User.objects.with_work_stats('week'), 'finance'))
+        self.assertEqual(len(ranked), 5)
+        self.assertEqual([employee.pk for employee in ranked], search_employee_ids('finance'))
+        self.assertEqual(search_employees(User.objects.all(), 'finance')[:2].count(), 2)
+
+    def test_index_follows_employee_changes(self):
+        self.jose.department = 'Engineering'
+        self.jose.save()
+        self.assertEqual(search_employee_ids('engin'), [self.jose.pk])
+        self.assertEqual(search_employee_ids('cruz finance'), [])
+
+        self.jose.delete()
+        self.assertEqual(search_employee_ids('cruz'), [])
+
+    def test_filter_keeps_every_match(self):
+        for employee in (self.maria, self.mario, self.jose):
+            Attendance.objects.create(employee=employee, time_in=timezone.now())
+        self.assertEqual(len(search_employee_ids('finance', limit=1)), 1)
+        # The ranked cap does not apply when filtering, and the match is a subquery
+        with self.assertNumQueries(1):
+            matches = list(filter_by_employee_search(Attendance.objects.all(), 'finance'))
+        self.assertEqual({record.employee_id for record in matches}, {self.mario.pk, self.jose.pk})
+        self.assertFalse(filter_by_employee_search(Attendance.objects.all(), '!!!').exists())
+
+
+class CurrentAttendancePrefetchTest(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.employees = []
+        for i in range(4):
+            employee = User.objects.create_user(
+                email=f'prefetch{i}@gmail.com', password='password123', first_name='Pre', last_name=str(i), salary=500,
+            )
+            self.employees.append(employee)
+            if i == 0:
+                continue  # no attendance today
+            Attendance.objects.create(
+                employee=employee,
+                time_in=now - timedelta(hours=10),
+                time_out=None if i == 1 else now - timedelta(hours=10 - 3 * i),
+            )
+
+    def work_stats(self, employee):
+        return (
+            employee.is_currently_working(),
+            employee.get_current_work_duration().split(' ')[0],  # hours only, minutes may tick over
+            employee.get_daily_working_hours(),
+            employee.get_weekly_working_hours(),
+            employee.calculate_weekly_earnings(),
+            employee.get_pending_overtime_hours(),
+        )
+
+    def test_prefetched_stats_match_and_need_two_queries(self):
+        expected = [self.work_stats(User.objects.get(pk=employee.pk)) for employee in self.employees]
+        with self.assertNumQueries(2):
+            employees = list(User.objects.filter(pk__in=[e.pk for e in self.employees]).order_by('pk').with_current_attendance())
+            stats = [self.work_stats(employee) for employee in employees]
+        self.assertEqual(stats, expected)
+        self.assertEqual(stats[1][0], True)
+        self.assertEqual(stats[0][2], '0 hours')
+
+
+class EmployeeBulkImportTest(TestCase):
+    header = 'email,first_name,last_name,position,department,phone_number,emergency_contact,salary,hourly_rate,password\n'
+
+    def setUp(self):
+        User.objects.create_user(email='juan@gmail.com', password='password123', first_name='Juan', last_name='Cruz')
+
+    def rows(self, *lines):
+        return read_employee_csv(io.BytesIO((self.header + '\n'.join(lines)).encode()))
+
+    def test_slugs_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs([('Juan', 'Cruz'), ('Ana', 'Reyes'), ('Juan', 'Cruz')])
+        self.assertEqual(slugs, ['juan-cruz-1', 'ana-reyes', 'juan-cruz-2'])
+
+    def test_import_creates_employees(self):
+        created = import_employees(self.rows(
+            'juan2@gmail.com,Juan,Cruz,Clerk,Finance,+639171234567,+639171234568,400,,secret123',
+            'ana@gmail.com,Ana,Reyes,Clerk,Finance,+639171234569,+639171234570,,12.50,',
+        ), workers=2)
+
+        self.assertEqual(len(created), 2)
+        juan = User.objects.get(email='juan2@gmail.com')
+        ana = User.objects.get(email='ana@gmail.com')
+        self.assertEqual(juan.slug, 'juan-cruz-1')
+        self.assertEqual(float(juan.hourly_rate), 10.0)
+        self.assertEqual(float(juan.overtime_rate), 10.5)
+        self.assertTrue(juan.check_password('secret123'))
+        self.assertEqual(ana.salary, 500.0)
+        self.assertFalse(ana.has_usable_password())
+        self.assertFalse(ana.is_online)
+
+    def test_bad_rows_import_nothing(self):
+        with self.assertRaises(EmployeeImportError) as raised:
+            import_employees(self.rows(
+                'ana@gmail.com,Ana,Reyes,Clerk,Finance,+639171234569,+639171234570,400,,',
+                'ana@gmail.com,Ana,Reyes,Clerk,Finance,+639171234569,+639171234570,400,,',
+                'juan@gmail.com,Juan,Cruz,Clerk,Finance,+639171234567,+639171234568,400,,',
+                'bob@yahoo.com,Bob,Santos,Clerk,Finance,+639171234567,+639171234568,400,,',
+            ), workers=1)
+
+        self.assertEqual([line for line, _ in raised.exception.errors], [3, 4, 5])
+        self.assertFalse(User.objects.filter(email='ana@gmail.com').exists())
+
+    def upload(self, count):
+        admin = User.objects.create_superuser(
+            email='admin@gmail.com', password='password123', first_name='Ad', last_name='Min'
+        )
+        self.client.force_login(admin)
+        lines = [
+            f'new{index}@gmail.com,New,Hire{index},Clerk,Finance,+639171234567,+639171234568,400,,'
+            for index in range(count)
+        ]
+        csv_file = SimpleUploadedFile('employees.csv', (self.header + '\n'.join(lines)).encode())
+        return self.client.post(reverse('admin:accounts_employee_import'), {'csv_file': csv_file})
+
+    def test_admin_upload_imports_up_to_the_limit(self):
+        response = self.upload(ADMIN_IMPORT_MAX_ROWS)
+        self.assertRedirects(response, reverse('admin:accounts_employee_changelist'))
+        self.assertEqual(User.objects.filter(email__startswith='new').count(), ADMIN_IMPORT_MAX_ROWS)
+
+    def test_admin_upload_over_the_limit_is_refused(self):
+        response = self.upload(ADMIN_IMPORT_MAX_ROWS + 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('manage.py import_employees', response.context['form'].errors['csv_file'][0])
+        self.assertFalse(User.objects.filter(email__startswith='new').exists())
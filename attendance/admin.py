@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from attendance.models import Attendance
+from attendance.models import Attendance, ClockTerminal
 
 # Register your models here.
-admin.site.register(Attendance)
\ No newline at end of file
+admin.site.register(Attendance)
+
+
+@admin.register(ClockTerminal)
+class ClockTerminalAdmin(admin.ModelAdmin):
+    # Tokens are issued with the create_clock_terminal command, only the hash is stored
+    list_display = ('name', 'is_active', 'created_at', 'last_used_at')
+    readonly_fields = ('key_hash', 'created_at', 'last_used_at')
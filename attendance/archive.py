@@ -0,0 +1,35 @@
+from history.archive import ARCHIVE_BATCH_SIZE, archive_rows, get_archive_cutoff, reaches_archive
+
+from .models import ArchivedAttendance, Attendance
+
+
+def archive_attendance(batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move attendance from before the archive cutoff into ArchivedAttendance.
+
+    Weekly payroll summaries and department rollups are left as they are,
+    they already hold the totals of the archived days.
+    """
+    return archive_rows(Attendance.objects.filter(date__lt=get_archive_cutoff()), ArchivedAttendance, batch_size)
+
+
+def iter_attendance_rows(start_date, fields, order_by, **filters):
+    """
+    Tuples of `fields` from Attendance rows matching filters, in order_by order.
+
+    When start_date reaches behind the archive cutoff ArchivedAttendance is
+    read too, in the same query, so archived days count like live ones.
+    """
+    order_fields = [field.lstrip('-') for field in order_by]
+    extra = [field for field in order_fields if field not in fields]
+
+    rows = Attendance.objects.filter(**filters).values_list(*fields, *extra)
+    if reaches_archive(start_date):
+        # Meta.ordering has to go, SQLite refuses ORDER BY inside a UNION
+        rows = rows.order_by().union(
+            ArchivedAttendance.objects.filter(**filters).values_list(*fields, *extra), all=True
+        )
+    rows = rows.order_by(*order_by)
+
+    for row in rows.iterator(chunk_size=2000):
+        yield row[:len(fields)] if extra else row
@@ -0,0 +1,191 @@
+"""
+Bulk ingestion of clock events uploaded by kiosks and badge readers.
+
+A whole upload is validated and applied with a fixed number of statements:
+one read of the employees, one read of the affected attendance rows, one
+upsert of the resulting rows, and set-based follow-ups for presence and the
+weekly payroll summaries. Events follow the same rules as record_time:
+one time in and one time out per employee per day.
+"""
+import zoneinfo
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import Employee
+from accounts.payroll import get_week_range, refresh_weekly_summaries
+from emp_management.models import EmployeePresence
+from history.archive import get_archive_cutoff
+from .models import Attendance, calculate_overtime, get_attendance_date
+from .rollups import refresh_department_rollups
+
+# Timestamps sent without an offset are Manila local time
+CLOCK_TIMEZONE = zoneinfo.ZoneInfo("Asia/Manila")
+
+MAX_EVENTS_PER_UPLOAD = 5000
+
+
+def _parse_event(index, raw):
+    """Validate one raw event. Returns (event dict, None) or (None, error message)"""
+    if not isinstance(raw, dict):
+        return None, 'Event must be an object'
+
+    action = raw.get('type')
+    if action not in ('in', 'out'):
+        return None, 'type must be "in" or "out"'
+
+    try:
+        employee_id = int(raw.get('employee_id'))
+    except (TypeError, ValueError):
+        return None, 'employee_id must be an integer'
+
+    timestamp = parse_datetime(str(raw.get('timestamp', '')))
+    if timestamp is None:
+        return None, 'timestamp must be an ISO 8601 datetime'
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, CLOCK_TIMEZONE)
+    if get_attendance_date(timestamp) < get_archive_cutoff():
+        # That day may already be archived, it would end up in both tables
+        return None, 'timestamp is older than the attendance archive'
+
+    return {
+        'index': index,
+        'type': action,
+        'employee_id': employee_id,
+        'timestamp': timestamp,
+        'date': get_attendance_date(timestamp),
+    }, None
+
+
+def ingest_clock_events(raw_events):
+    """
+    Apply a batch of clock events. Returns one result dict per input event,
+    in input order, with a status of accepted, duplicate, rejected or invalid.
+    """
+    results = [{'id': raw.get('id') if isinstance(raw, dict) else None} for raw in raw_events]
+
+    events = []
+    for index, raw in enumerate(raw_events):
+        event, error = _parse_event(index, raw)
+        if error:
+            results[index].update(status='invalid', error=error)
+        else:
+            events.append(event)
+
+    employees = {
+        employee['pk']: employee
+        for employee in Employee.objects.filter(
+            pk__in={event['employee_id'] for event in events}, active=True
+        ).values('pk', 'weekly_hours', 'slug', 'staff', 'admin')
+    }
+    valid_events = []
+    for event in events:
+        if event['employee_id'] not in employees:
+            results[event['index']].update(status='invalid', error='Unknown or inactive employee')
+        else:
+            valid_events.append(event)
+
+    if not valid_events:
+        return results
+
+    with transaction.atomic():
+        dates = [event['date'] for event in valid_events]
+        rows = {
+            (row['employee_id'], row['date']): row
+            for row in Attendance.objects.select_for_update().filter(
+                employee_id__in={event['employee_id'] for event in valid_events},
+                date__range=[min(dates), max(dates)],
+            ).values('pk', 'employee_id', 'date', 'time_in', 'time_out')
+        }
+
+        # Replay events per employee-day in the order they happened
+        touched = {}
+        for event in sorted(valid_events, key=lambda e: e['timestamp']):
+            key = (event['employee_id'], event['date'])
+            row = touched.get(key) or rows.get(key) or {
+                'pk': None, 'employee_id': key[0], 'date': key[1], 'time_in': None, 'time_out': None,
+            }
+            result = results[event['index']]
+
+            if event['type'] == 'in':
+                if row['time_in'] == event['timestamp']:
+                    result['status'] = 'duplicate'
+                elif row['time_in'] is not None:
+                    result.update(status='rejected', error='Already timed in on this day')
+                else:
+                    row = dict(row, time_in=event['timestamp'])
+                    result['status'] = 'accepted'
+            else:
+                if row['time_out'] == event['timestamp']:
+                    result['status'] = 'duplicate'
+                elif row['time_out'] is not None:
+                    result.update(status='rejected', error='Already timed out on this day')
+                elif row['time_in'] is None or row['time_in'] > event['timestamp']:
+                    result.update(status='rejected', error='Time out without an earlier time in')
+                else:
+                    row = dict(row, time_out=event['timestamp'])
+                    result['status'] = 'accepted'
+
+            if result['status'] == 'accepted':
+                touched[key] = row
+            result['key'] = key
+
+        now = timezone.now()
+        saved = Attendance.objects.bulk_create(
+            [
+                Attendance(
+                    employee_id=row['employee_id'],
+                    date=row['date'],
+                    time_in=row['time_in'],
+                    time_out=row['time_out'],
+                    overtime_hours=Decimal(str(calculate_overtime(
+                        row['time_in'], row['time_out'], employees[row['employee_id']]['weekly_hours']
+                    ))),
+                    updated_at=now,
+                )
+                for row in touched.values()
+            ],
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=['time_in', 'time_out', 'overtime_hours', 'updated_at'],
+        )
+        attendance_ids = {(record.employee_id, record.date): record.pk for record in saved}
+
+        _sync_presence(touched, employees)
+        refresh_weekly_summaries({
+            (employee_id, get_week_range(day)[0]) for employee_id, day in touched
+        })
+        refresh_department_rollups(touched)
+
+    for result in results:
+        key = result.pop('key', None)
+        if key is not None:
+            result['attendance_id'] = attendance_ids.get(key) or rows.get(key, {}).get('pk')
+    return results
+
+
+def _sync_presence(touched, employees):
+    """Set the presence store from each employee's latest touched day, the way Attendance.save does"""
+    from emp_management.presence import publish_presence_changes, store_presence
+
+    latest = {}
+    for (employee_id, day), row in touched.items():
+        if employee_id not in latest or day > latest[employee_id][0]:
+            latest[employee_id] = (day, row)
+
+    states = {True: [], False: []}
+    for employee_id, (day, row) in latest.items():
+        states[row['time_out'] is None].append(employee_id)
+
+    changed = []
+    for is_online, employee_ids in states.items():
+        for pk in store_presence(employee_ids, is_online):
+            employee = Employee(pk=pk, slug=employees[pk]['slug'], staff=employees[pk]['staff'],
+                                admin=employees[pk]['admin'])
+            Employee.presence.related.set_cached_value(
+                employee, EmployeePresence(employee_id=pk, is_online=is_online)
+            )
+            changed.append(employee)
+    publish_presence_changes(changed)
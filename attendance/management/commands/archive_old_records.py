@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.archive import archive_attendance
+from history.archive import ARCHIVE_BATCH_SIZE, archive_employee_history, get_archive_cutoff
+
+
+class Command(BaseCommand):
+    """Move old attendance and employee history rows into their archive tables."""
+    help = 'Archives attendance and employee history older than ARCHIVE_AFTER_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=['attendance', 'history'], help='Archive only one of the two tables.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Rows moved per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        cutoff = get_archive_cutoff()
+        self.stdout.write(f'Archiving rows dated before {cutoff} ({settings.ARCHIVE_AFTER_DAYS} days).')
+
+        jobs = [('attendance', archive_attendance), ('history', archive_employee_history)]
+        for name, archive in jobs:
+            if options['only'] and options['only'] != name:
+                continue
+            moved = 0
+            for batch in archive(options['batch_size']):
+                moved += batch
+                self.stdout.write(f'  {name}: {moved} rows moved so far...')
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} {name} rows.'))
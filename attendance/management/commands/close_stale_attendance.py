@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.sweeper import SWEEP_BATCH_SIZE, close_stale_sessions, get_stale_sessions
+
+
+class Command(BaseCommand):
+    """Auto clock-out for attendance rows that were timed in but never timed out."""
+    help = 'Times out stale attendance sessions at each employee\'s scheduled work end time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Close sessions dated before this day (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help='Rows closed per UPDATE.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale sessions, do not close them.')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            try:
+                before = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["before"]}", expected YYYY-MM-DD.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['dry_run']:
+            count = get_stale_sessions(before).count()
+            self.stdout.write(self.style.SUCCESS(f'Found {count} stale attendance sessions.'))
+            return
+
+        closed = 0
+        for chunk in close_stale_sessions(before, options['batch_size']):
+            closed += chunk
+            self.stdout.write(f'Closed {closed} sessions so far...')
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} stale attendance sessions.'))
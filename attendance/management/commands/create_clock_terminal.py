@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import ClockTerminal
+
+
+class Command(BaseCommand):
+    """Register a kiosk or badge reader and print its API token."""
+    help = 'Creates a clock terminal for the clock event upload API and prints its token once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Unique name of the terminal, e.g. "Lobby kiosk".')
+
+    def handle(self, *args, **options):
+        if ClockTerminal.objects.filter(name=options['name']).exists():
+            raise CommandError(f'A terminal named "{options["name"]}" already exists.')
+
+        terminal, key = ClockTerminal.create_with_key(options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Created terminal "{terminal.name}".'))
+        self.stdout.write(f'Token (shown only once): {key}')
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import Attendance, DepartmentDailyRollup
+from attendance.rollups import compute_department_rollups
+
+
+class Command(BaseCommand):
+    """Backfill or reconcile DepartmentDailyRollup rows from the raw attendance table."""
+    help = 'Rebuilds per-department daily attendance rollups for a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD). Defaults to the oldest attendance record.')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--batch-days', type=int, default=31, help='Days recomputed per grouped query.')
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start_date = self.parse_date(options['start'])
+        else:
+            start_date = Attendance.objects.order_by('date').values_list('date', flat=True).first()
+            if start_date is None:
+                self.stdout.write(self.style.WARNING('No attendance records found. Nothing to rebuild.'))
+                return
+        end_date = self.parse_date(options['end']) if options['end'] else timezone.now().date()
+        if options['batch_days'] < 1:
+            raise CommandError('--batch-days must be at least 1.')
+
+        written = removed = 0
+        batch_start = start_date
+        while batch_start <= end_date:
+            batch_end = min(batch_start + timedelta(days=options['batch_days'] - 1), end_date)
+            fresh = compute_department_rollups(batch_start, batch_end)
+
+            with transaction.atomic():
+                DepartmentDailyRollup.objects.bulk_create(
+                    [DepartmentDailyRollup(date=day, department=department, **values)
+                     for (day, department), values in fresh.items()],
+                    update_conflicts=True,
+                    unique_fields=['date', 'department'],
+                    update_fields=DepartmentDailyRollup.ROLLUP_FIELDS + ['updated_at'],
+                )
+                stale_ids = [
+                    pk for pk, day, department in DepartmentDailyRollup.objects.filter(
+                        date__range=[batch_start, batch_end]
+                    ).values_list('pk', 'date', 'department')
+                    if (day, department) not in fresh
+                ]
+                DepartmentDailyRollup.objects.filter(pk__in=stale_ids).delete()
+
+            written += len(fresh)
+            removed += len(stale_ids)
+            batch_start = batch_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} department rollups between {start_date} and {end_date}, '
+            f'removed {removed} without attendance.'
+        ))
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import Employee
+from accounts.payroll import compute_weekly_summaries, get_week_range
+from attendance.models import Attendance, WeeklyPayrollSummary
+
+
+class Command(BaseCommand):
+    """Reconcile WeeklyPayrollSummary rows against the raw attendance table."""
+    help = 'Rebuilds weekly payroll summaries from attendance records and reports any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to reconcile (YYYY-MM-DD). Defaults to the oldest attendance record.')
+        parser.add_argument('--end', help='Last day to reconcile (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--employee', type=int, action='append', dest='employee_ids', help='Only reconcile this employee id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=200, help='Employees processed per batch.')
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not write anything.')
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start_date = self.parse_date(options['start'])
+        else:
+            oldest = Attendance.objects.order_by('date').values_list('date', flat=True).first()
+            if oldest is None:
+                self.stdout.write(self.style.WARNING('No attendance records found. Nothing to rebuild.'))
+                return
+            start_date = oldest
+        end_date = self.parse_date(options['end']) if options['end'] else get_week_range()[1]
+
+        # Always reconcile whole weeks
+        start_date = get_week_range(start_date)[0]
+        end_date = get_week_range(end_date)[1]
+
+        employees = Employee.objects.order_by('pk')
+        if options['employee_ids']:
+            employees = employees.filter(pk__in=options['employee_ids'])
+        employee_ids = list(employees.values_list('pk', flat=True))
+
+        checked = created = updated = removed = 0
+        batch_size = options['batch_size']
+        for offset in range(0, len(employee_ids), batch_size):
+            batch = employee_ids[offset:offset + batch_size]
+            fresh = compute_weekly_summaries(batch, start_date, end_date)
+            existing = {
+                (summary.employee_id, summary.week_start): summary
+                for summary in WeeklyPayrollSummary.objects.filter(
+                    employee_id__in=batch, week_start__range=[start_date, end_date]
+                )
+            }
+
+            to_write = []
+            for key, values in fresh.items():
+                summary = existing.pop(key, None)
+                if summary is None:
+                    created += 1
+                elif any(getattr(summary, field) != values[field] for field in WeeklyPayrollSummary.SUMMARY_FIELDS):
+                    updated += 1
+                else:
+                    continue
+                to_write.append(WeeklyPayrollSummary(employee_id=key[0], week_start=key[1], **values))
+
+            # Anything left has no completed attendance behind it anymore
+            stale_ids = [summary.pk for summary in existing.values()]
+            removed += len(stale_ids)
+            checked += len(fresh)
+
+            if options['check']:
+                continue
+
+            with transaction.atomic():
+                WeeklyPayrollSummary.objects.bulk_create(
+                    to_write,
+                    update_conflicts=True,
+                    unique_fields=['employee', 'week_start'],
+                    update_fields=WeeklyPayrollSummary.SUMMARY_FIELDS + ['updated_at'],
+                )
+                WeeklyPayrollSummary.objects.filter(pk__in=stale_ids).delete()
+
+        verb = 'Found' if options['check'] else 'Reconciled'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {checked} weekly summaries between {start_date} and {end_date}: '
+            f'{created} missing, {updated} out of date, {removed} without attendance.'
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_overtime_approval_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyPayrollSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(help_text='Monday of the summarized week')),
+                ('weekly_hours', models.DecimalField(decimal_places=2, help_text='Employee weekly_hours the totals were split with', max_digits=5)),
+                ('worked_hours', models.FloatField(default=0)),
+                ('regular_hours', models.FloatField(default=0)),
+                ('approved_overtime_hours', models.FloatField(default=0)),
+                ('total_overtime_hours', models.FloatField(default=0)),
+                ('pending_overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_payroll_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-week_start'],
+                'unique_together': {('employee', 'week_start')},
+            },
+        ),
+    ]
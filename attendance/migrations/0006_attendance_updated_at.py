@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_weeklypayrollsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last time this record changed (used for payroll cache validation)'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_attendance_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(max_length=255)),
+                ('headcount_present', models.PositiveIntegerField(default=0, help_text='Employees who timed in that day')),
+                ('worked_hours', models.FloatField(default=0, help_text='Hours of completed attendance')),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date', 'department'],
+                'unique_together': {('date', 'department')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_departmentdailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('overtime_approved', False), ('overtime_hours__gt', 0), ('overtime_rejected', False)), fields=['date', 'employee'], name='attendance_pending_ot_idx'),
+        ),
+    ]
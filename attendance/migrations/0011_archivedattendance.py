@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_attendance_pending_ot_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('time_in', models.DateTimeField(blank=True, null=True)),
+                ('time_out', models.DateTimeField(blank=True, null=True)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('overtime_approved', models.BooleanField(default=False)),
+                ('overtime_rejected', models.BooleanField(default=False)),
+                ('overtime_approval_date', models.DateTimeField(blank=True, null=True)),
+                ('overtime_notes', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance', to=settings.AUTH_USER_MODEL)),
+                ('overtime_approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='archived_attendance_date_idx')],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
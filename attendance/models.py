@@ -1,5 +1,9 @@
+import hashlib
+import secrets
+from datetime import timedelta, timezone as dt_timezone
+
 from django.utils import timezone
-from django.db import models
+from django.db import connection, models
 
 
 def get_current_date():
@@ -7,6 +11,22 @@ def get_current_date():
     return timezone.now().date()
 
 
+def get_attendance_date(when):
+    """Day an attendance punch at the given moment belongs to (same rule as get_current_date)"""
+    return when.astimezone(dt_timezone.utc).date()
+
+
+def calculate_overtime(time_in, time_out, weekly_hours):
+    """Overtime hours for one day: time worked beyond a fifth of the weekly hours"""
+    if time_in and time_out:
+        duration = time_out - time_in
+        hours_worked = duration.total_seconds() / 3600
+        expected_daily_hours = float(weekly_hours) / 5
+        overtime = max(0, hours_worked - expected_daily_hours)
+        return round(overtime, 2)
+    return 0
+
+
 class Attendance(models.Model):
     employee = models.ForeignKey('accounts.Employee', on_delete=models.CASCADE)
     date = models.DateField(default=get_current_date)
@@ -21,9 +41,22 @@ class Attendance(models.Model):
     overtime_approval_date = models.DateTimeField(null=True, blank=True, help_text="When overtime was approved/rejected")
     overtime_notes = models.TextField(blank=True, help_text="Admin notes about overtime approval/rejection")
 
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last time this record changed (used for payroll cache validation)")
+
     class Meta:
+        # The unique constraint also serves as the (employee, date) lookup index
         unique_together = ('employee', 'date')
         ordering = ['-date']
+        indexes = [
+            # Date range scans and the (date, id) keyset pagination of the staff list
+            models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+            # Only the small set of pending overtime rows, for the approval dashboard
+            models.Index(
+                fields=['date', 'employee'],
+                name='attendance_pending_ot_idx',
+                condition=models.Q(overtime_hours__gt=0, overtime_approved=False, overtime_rejected=False),
+            ),
+        ]
 
     def __str__(self):
         return f"Attendance for {self.employee} on {self.date}"
@@ -31,11 +64,7 @@ class Attendance(models.Model):
     def calculate_overtime_hours(self):
         """Calculate overtime hours based on time worked vs expected daily hours"""
         if self.time_in and self.time_out:
-            duration = self.time_out - self.time_in
-            hours_worked = duration.total_seconds() / 3600
-            expected_daily_hours = float(self.employee.weekly_hours) / 5
-            overtime = max(0, hours_worked - expected_daily_hours)
-            return round(overtime, 2)
+            return calculate_overtime(self.time_in, self.time_out, self.employee.weekly_hours)
         return 0
 
     def approve_overtime(self, approved_by, notes=""):
@@ -72,18 +101,97 @@ class Attendance(models.Model):
         # Calculate overtime hours automatically
         self.overtime_hours = self.calculate_overtime_hours()
 
+        super().save(*args, **kwargs)
+
         # Update employee's online status based on attendance
         if self.time_in and not self.time_out:
             # Employee clocked in - set as online/working
-            self.employee.is_online = True
+            self.set_employee_online(self.employee, True)
         elif self.time_out:
             # Employee clocked out - set as offline
-            self.employee.is_online = False
+            self.set_employee_online(self.employee, False)
 
-        # Save the employee status
-        self.employee.save(update_fields=['is_online'])
+    @classmethod
+    def clock_in(cls, employee, when=None):
+        """
+        Record today's time in with a single INSERT ... ON CONFLICT DO NOTHING.
 
-        super().save(*args, **kwargs)
+        Safe under concurrent requests: the (employee, date) unique constraint
+        decides the winner, so double-clicks never raise IntegrityError.
+        Returns True if this call created the record.
+        """
+        when = when or timezone.now()
+        values = {
+            'employee': employee.pk,
+            'date': get_attendance_date(when),
+            'time_in': when,
+            'overtime_hours': 0,
+            'overtime_approved': False,
+            'overtime_rejected': False,
+            'overtime_notes': '',
+            'updated_at': timezone.now(),
+        }
+        fields = [cls._meta.get_field(name) for name in values]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {table} ({columns}) VALUES ({params}) ON CONFLICT ({employee}, {date}) DO NOTHING'.format(
+            table=quote(cls._meta.db_table),
+            columns=', '.join(quote(field.column) for field in fields),
+            params=', '.join(['%s'] * len(fields)),
+            employee=quote(cls._meta.get_field('employee').column),
+            date=quote(cls._meta.get_field('date').column),
+        )
+        params = [field.get_db_prep_save(values[field.name], connection) for field in fields]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            created = cursor.rowcount == 1
+
+        if created:
+            from .rollups import refresh_department_rollups
+
+            cls.set_employee_online(employee, True)
+            refresh_department_rollups([(employee.pk, values['date'])])
+        return created
+
+    @classmethod
+    def clock_out(cls, employee, when=None):
+        """
+        Record today's time out with one read and one conditional UPDATE.
+
+        The UPDATE only matches while time_out is still empty, so two racing
+        requests cannot both clock out. Returns "ok", "not_timed_in" or
+        "already_timed_out".
+        """
+        from accounts.payroll import get_week_range, refresh_weekly_summaries
+        from .rollups import refresh_department_rollups
+
+        when = when or timezone.now()
+        today = get_attendance_date(when)
+        record = cls.objects.filter(employee=employee, date=today).values('pk', 'time_in', 'time_out').first()
+        if record is None or record['time_in'] is None:
+            return 'not_timed_in'
+        if record['time_out'] is not None:
+            return 'already_timed_out'
+
+        updated = cls.objects.filter(pk=record['pk'], time_out__isnull=True).update(
+            time_out=when,
+            overtime_hours=calculate_overtime(record['time_in'], when, employee.weekly_hours),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            return 'already_timed_out'
+
+        cls.set_employee_online(employee, False)
+        refresh_weekly_summaries([(employee.pk, get_week_range(today)[0])])
+        refresh_department_rollups([(employee.pk, today)])
+        return 'ok'
+
+    @staticmethod
+    def set_employee_online(employee, is_online):
+        """Write the presence store (only when the state flips) and publish the change"""
+        from emp_management.presence import set_online
+
+        set_online(employee, is_online)
 
     @property
     def duration(self):
@@ -112,3 +220,152 @@ class Attendance(models.Model):
     def is_ongoing(self):
         """Check if employee has clocked in but not clocked out"""
         return self.time_in is not None and self.time_out is None
+
+
+class ArchivedAttendance(models.Model):
+    """
+    Cold storage for Attendance rows older than ARCHIVE_AFTER_DAYS.
+
+    Same columns and ids as Attendance but only the indexes the read-through
+    queries need. Rows are moved here by archive_old_records and read back by
+    attendance.archive whenever a requested period reaches this far back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey('accounts.Employee', on_delete=models.CASCADE, related_name='archived_attendance')
+    date = models.DateField()
+    time_in = models.DateTimeField(null=True, blank=True)
+    time_out = models.DateTimeField(null=True, blank=True)
+    overtime_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    overtime_approved = models.BooleanField(default=False)
+    overtime_rejected = models.BooleanField(default=False)
+    overtime_approved_by = models.ForeignKey('accounts.Employee', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    overtime_approval_date = models.DateTimeField(null=True, blank=True)
+    overtime_notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('employee', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='archived_attendance_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived attendance for {self.employee} on {self.date}"
+
+
+class WeeklyPayrollSummary(models.Model):
+    """
+    Per-employee, per-week payroll totals kept in step with Attendance.
+
+    Hours are stored unrounded so breakdowns built from a summary match
+    Employee.calculate_payroll_breakdown exactly. Pay is derived on read from
+    the employee's current rates, so rate changes never invalidate a row.
+    """
+    SUMMARY_FIELDS = [
+        'weekly_hours', 'worked_hours', 'regular_hours',
+        'approved_overtime_hours', 'total_overtime_hours', 'pending_overtime_hours',
+    ]
+
+    employee = models.ForeignKey('accounts.Employee', on_delete=models.CASCADE, related_name='weekly_payroll_summaries')
+    week_start = models.DateField(help_text="Monday of the summarized week")
+    weekly_hours = models.DecimalField(max_digits=5, decimal_places=2, help_text="Employee weekly_hours the totals were split with")
+    worked_hours = models.FloatField(default=0)
+    regular_hours = models.FloatField(default=0)
+    approved_overtime_hours = models.FloatField(default=0)
+    total_overtime_hours = models.FloatField(default=0)
+    pending_overtime_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'week_start')
+        ordering = ['-week_start']
+
+    def __str__(self):
+        return f"Payroll summary for {self.employee} week of {self.week_start}"
+
+    @classmethod
+    def empty_values(cls, weekly_hours):
+        """Summary values for a week without any completed attendance"""
+        return {
+            'weekly_hours': weekly_hours,
+            'worked_hours': 0,
+            'regular_hours': 0,
+            'approved_overtime_hours': 0,
+            'total_overtime_hours': 0,
+            'pending_overtime_hours': 0,
+        }
+
+    @property
+    def week_end(self):
+        return self.week_start + timedelta(days=6)
+
+    def to_breakdown(self, employee=None):
+        """Return the same dict as Employee.calculate_payroll_breakdown for this week"""
+        from accounts.payroll import build_payroll_breakdown
+
+        return build_payroll_breakdown(
+            employee or self.employee,
+            self.regular_hours,
+            self.approved_overtime_hours,
+            self.total_overtime_hours,
+            self.week_start,
+            self.week_end,
+        )
+
+
+class DepartmentDailyRollup(models.Model):
+    """
+    Per-department, per-day attendance totals for the staff charts.
+
+    Kept in step with Attendance writes by attendance.rollups; employees are
+    counted under the department they belong to when the day was last
+    refreshed. rebuild_department_rollups recomputes any range from scratch.
+    """
+    ROLLUP_FIELDS = ['headcount_present', 'worked_hours', 'overtime_hours']
+
+    date = models.DateField()
+    department = models.CharField(max_length=255)
+    headcount_present = models.PositiveIntegerField(default=0, help_text="Employees who timed in that day")
+    worked_hours = models.FloatField(default=0, help_text="Hours of completed attendance")
+    overtime_hours = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('date', 'department')
+        ordering = ['date', 'department']
+
+    def __str__(self):
+        return f"{self.department} on {self.date}"
+
+
+class ClockTerminal(models.Model):
+    """A kiosk or badge reader allowed to upload clock events with an API token"""
+    name = models.CharField(max_length=255, unique=True)
+    key_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the terminal's API token")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def create_with_key(cls, name):
+        """Create a terminal and return it with its raw token (only the hash is stored)"""
+        key = secrets.token_hex(20)
+        terminal = cls.objects.create(name=name, key_hash=cls.hash_key(key))
+        return terminal, key
+
+    @classmethod
+    def authenticate(cls, key):
+        """Return the active terminal for a raw token, or None"""
+        if not key:
+            return None
+        return cls.objects.filter(key_hash=cls.hash_key(key), is_active=True).first()
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import Attendance
+
+OVERTIME_ACTIONS = ('approve', 'reject')
+
+
+class OvertimeSelectionError(ValueError):
+    """The request did not describe which attendance records to review"""
+
+
+def pending_overtime():
+    """Attendance with overtime that nobody has approved or rejected yet"""
+    return Attendance.objects.filter(overtime_hours__gt=0, overtime_approved=False, overtime_rejected=False)
+
+
+def pending_overtime_by_week(department=None, start_date=None, end_date=None):
+    """
+    Pending overtime grouped by employee and week, one aggregated query.
+
+    Each row has employee_id, the employee's name and department, week
+    (the Monday), days and hours.
+    """
+    records = pending_overtime()
+    if department:
+        records = records.filter(employee__department=department)
+    if start_date:
+        records = records.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(date__lte=end_date)
+
+    return records.annotate(week=TruncWeek('date')).values(
+        'employee_id', 'employee__first_name', 'employee__last_name', 'employee__department', 'week',
+    ).annotate(
+        days=Count('id'),
+        hours=Sum('overtime_hours'),
+    ).order_by('week', 'employee__last_name', 'employee__first_name', 'employee_id')
+
+
+def select_overtime(ids=None, department=None, start_date=None, end_date=None, employee=None):
+    """
+    Attendance records a bulk review applies to.
+
+    Explicit ids are taken as-is (so a decision can be changed); otherwise a
+    start_date/end_date period is required, optionally narrowed to one
+    department or employee, and only still-pending overtime is selected.
+    """
+    if ids:
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            raise OvertimeSelectionError('ids must be a list of attendance ids')
+        return Attendance.objects.filter(pk__in=ids, overtime_hours__gt=0)
+
+    if not (start_date and end_date):
+        raise OvertimeSelectionError('Give attendance ids or a start_date and end_date')
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise OvertimeSelectionError('Dates must be YYYY-MM-DD')
+
+    records = pending_overtime().filter(date__range=[start_date, end_date])
+    if department:
+        records = records.filter(employee__department=department)
+    if employee:
+        try:
+            records = records.filter(employee_id=int(employee))
+        except (TypeError, ValueError):
+            raise OvertimeSelectionError('employee must be an employee id')
+    return records
+
+
+def review_overtime(records, action, reviewed_by, notes=''):
+    """
+    Approve or reject the overtime of many attendance records at once.
+
+    One UPDATE writes the decision with who made it, when and the notes,
+    inside a single transaction together with the payroll summary refresh.
+    Overtime hours are not recalculated, the decision does not change them.
+    Returns the number of records reviewed.
+    """
+    from accounts.payroll import get_week_range, refresh_weekly_summaries
+
+    if action not in OVERTIME_ACTIONS:
+        raise ValueError(f'Unknown overtime action "{action}"')
+
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(records.select_for_update(of=('self',)).values_list('pk', 'employee_id', 'date'))
+        if not rows:
+            return 0
+
+        Attendance.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            overtime_approved=action == 'approve',
+            overtime_rejected=action == 'reject',
+            overtime_approved_by=reviewed_by,
+            overtime_approval_date=now,
+            overtime_notes=notes,
+            updated_at=now,
+        )
+        # Bulk updates skip the post_save signal, refresh the summaries ourselves
+        refresh_weekly_summaries({(employee_id, get_week_range(day)[0]) for _, employee_id, day in rows})
+    return len(rows)
@@ -0,0 +1,132 @@
+import hashlib
+from heapq import merge
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+# How long an exact COUNT(*) is reused before it is run again
+COUNT_CACHE_SECONDS = 300
+
+
+class KeysetPage:
+    """
+    One page of a (date, id) keyset pagination, newest first.
+
+    Mirrors the parts of Django's Page the templates use, but navigates with
+    opaque cursors instead of page numbers so deep pages cost the same as
+    the first one.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, total_count, field='date'):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.total_count = total_count
+        self.field = field
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1], self.field) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0], self.field) if self._has_previous else None
+
+
+def encode_cursor(record, field='date'):
+    """Cursor pointing at a record, e.g. "2025-01-06.42" """
+    return f"{getattr(record, field).isoformat()}.{record.pk}"
+
+
+def decode_cursor(cursor, model_field):
+    """(value, id) from a cursor, or None if it is malformed"""
+    # Datetimes carry a '.' of their own, the id is after the last one
+    value, _, pk = (cursor or '').rpartition('.')
+    try:
+        return model_field.to_python(value), int(pk)
+    except (ValidationError, ValueError):
+        return None
+
+
+def paginate_by_date(queryset, page_size, after=None, before=None, field='date'):
+    """
+    Keyset-paginate a queryset with a date (or datetime) field and id, newest first.
+
+    "after" returns the page following a cursor, "before" the page preceding
+    it; with neither the first page is returned. Uses the (field, id) index,
+    so the cost does not grow with how deep the page is.
+
+    queryset may also be a list of querysets over tables with the same
+    columns (e.g. a live table and its archive); each is read with the same
+    bounds and the rows are merged into one page.
+    """
+    querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+    model_field = querysets[0].model._meta.get_field(field)
+    total_count = sum(estimate_count(queryset) for queryset in querysets)
+    after, before = decode_cursor(after, model_field), decode_cursor(before, model_field)
+
+    def fetch(descending, bound=None):
+        """First page_size + 1 rows in order, from all querysets together"""
+        sign = '-' if descending else ''
+        lookup = 'lt' if descending else 'gt'
+        pages = []
+        for queryset in querysets:
+            if bound:
+                value, pk = bound
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk}),
+                    **{f'{field}__{lookup}e': value},
+                )
+            pages.append(list(queryset.order_by(f'{sign}{field}', f'{sign}id')[:page_size + 1]))
+        if len(pages) == 1:
+            return pages[0]
+        rows = merge(*pages, key=lambda row: (getattr(row, field), row.pk), reverse=descending)
+        return list(rows)[:page_size + 1]
+
+    if before:
+        rows = fetch(False, before)
+        has_previous = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], True, has_previous, total_count, field)
+
+    rows = fetch(True, after)
+    return KeysetPage(rows[:page_size], len(rows) > page_size, after is not None, total_count, field)
+
+
+def estimate_count(queryset):
+    """
+    Row count for display purposes.
+
+    Unfiltered tables on PostgreSQL use the planner's estimate; everything
+    else runs the exact COUNT once and caches it for a few minutes.
+    """
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been analyzed
+        if row and row[0] >= 0:
+            return row[0]
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    key = 'count:' + hashlib.sha256(f"{sql}{params}".encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_SECONDS)
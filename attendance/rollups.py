@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+from .models import ArchivedAttendance, Attendance, DepartmentDailyRollup
+
+
+def compute_department_rollups(start_date, end_date, departments=None):
+    """
+    Department totals straight from the attendance table, one grouped query
+    (plus one over ArchivedAttendance when the range reaches the archive).
+
+    Returns a dict keyed by (date, department) for every day in the range
+    with at least one time in.
+    """
+    from history.archive import reaches_archive
+
+    sources = [Attendance]
+    if reaches_archive(start_date):
+        sources.append(ArchivedAttendance)
+
+    rollups = {}
+    for model in sources:
+        records = model.objects.filter(date__range=[start_date, end_date], time_in__isnull=False)
+        if departments is not None:
+            records = records.filter(employee__department__in=departments)
+
+        rows = records.values('date', 'employee__department').annotate(
+            headcount_present=Count('employee', distinct=True),
+            worked=Sum(
+                ExpressionWrapper(F('time_out') - F('time_in'), output_field=DurationField()),
+                filter=Q(time_out__isnull=False),
+            ),
+            overtime=Sum('overtime_hours'),
+        ).order_by()
+
+        # An employee-day lives in exactly one of the tables, so the totals add up
+        for row in rows:
+            totals = rollups.setdefault((row['date'], row['employee__department']), {
+                'headcount_present': 0, 'worked_hours': 0, 'overtime_hours': 0,
+            })
+            totals['headcount_present'] += row['headcount_present']
+            totals['worked_hours'] += row['worked'].total_seconds() / 3600 if row['worked'] else 0
+            totals['overtime_hours'] += row['overtime'] or 0
+    return rollups
+
+
+def write_department_rollups(keys, fresh):
+    """Upsert fresh values for the given (date, department) keys and drop keys without attendance"""
+    rollups = [
+        DepartmentDailyRollup(date=day, department=department, **fresh[(day, department)])
+        for day, department in keys if (day, department) in fresh
+    ]
+    empty = [key for key in keys if key not in fresh]
+
+    with transaction.atomic():
+        DepartmentDailyRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['date', 'department'],
+            update_fields=DepartmentDailyRollup.ROLLUP_FIELDS + ['updated_at'],
+        )
+        if empty:
+            condition = Q()
+            for day, department in empty:
+                condition |= Q(date=day, department=department)
+            DepartmentDailyRollup.objects.filter(condition).delete()
+
+
+def refresh_department_rollups(employee_days):
+    """
+    Bring the rollups behind the given (employee_id, date) pairs back in line
+    with the attendance table. Only the touched department-days are recomputed.
+    """
+    from accounts.models import Employee
+
+    employee_days = set(employee_days)
+    if not employee_days:
+        return
+
+    departments = dict(
+        Employee.objects.filter(pk__in={employee_id for employee_id, _ in employee_days})
+        .values_list('pk', 'department')
+    )
+    keys = {
+        (day, departments[employee_id])
+        for employee_id, day in employee_days if employee_id in departments
+    }
+    if not keys:
+        return
+
+    days = [day for day, _ in keys]
+    fresh = compute_department_rollups(min(days), max(days), {department for _, department in keys})
+    write_department_rollups(keys, fresh)
+
+
+def employee_attendance_days(employee_id):
+    """Every day the employee has a time in on, live or archived"""
+    days = set(Attendance.objects.filter(employee_id=employee_id, time_in__isnull=False).values_list('date', flat=True))
+    days.update(ArchivedAttendance.objects.filter(employee_id=employee_id, time_in__isnull=False).values_list('date', flat=True))
+    return days
+
+
+def refresh_department_days(days, departments):
+    """Recompute every (day, department) pair of the given days and departments"""
+    if not days:
+        return
+    keys = {(day, department) for day in days for department in departments}
+    fresh = compute_department_rollups(min(days), max(days), departments)
+    write_department_rollups(keys, fresh)
+
+
+def refresh_department_move(employee_id, old_department, new_department):
+    """
+    Rollups are grouped by the employee's current department, so after a
+    move every day the employee has attendance on is recomputed for both
+    the department they left and the one they joined.
+    """
+    refresh_department_days(employee_attendance_days(employee_id), {old_department, new_department})
+
+
+def get_department_rollups(start_date, end_date, departments=None):
+    """Rollup rows for a date range, oldest day first"""
+    rollups = DepartmentDailyRollup.objects.filter(date__range=[start_date, end_date])
+    if departments:
+        rollups = rollups.filter(department__in=departments)
+    return rollups.values('date', 'department', *DepartmentDailyRollup.ROLLUP_FIELDS)
@@ -0,0 +1,73 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import Employee
+from accounts.payroll import get_week_range, refresh_weekly_summaries
+from .models import Attendance, WeeklyPayrollSummary
+from .rollups import employee_attendance_days, refresh_department_days, refresh_department_move, refresh_department_rollups
+
+
+@receiver(post_save, sender=Attendance)
+def update_weekly_summary(sender, instance, **kwargs):
+    """Keep the week's payroll summary and department rollup in step with every attendance write (covers overtime approve/reject too)."""
+    refresh_weekly_summaries([(instance.employee_id, get_week_range(instance.date)[0])])
+    refresh_department_rollups([(instance.employee_id, instance.date)])
+
+
+@receiver(post_delete, sender=Attendance)
+def update_weekly_summary_on_delete(sender, instance, origin=None, **kwargs):
+    # Skip cascades from deleting the employee, the summaries are going too
+    # and update_rollups_for_deleted_employee redoes the rollups in one go
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Employee:
+        return
+    refresh_weekly_summaries([(instance.employee_id, get_week_range(instance.date)[0])])
+    refresh_department_rollups([(instance.employee_id, instance.date)])
+
+
+@receiver(post_save, sender=Employee)
+def update_summaries_for_schedule_change(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Re-split summaries when weekly_hours changes. Rate changes need nothing
+    here because pay is derived from the current rates on read.
+    """
+    if created or (update_fields is not None and 'weekly_hours' not in update_fields):
+        return
+
+    stale_weeks = WeeklyPayrollSummary.objects.filter(employee=instance).exclude(
+        weekly_hours=instance.weekly_hours
+    ).values_list('week_start', flat=True)
+    refresh_weekly_summaries([(instance.pk, week_start) for week_start in stale_weeks])
+
+
+@receiver(post_init, sender=Employee)
+def remember_department(sender, instance, **kwargs):
+    """The department as loaded, so a move is noticed on save without a query"""
+    # Deferred fields are not in __dict__; reading them would cost a query
+    if 'department' in instance.__dict__:
+        instance.__dict__['_rollup_department'] = instance.__dict__['department']
+
+
+@receiver(post_save, sender=Employee)
+def update_rollups_for_department_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Move the employee's days from the old department's rollups to the new one's"""
+    if update_fields is not None and 'department' not in update_fields:
+        return
+    old_department = instance.__dict__.get('_rollup_department', instance.department)
+    instance.__dict__['_rollup_department'] = instance.department
+    if created or raw or old_department == instance.department:
+        return
+    refresh_department_move(instance.pk, old_department, instance.department)
+
+
+@receiver(pre_delete, sender=Employee)
+def remember_attendance_days(sender, instance, **kwargs):
+    """The days the employee's attendance counts on, read before the cascade removes it"""
+    instance.__dict__['_rollup_days'] = employee_attendance_days(instance.pk)
+
+
+@receiver(post_delete, sender=Employee)
+def update_rollups_for_deleted_employee(sender, instance, **kwargs):
+    """Take a deleted employee's attendance out of their department's rollups"""
+    refresh_department_days(instance.__dict__.pop('_rollup_days', set()), {instance.department})
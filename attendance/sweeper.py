@@ -0,0 +1,93 @@
+"""
+Automatic clock-out of attendance sessions nobody closed.
+
+Open rows from earlier days are read as plain tuples in primary-key chunks
+and closed with one CASE-based UPDATE per chunk, so tens of thousands of
+forgotten time-outs never turn into per-row saves.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, DecimalField, Value, When
+from django.utils import timezone
+
+from accounts.payroll import get_week_range, refresh_weekly_summaries
+from .ingest import CLOCK_TIMEZONE
+from .models import Attendance, calculate_overtime, get_current_date
+from .rollups import refresh_department_rollups
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def get_scheduled_time_out(day, time_in, work_end_time):
+    """
+    Scheduled end of the shift a session belongs to: work_end_time (Manila)
+    on the attendance date, or the time in itself if it started later.
+    """
+    scheduled = datetime.combine(day, work_end_time, tzinfo=CLOCK_TIMEZONE)
+    return max(scheduled, time_in)
+
+
+def get_stale_sessions(before=None):
+    """Rows timed in but never timed out on a day before `before` (default today)"""
+    return Attendance.objects.filter(
+        time_in__isnull=False,
+        time_out__isnull=True,
+        date__lt=before or get_current_date(),
+    )
+
+
+def close_stale_sessions(before=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Time out every stale session at its scheduled end of work.
+
+    Each chunk is one read, one UPDATE (guarded on time_out still being
+    empty) and set-based refreshes of presence, weekly summaries and
+    department rollups, all in one transaction. Yields the number of rows
+    closed per chunk.
+    """
+    stale = get_stale_sessions(before).order_by('pk')
+    last_pk = 0
+    while True:
+        rows = list(stale.filter(pk__gt=last_pk).values_list(
+            'pk', 'employee_id', 'date', 'time_in', 'employee__work_end_time', 'employee__weekly_hours',
+        )[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+
+        time_outs, overtime = [], []
+        for pk, _, day, time_in, work_end_time, weekly_hours in rows:
+            time_out = get_scheduled_time_out(day, time_in, work_end_time)
+            # Same overtime rule as Attendance.clock_out
+            time_outs.append(When(pk=pk, then=Value(time_out)))
+            overtime.append(When(pk=pk, then=Value(Decimal(str(calculate_overtime(time_in, time_out, weekly_hours))))))
+
+        with transaction.atomic():
+            closed = Attendance.objects.filter(pk__in=[row[0] for row in rows], time_out__isnull=True).update(
+                time_out=Case(*time_outs, output_field=DateTimeField()),
+                overtime_hours=Case(*overtime, output_field=DecimalField(max_digits=5, decimal_places=2)),
+                updated_at=timezone.now(),
+            )
+            employee_days = {(employee_id, day) for _, employee_id, day, *_ in rows}
+            _set_offline({employee_id for employee_id, _ in employee_days})
+            refresh_weekly_summaries({(employee_id, get_week_range(day)[0]) for employee_id, day in employee_days})
+            refresh_department_rollups(employee_days)
+        yield closed
+
+
+def _set_offline(employee_ids):
+    """Mark employees offline unless they have a session open right now"""
+    from accounts.models import Employee
+    from emp_management.presence import publish_presence_changes, store_presence
+
+    still_working = set(
+        Attendance.objects.filter(
+            employee_id__in=employee_ids, time_in__isnull=False, time_out__isnull=True,
+            date__gte=get_current_date(),
+        ).values_list('employee_id', flat=True)
+    )
+    flipped = store_presence(employee_ids - still_working, False)
+    if flipped:
+        publish_presence_changes(Employee.objects.filter(pk__in=flipped).select_related('presence'))
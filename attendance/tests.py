@@ -1,3 +1,471 @@
-from django.test import TestCase
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from threading import Barrier
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.payroll import calculate_payroll_breakdowns, get_weekly_payroll_breakdowns
+from history.archive import employee_history_sources, get_archive_cutoff
+from history.models import EmployeeHistory
+from .ingest import ingest_clock_events
+from .models import ArchivedAttendance, Attendance, ClockTerminal, DepartmentDailyRollup, WeeklyPayrollSummary
+from .rollups import compute_department_rollups
+from .sweeper import close_stale_sessions
+
+User = get_user_model()
+
+
+class WeeklyPayrollSummaryTest(TestCase):
+    def setUp(self):
+        self.week_start = date(2025, 3, 3)  # Monday
+        self.week_end = self.week_start + timedelta(days=6)
+        self.employee = User.objects.create_user(
+            email='summary@gmail.com',
+            password='password123',
+            first_name='Sum',
+            last_name='Mary',
+            salary=500,
+        )
+        self.records = []
+        for day in range(4):
+            time_in = timezone.make_aware(datetime(2025, 3, 3 + day, 8, 0))
+            self.records.append(Attendance.objects.create(
+                employee=self.employee,
+                date=self.week_start + timedelta(days=day),
+                time_in=time_in,
+                time_out=time_in + timedelta(hours=8, minutes=25 * day),
+            ))
+
+    def assertSummaryMatches(self):
+        self.employee.refresh_from_db()
+        summary = WeeklyPayrollSummary.objects.get(employee=self.employee, week_start=self.week_start)
+        self.assertEqual(
+            summary.to_breakdown(self.employee),
+            self.employee.calculate_payroll_breakdown(self.week_start, self.week_end)
+        )
+        return summary
+
+    def test_summary_follows_attendance_writes(self):
+        self.assertSummaryMatches()
+        self.records[2].approve_overtime(approved_by=self.employee)
+        self.records[3].reject_overtime(rejected_by=self.employee)
+        summary = self.assertSummaryMatches()
+        self.records[1].refresh_from_db()
+        self.assertEqual(summary.pending_overtime_hours, self.records[1].overtime_hours)
+        self.records[1].delete()
+        summary = self.assertSummaryMatches()
+        self.assertEqual(summary.pending_overtime_hours, 0)
+
+    def test_summary_follows_schedule_and_rate_changes(self):
+        self.employee.weekly_hours = 35
+        self.employee.salary = 700
+        self.employee.save()
+        self.assertSummaryMatches()
+
+    def test_weekly_breakdowns_read_from_summary(self):
+        with self.assertNumQueries(1):
+            breakdowns = get_weekly_payroll_breakdowns([self.employee], self.week_start)
+        self.assertEqual(
+            breakdowns[self.employee.pk],
+            self.employee.calculate_payroll_breakdown(self.week_start, self.week_end)
+        )
+
+    def test_rebuild_command_repairs_drift(self):
+        WeeklyPayrollSummary.objects.update(regular_hours=0)
+        out = StringIO()
+        call_command('rebuild_payroll_summaries', '--check', stdout=out)
+        self.assertIn('1 out of date', out.getvalue())
+        call_command('rebuild_payroll_summaries', stdout=StringIO())
+        self.assertSummaryMatches()
+
+
+class ClockEventIngestionTest(TestCase):
+    def setUp(self):
+        self.terminal, self.key = ClockTerminal.create_with_key('Lobby kiosk')
+        self.url = reverse('attendance:ingest_clock_events')
+        self.employees = [
+            User.objects.create_user(
+                email=f'kiosk{i}@gmail.com', password='password123', first_name='Kio', last_name=f'Sk{i}'
+            )
+            for i in range(3)
+        ]
+
+    def post(self, events, key=None):
+        return self.client.post(
+            self.url,
+            data={'events': events},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {key or self.key}',
+        )
+
+    def test_requires_terminal_token(self):
+        self.assertEqual(self.post([], key='wrong').status_code, 401)
+
+    def test_batch_upsert_with_per_event_status(self):
+        events = []
+        for employee in self.employees:
+            events.append({'id': f'{employee.pk}-in', 'employee_id': employee.pk, 'type': 'in',
+                           'timestamp': '2025-03-03T08:00:00+08:00'})
+            events.append({'id': f'{employee.pk}-out', 'employee_id': employee.pk, 'type': 'out',
+                           'timestamp': '2025-03-03T18:30:00+08:00'})
+        events.append({'id': 'bad', 'employee_id': 999999, 'type': 'in', 'timestamp': '2025-03-03T08:00:00'})
+        events.append({'id': 'late-in', 'employee_id': self.employees[0].pk, 'type': 'in',
+                       'timestamp': '2025-03-03T09:00:00+08:00'})
+
+        data = self.post(events).json()
+        self.assertEqual(data['counts'], {'accepted': 6, 'invalid': 1, 'rejected': 1})
+        self.assertEqual([r['status'] for r in data['results']][-2:], ['invalid', 'rejected'])
+
+        for employee in self.employees:
+            record = Attendance.objects.get(employee=employee, date=date(2025, 3, 3))
+            self.assertEqual(float(record.overtime_hours), 2.5)
+        self.assertEqual(WeeklyPayrollSummary.objects.filter(week_start=date(2025, 3, 3)).count(), 3)
+
+        # Re-uploading the same buffer is idempotent
+        again = self.post(events[:6]).json()
+        self.assertEqual(again['counts'], {'duplicate': 6})
+
+
+class AttendanceListPaginationTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='lister@gmail.com', password='password123', first_name='Li', last_name='Ster'
+        )
+        employees = [
+            User.objects.create_user(
+                email=f'paged{i}@gmail.com', password='password123', first_name='Paged', last_name=str(i)
+            )
+            for i in range(3)
+        ]
+        # Several employees per day so the id tie-breaker matters
+        for day in range(15):
+            for employee in employees:
+                Attendance.objects.create(employee=employee, date=date(2025, 1, 1) + timedelta(days=day))
+        self.client.force_login(self.staff)
+        self.url = reverse('attendance:attendance_list')
+
+    def test_cursor_walk_covers_every_record_once(self):
+        expected = list(Attendance.objects.order_by('-date', '-id').values_list('pk', flat=True))
+
+        seen, pages, params = [], [], {}
+        while True:
+            page = self.client.get(self.url, params).context['page_obj']
+            pages.append(params)
+            seen.extend(record.pk for record in page)
+            self.assertEqual(page.total_count, len(expected))
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page returns the previous page unchanged
+        last = self.client.get(self.url, pages[-1]).context['page_obj']
+        previous = self.client.get(self.url, {'before': last.previous_cursor}).context['page_obj']
+        self.assertEqual([r.pk for r in previous], expected[-len(last) - 20:-len(last)])
+        self.assertFalse(self.client.get(self.url).context['page_obj'].has_previous())
+
+
+class DepartmentRollupTest(TestCase):
+    def setUp(self):
+        self.day = date(2025, 3, 4)
+        self.staff = User.objects.create_staffuser(
+            email='charts@gmail.com', password='password123', first_name='Char', last_name='Ts'
+        )
+        self.sales = [
+            User.objects.create_user(
+                email=f'sales{i}@gmail.com', password='password123', first_name='Sales', last_name=str(i),
+                department='Sales',
+            )
+            for i in range(2)
+        ]
+        self.it = User.objects.create_user(
+            email='it@gmail.com', password='password123', first_name='I', last_name='T', department='IT'
+        )
+        time_in = timezone.make_aware(datetime(2025, 3, 4, 8, 0))
+        for employee, hours in [(self.sales[0], 9), (self.sales[1], 8), (self.it, 10)]:
+            Attendance.objects.create(
+                employee=employee, date=self.day, time_in=time_in, time_out=time_in + timedelta(hours=hours)
+            )
+
+    def rollups(self):
+        return {
+            row.department: (row.headcount_present, row.worked_hours, row.overtime_hours)
+            for row in DepartmentDailyRollup.objects.filter(date=self.day)
+        }
+
+    def test_rollups_follow_attendance_and_backfill_agrees(self):
+        self.assertEqual(self.rollups(), {'Sales': (2, 17.0, Decimal('1.00')), 'IT': (1, 10.0, Decimal('2.00'))})
+
+        Attendance.objects.get(employee=self.it).delete()
+        self.assertEqual(set(self.rollups()), {'Sales'})
+
+        incremental = self.rollups()
+        DepartmentDailyRollup.objects.all().delete()
+        call_command('rebuild_department_rollups', start='2025-03-01', end='2025-03-31', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_department_move_is_not_double_counted(self):
+        employee = User.objects.get(pk=self.sales[1].pk)
+        employee.department = 'IT'
+        employee.save()
+        self.assertEqual(self.rollups(), {'Sales': (1, 9.0, Decimal('1.00')), 'IT': (2, 18.0, Decimal('2.00'))})
+
+        incremental = self.rollups()
+        DepartmentDailyRollup.objects.all().delete()
+        call_command('rebuild_department_rollups', start='2025-03-01', end='2025-03-31', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+        # Saves that leave the department alone only run their UPDATE
+        with self.assertNumQueries(1):
+            employee.save(update_fields=['position'])
+
+    def test_deleting_an_employee_updates_their_department(self):
+        User.objects.filter(pk=self.sales[0].pk).delete()
+        self.assertEqual(self.rollups(), {'Sales': (1, 8.0, Decimal('0.00')), 'IT': (1, 10.0, Decimal('2.00'))})
+
+        self.it.delete()
+        self.assertEqual(set(self.rollups()), {'Sales'})
+
+        incremental = self.rollups()
+        DepartmentDailyRollup.objects.all().delete()
+        call_command('rebuild_department_rollups', start='2025-03-01', end='2025-03-31', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_endpoint_serves_range_from_rollups(self):
+        self.client.force_login(self.staff)
+        url = reverse('attendance:department_rollups')
+        with self.assertNumQueries(3):  # session, user, rollups
+            data = self.client.get(url, {'start_date': '2025-03-01', 'end_date': '2025-03-31', 'department': 'Sales'}).json()
+        self.assertEqual(data['rows'], [{
+            'date': '2025-03-04', 'department': 'Sales', 'headcount_present': 2,
+            'worked_hours': 17.0, 'overtime_hours': 1.0,
+        }])
+        self.assertEqual(self.client.get(url, {'start_date': 'bad'}).status_code, 400)
+
+
+class BulkOvertimeReviewTest(TestCase):
+    def setUp(self):
+        self.week_start = date(2025, 3, 3)
+        self.manager = User.objects.create_staffuser(
+            email='manager@gmail.com', password='password123', first_name='Man', last_name='Ager'
+        )
+        self.sales = User.objects.create_user(
+            email='ot-sales@gmail.com', password='password123', first_name='Over', last_name='Time',
+            department='Sales',
+        )
+        self.it = User.objects.create_user(
+            email='ot-it@gmail.com', password='password123', first_name='Ex', last_name='Tra', department='IT'
+        )
+        for employee in (self.sales, self.it):
+            for day in range(3):
+                time_in = timezone.make_aware(datetime(2025, 3, 3 + day, 8, 0))
+                Attendance.objects.create(
+                    employee=employee, date=self.week_start + timedelta(days=day),
+                    time_in=time_in, time_out=time_in + timedelta(hours=10),
+                )
+        self.client.force_login(self.manager)
+        self.url = reverse('attendance:bulk_review_overtime')
+
+    def test_approve_department_period_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'action': 'approve', 'department': 'Sales', 'notes': 'Quarter close',
+                'start_date': '2025-03-03', 'end_date': '2025-03-09',
+            }, content_type='application/json')
+        self.assertEqual(response.json(), {'action': 'approve', 'updated': 3})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "attendance_attendance"')]), 1)
+
+        approved = Attendance.objects.filter(overtime_approved=True)
+        self.assertEqual(set(approved.values_list('employee_id', flat=True)), {self.sales.pk})
+        self.assertEqual(set(approved.values_list('overtime_approved_by', 'overtime_notes')), {(self.manager.pk, 'Quarter close')})
+        summary = WeeklyPayrollSummary.objects.get(employee=self.sales, week_start=self.week_start)
+        self.assertEqual(summary.approved_overtime_hours, 6)
+        self.assertEqual(summary.pending_overtime_hours, 0)
+
+    def test_reject_ids_from_form_and_require_selection(self):
+        ids = list(Attendance.objects.filter(employee=self.it).values_list('pk', flat=True)[:2])
+        response = self.client.post(self.url, {'action': 'reject', 'ids': ids})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Attendance.objects.filter(overtime_rejected=True).count(), 2)
+
+        response = self.client.post(self.url, {'action': 'approve'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_form_redirect_stays_on_this_site(self):
+        dashboard = reverse('attendance:overtime_dashboard') + '?department=IT'
+        form = {'action': 'reject', 'employee': self.it.pk, 'start_date': '2025-03-03', 'end_date': '2025-03-09'}
+        self.assertRedirects(self.client.post(self.url, {**form, 'next': dashboard}), dashboard)
+
+        attendance_list = reverse('attendance:attendance_list')
+        for unsafe in ['https://evil.example/', '//evil.example/path', '']:
+            response = self.client.post(self.url, {**form, 'next': unsafe}, HTTP_REFERER='https://evil.example/')
+            self.assertRedirects(response, attendance_list, fetch_redirect_response=False)
+
+    def test_dashboard_groups_pending_by_employee_and_week(self):
+        Attendance.objects.filter(employee=self.it).first().reject_overtime(rejected_by=self.manager)
+        url = reverse('attendance:overtime_dashboard')
+        self.client.get(url)  # warm the session
+        with CaptureQueriesContext(connection) as queries:
+            context = self.client.get(url).context
+        self.assertEqual(len([q for q in queries if 'attendance_attendance' in q['sql']]), 1)
+
+        groups = {(g['employee_id'], g['week']): (g['days'], g['hours']) for g in context['groups']}
+        self.assertEqual(groups, {
+            (self.sales.pk, self.week_start): (3, Decimal('6.00')),
+            (self.it.pk, self.week_start): (2, Decimal('4.00')),
+        })
+        self.assertEqual(context['total_hours'], Decimal('10.00'))
+
+        # Approving one group from the dashboard clears it
+        self.client.post(self.url, {
+            'action': 'approve', 'employee': self.it.pk, 'start_date': '2025-03-03', 'end_date': '2025-03-09',
+        })
+        self.assertEqual(len(self.client.get(url).context['groups']), 1)
+
+
+class StaleSessionSweeperTest(TestCase):
+    def setUp(self):
+        self.manila = zoneinfo.ZoneInfo('Asia/Manila')
+        self.early = User.objects.create_user(
+            email='forgot@gmail.com', password='password123', first_name='For', last_name='Got',
+        )
+        self.late = User.objects.create_user(
+            email='late@gmail.com', password='password123', first_name='La', last_name='Te',
+            work_end_time=time(20, 0), weekly_hours=50,
+        )
+        self.day = date(2025, 3, 4)
+        for employee in (self.early, self.late):
+            Attendance.objects.create(
+                employee=employee, date=self.day, time_in=datetime(2025, 3, 4, 8, 0, tzinfo=self.manila)
+            )
+        # The late employee is working again today
+        Attendance.objects.create(employee=self.late, time_in=timezone.now())
+
+    def test_closes_at_scheduled_end_and_recalculates_overtime(self):
+        call_command('close_stale_attendance', batch_size=1, stdout=StringIO())
+
+        early = Attendance.objects.get(employee=self.early, date=self.day)
+        late = Attendance.objects.get(employee=self.late, date=self.day)
+        # Default 17:00 end on a 40h week: 9h span, 1h over the 8h day
+        self.assertEqual(early.time_out, datetime(2025, 3, 4, 17, 0, tzinfo=self.manila))
+        self.assertEqual(early.overtime_hours, Decimal('1.00'))
+        # 20:00 end on a 50h week: 12h span, 2h over the 10h day
+        self.assertEqual(late.time_out, datetime(2025, 3, 4, 20, 0, tzinfo=self.manila))
+        self.assertEqual(late.overtime_hours, Decimal('2.00'))
+
+        # Today's session is left open and keeps its owner online
+        self.assertTrue(Attendance.objects.get(employee=self.late, date=timezone.now().date()).is_ongoing)
+        self.assertFalse(User.objects.get(pk=self.early.pk).is_online)
+        self.assertTrue(User.objects.get(pk=self.late.pk).is_online)
+
+        summary = WeeklyPayrollSummary.objects.get(employee=self.early, week_start=date(2025, 3, 3))
+        self.assertEqual(summary.worked_hours, 9)
+        self.assertEqual(summary.pending_overtime_hours, Decimal('1.00'))
+
+    def test_session_started_after_shift_end_closes_at_time_in(self):
+        time_in = datetime(2025, 3, 5, 18, 0, tzinfo=self.manila)
+        Attendance.objects.create(employee=self.early, date=date(2025, 3, 5), time_in=time_in)
+        list(close_stale_sessions())
+        record = Attendance.objects.get(employee=self.early, date=date(2025, 3, 5))
+        self.assertEqual(record.time_out, time_in)
+        self.assertEqual(record.overtime_hours, 0)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.old_week = date(2023, 1, 2)  # Monday, well behind ARCHIVE_AFTER_DAYS
+        self.employee = User.objects.create_user(
+            email='veteran@gmail.com', password='password123', first_name='Vet', last_name='Eran',
+            department='Ops', salary=500,
+        )
+        for day in range(3):
+            time_in = timezone.make_aware(datetime(2023, 1, 2 + day, 8, 0))
+            record = Attendance.objects.create(
+                employee=self.employee, date=self.old_week + timedelta(days=day),
+                time_in=time_in, time_out=time_in + timedelta(hours=9, minutes=15 * day),
+            )
+        record.approve_overtime(approved_by=self.employee)
+        Attendance.objects.create(employee=self.employee, time_in=timezone.now())
+
+        self.employee.position = 'Lead'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.save()
+        EmployeeHistory.objects.update(updated_at=timezone.make_aware(datetime(2023, 1, 5, 12, 0)))
+
+    def test_archived_rows_read_back_transparently(self):
+        old_week_end = self.old_week + timedelta(days=6)
+        before = self.employee.calculate_payroll_breakdown(self.old_week, old_week_end)
+        rollups_before = compute_department_rollups(self.old_week, old_week_end)
+        summary_before = WeeklyPayrollSummary.objects.get(employee=self.employee, week_start=self.old_week)
+
+        call_command('archive_old_records', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Attendance.objects.count(), 1)  # only today's row stays hot
+        self.assertEqual(ArchivedAttendance.objects.count(), 3)
+        self.assertEqual(EmployeeHistory.objects.count(), 0)
+        # Summaries are untouched by the move
+        self.assertEqual(
+            WeeklyPayrollSummary.objects.get(employee=self.employee, week_start=self.old_week).worked_hours,
+            summary_before.worked_hours,
+        )
+
+        self.assertEqual(self.employee.calculate_payroll_breakdown(self.old_week, old_week_end), before)
+        self.assertEqual(
+            calculate_payroll_breakdowns([self.employee], self.old_week, old_week_end)[self.employee.pk], before
+        )
+        self.assertEqual(compute_department_rollups(self.old_week, old_week_end), rollups_before)
+
+        histories = [history for source in employee_history_sources(date(2023, 1, 1)) for history in source]
+        self.assertEqual([(h.field_name, h.new_value) for h in histories], [('Position', 'Lead')])
+        self.assertEqual(histories[0].employee, self.employee)
+        self.assertEqual([list(source) for source in employee_history_sources(get_archive_cutoff())], [[]])
+
+        results = ingest_clock_events([{'employee_id': self.employee.pk, 'type': 'in', 'timestamp': '2023-01-09T08:00:00'}])
+        self.assertEqual(results[0]['status'], 'invalid')
+
+
+class ConcurrentClockTest(TransactionTestCase):
+    """Parallel punches must neither duplicate rows nor raise IntegrityError"""
+    workers = 8
+
+    def setUp(self):
+        self.employee = User.objects.create_user(
+            email='rush@gmail.com', password='password123', first_name='Rush', last_name='Hour'
+        )
+
+    def punch_in_parallel(self, action):
+        clients = []
+        for _ in range(self.workers):
+            client = Client(raise_request_exception=False)
+            client.force_login(self.employee)
+            clients.append(client)
+        barrier = Barrier(self.workers, timeout=30)
+
+        def punch(client):
+            barrier.wait()
+            try:
+                return client.post(reverse('attendance:record_time'), {'action': action}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(punch, clients))
+
+    def test_parallel_clock_in_and_out(self):
+        self.assertEqual(self.punch_in_parallel('in'), [302] * self.workers)
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+        self.assertEqual(self.punch_in_parallel('out'), [302] * self.workers)
+        record = Attendance.objects.get(employee=self.employee)
+        self.assertIsNotNone(record.time_out)
+        self.employee.refresh_from_db()
+        self.assertFalse(self.employee.is_online)
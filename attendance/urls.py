@@ -1,10 +1,15 @@
 from django.urls import path
 from . import views
-from .views import my_attendance, record_time, AttendanceListView, AttendanceDetailView
+from .views import my_attendance, record_time, AttendanceListView, AttendanceDetailView, ingest_clock_events_api, \
+    department_rollups_api, bulk_review_overtime, OvertimeApprovalDashboardView
 app_name = 'attendance'
 urlpatterns = [
     path('', my_attendance, name='my-attendance'),
     path('record/', record_time, name='record_time'),
     path('all/', AttendanceListView.as_view(), name='attendance_list'),
     path('<int:pk>/', AttendanceDetailView.as_view(), name='attendance_detail'),
+    path('api/clock-events/', ingest_clock_events_api, name='ingest_clock_events'),
+    path('api/department-rollups/', department_rollups_api, name='department_rollups'),
+    path('overtime/', OvertimeApprovalDashboardView.as_view(), name='overtime_dashboard'),
+    path('overtime/review/', bulk_review_overtime, name='bulk_review_overtime'),
 ]
@@ -1,14 +1,26 @@
-from datetime import date
+import json
+from datetime import date, datetime, timedelta
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.views.generic import ListView, DetailView
-from django.db.models import Q
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.views.generic import ListView, DetailView, TemplateView
 import zoneinfo
 
-from .models import Attendance
+from accounts.search import filter_by_employee_search
+
+from .ingest import MAX_EVENTS_PER_UPLOAD, ingest_clock_events
+from .models import Attendance, ClockTerminal
+from .overtime import (
+    OVERTIME_ACTIONS, OvertimeSelectionError, pending_overtime_by_week, review_overtime, select_overtime,
+)
+from .pagination import paginate_by_date
+from .rollups import get_department_rollups
 
 # Helper: staff check
 def is_staff(user):
@@ -52,34 +64,23 @@ def record_time(request):
     if request.method == 'POST':
         action = request.POST.get('action')
         user = request.user
-        today = timezone.now().date()
         current_time = timezone.now()  # This will now be Manila time
 
         if action == 'in':
-            if Attendance.objects.filter(employee=user, date=today).exists():
-                messages.error(request, "You have already timed in today.")
-            else:
-                # Create with Manila timezone-aware datetime
-                Attendance.objects.create(
-                    employee=user,
-                    date=today,
-                    time_in=current_time
-                )
+            # One INSERT ... ON CONFLICT DO NOTHING, safe against double-clicks
+            if Attendance.clock_in(user, current_time):
                 messages.success(request, "Time In recorded successfully.")
+            else:
+                messages.error(request, "You have already timed in today.")
 
         elif action == 'out':
-            try:
-                attendance = Attendance.objects.get(employee=user, date=today)
-                if attendance.time_out:
-                    messages.error(request, "You have already timed out today.")
-                elif not attendance.time_in:
-                    messages.error(request, "You must time in before timing out.")
-                else:
-                    # Update with Manila timezone-aware datetime
-                    attendance.time_out = current_time
-                    attendance.save()
-                    messages.success(request, "Time Out recorded successfully.")
-            except Attendance.DoesNotExist:
+            # One read plus a conditional UPDATE that only matches an open record
+            result = Attendance.clock_out(user, current_time)
+            if result == 'ok':
+                messages.success(request, "Time Out recorded successfully.")
+            elif result == 'already_timed_out':
+                messages.error(request, "You have already timed out today.")
+            else:
                 messages.error(request, "You haven't timed in yet.")
 
     return redirect('attendance:my-attendance')
@@ -103,14 +104,19 @@ class AttendanceListView(ListView):
         queryset = Attendance.objects.select_related('employee')
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(
-                Q(employee__first_name__icontains=query) |
-                Q(employee__last_name__icontains=query) |
-                Q(employee__department__icontains=query) |
-                Q(employee__position__icontains=query)
-            )
+            # Indexed employee search (FTS5 locally, tsvector/trigram on PostgreSQL)
+            queryset = filter_by_employee_search(queryset, query)
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        # Keyset pagination on (date, id): ?after=/?before= cursors instead of OFFSET pages
+        page = paginate_by_date(
+            queryset, page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
 
 # Staff-only detail view
 @method_decorator([login_required, user_passes_test(is_staff)], name='dispatch')
@@ -124,3 +130,162 @@ class AttendanceDetailView(DetailView):
         timezone.activate(zoneinfo.ZoneInfo("Asia/Manila"))
         return super().dispatch(request, *args, **kwargs)
 
+
+# Staff-only overtime approval dashboard
+@method_decorator([login_required, user_passes_test(is_staff)], name='dispatch')
+class OvertimeApprovalDashboardView(TemplateView):
+    template_name = 'attendance/overtime_approval_dashboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        department = self.request.GET.get('department') or None
+        try:
+            start_date = date.fromisoformat(self.request.GET['start_date']) if self.request.GET.get('start_date') else None
+            end_date = date.fromisoformat(self.request.GET['end_date']) if self.request.GET.get('end_date') else None
+        except ValueError:
+            messages.error(self.request, "Dates must be YYYY-MM-DD.")
+            start_date = end_date = None
+
+        # One grouped query; the totals are summed from its rows
+        groups = list(pending_overtime_by_week(department, start_date, end_date))
+        for group in groups:
+            group['week_end'] = group['week'] + timedelta(days=6)
+
+        context.update({
+            'groups': groups,
+            'department': department or '',
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_hours': sum(group['hours'] for group in groups),
+            'total_days': sum(group['days'] for group in groups),
+            'employee_count': len({group['employee_id'] for group in groups}),
+        })
+        return context
+
+
+@csrf_exempt
+@require_POST
+def ingest_clock_events_api(request):
+    """
+    Batch clock event upload for kiosks and badge readers.
+
+    Authenticated with "Authorization: Token <key>" of a ClockTerminal.
+    Body: {"events": [{"id": ..., "employee_id": 1, "type": "in", "timestamp": "2025-01-06T08:00:00+08:00"}]}
+    Responds with the status of every event, in the order they were sent.
+    """
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    terminal = ClockTerminal.authenticate(key.strip()) if scheme.lower() == 'token' else None
+    if terminal is None:
+        return JsonResponse({'error': 'Invalid or missing terminal token'}, status=401)
+
+    try:
+        events = json.loads(request.body).get('events')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+    if not isinstance(events, list):
+        return JsonResponse({'error': 'events must be a list'}, status=400)
+    if len(events) > MAX_EVENTS_PER_UPLOAD:
+        return JsonResponse({'error': f'At most {MAX_EVENTS_PER_UPLOAD} events per upload'}, status=400)
+
+    results = ingest_clock_events(events)
+    ClockTerminal.objects.filter(pk=terminal.pk).update(last_used_at=timezone.now())
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return JsonResponse({'counts': counts, 'results': results})
+
+
+@login_required
+@user_passes_test(is_staff)
+def department_rollups_api(request):
+    """
+    Daily headcount, worked hours and overtime per department for charts.
+
+    ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD (default: the last 30 days),
+    optionally narrowed with one or more ?department=. Served entirely from
+    DepartmentDailyRollup; days without attendance are left out.
+    """
+    try:
+        end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date() \
+            if request.GET.get('end_date') else timezone.now().date()
+        start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date() \
+            if request.GET.get('start_date') else end_date - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'error': 'start_date must not be after end_date'}, status=400)
+
+    rows = [
+        {
+            'date': row['date'].isoformat(),
+            'department': row['department'],
+            'headcount_present': row['headcount_present'],
+            'worked_hours': round(row['worked_hours'], 2),
+            'overtime_hours': float(row['overtime_hours']),
+        }
+        for row in get_department_rollups(start_date, end_date, request.GET.getlist('department'))
+    ]
+    return JsonResponse({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(), 'rows': rows})
+
+
+def get_next_url(request, default='attendance:attendance_list'):
+    """The posted next URL if it stays on this site, otherwise the default"""
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        return next_url
+    return default
+
+
+@login_required
+@user_passes_test(is_staff)
+@require_POST
+def bulk_review_overtime(request):
+    """
+    Approve or reject overtime for many attendance records in one transaction.
+
+    Accepts a JSON body (answered with JSON) or a form post from the overtime
+    dashboard (answered with a redirect). Fields: action ("approve"/"reject"),
+    notes, and either ids or start_date/end_date with an optional department
+    or employee. Form posts go back to their hidden next field when it is a
+    URL on this site, otherwise to the attendance list.
+    """
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+        ids = data.get('ids')
+    else:
+        data = request.POST
+        ids = data.getlist('ids')
+
+    action = data.get('action')
+    try:
+        if action not in OVERTIME_ACTIONS:
+            raise OvertimeSelectionError('action must be "approve" or "reject"')
+        records = select_overtime(
+            ids=ids,
+            department=data.get('department'),
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            employee=data.get('employee'),
+        )
+    except OvertimeSelectionError as e:
+        if is_json:
+            return JsonResponse({'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        return redirect(get_next_url(request))
+
+    count = review_overtime(records, action, request.user, data.get('notes') or '')
+
+    if is_json:
+        return JsonResponse({'action': action, 'updated': count})
+    messages.success(request, f"{'Approved' if action == 'approve' else 'Rejected'} overtime on {count} record(s).")
+    return redirect(get_next_url(request))
+
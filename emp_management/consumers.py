@@ -0,0 +1,40 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from emp_management.presence import PRESENCE_GROUP, get_presence_snapshot, get_presence_version
+
+
+class PresenceConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes employee online/offline changes to the employee list.
+
+    A snapshot of every status is sent on connect, after that only the
+    employees whose state flips are sent.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(PRESENCE_GROUP, self.channel_name)
+        await self.accept()
+        # Read the version first so no flip can fall between it and the snapshot
+        version = await database_sync_to_async(get_presence_version)()
+        await self.send_json({
+            'type': 'snapshot',
+            'version': version,
+            'statuses': await database_sync_to_async(get_presence_snapshot)(),
+        })
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(PRESENCE_GROUP, self.channel_name)
+
+    async def presence_update(self, event):
+        await self.send_json({
+            'type': 'update',
+            'slug': event['slug'],
+            'is_online': event['is_online'],
+            'version': event['version'],
+        })
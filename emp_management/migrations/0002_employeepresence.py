@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_online_status(apps, schema_editor):
+    Employee = apps.get_model('accounts', 'Employee')
+    EmployeePresence = apps.get_model('emp_management', 'EmployeePresence')
+    now = timezone.now()
+    EmployeePresence.objects.bulk_create(
+        EmployeePresence(employee_id=pk, is_online=is_online, changed_at=now)
+        for pk, is_online in Employee.objects.values_list('pk', 'is_online').iterator()
+    )
+
+
+def restore_online_status(apps, schema_editor):
+    Employee = apps.get_model('accounts', 'Employee')
+    EmployeePresence = apps.get_model('emp_management', 'EmployeePresence')
+    online = EmployeePresence.objects.filter(is_online=True).values('employee_id')
+    Employee.objects.filter(pk__in=online).update(is_online=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_alter_employee_salary'),
+        ('emp_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeePresence',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='presence', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('is_online', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(copy_online_status, restore_online_status),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
 
 
+class PresenceEvent(models.Model):
+    """
+    Append-only log of employee online/offline flips.
+
+    The auto-increment id doubles as the version cursor handed to
+    get_employee_status_changes clients; old events are pruned periodically.
+    """
+    employee = models.ForeignKey('accounts.Employee', on_delete=models.CASCADE, related_name='presence_events')
+    is_online = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.employee} {'online' if self.is_online else 'offline'} at {self.created_at}"
+
+
+class EmployeePresence(models.Model):
+    """
+    Current online state of an employee, kept out of the employees table.
+
+    Clock punches and logins only write here, and only when the state
+    actually flips, so they never go through Employee.save and its history
+    signals. Employee.is_online reads from this row.
+    """
+    employee = models.OneToOneField(
+        'accounts.Employee', on_delete=models.CASCADE, primary_key=True, related_name='presence'
+    )
+    is_online = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.employee} {'online' if self.is_online else 'offline'}"
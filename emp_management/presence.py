@@ -0,0 +1,159 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Channel layer group every presence WebSocket joins
+PRESENCE_GROUP = 'presence'
+
+# How long presence events are kept for delta polling, and how often to prune
+PRESENCE_EVENT_RETENTION = timedelta(days=1)
+PRESENCE_PRUNE_EVERY = 1000
+
+# Deltas re-read events this recent, in case their transaction committed
+# after a poll had already passed their id
+PRESENCE_COMMIT_WINDOW = timedelta(seconds=30)
+
+
+def get_presence_employees():
+    """Employees shown on the employee list (staff and admins are hidden there)"""
+    from accounts.models import Employee
+
+    return Employee.objects.filter(staff=False, admin=False)
+
+
+def get_presence_snapshot():
+    """Online state of every listed employee keyed by slug"""
+    employees = get_presence_employees().values('slug', 'presence__is_online')
+    return {emp['slug']: bool(emp['presence__is_online']) for emp in employees}
+
+
+def get_presence_version():
+    """Newest presence event id, the cursor clients resume delta polling from"""
+    from emp_management.models import PresenceEvent
+
+    return PresenceEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def store_presence(employee_ids, is_online):
+    """
+    Write the online state of the given employees to the presence store.
+
+    One INSERT ... ON CONFLICT DO UPDATE that only touches rows whose state
+    differs, so repeated punches and logins write nothing. Returns the ids
+    of the employees whose state actually changed.
+    """
+    from emp_management.models import EmployeePresence
+
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return set()
+
+    opts = EmployeePresence._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    pk = quote(opts.pk.column)
+    is_online_field = opts.get_field('is_online')
+    changed_at_field = opts.get_field('changed_at')
+    sql = (
+        'INSERT INTO {table} ({pk}, {is_online}, {changed_at}) VALUES {rows} '
+        'ON CONFLICT ({pk}) DO UPDATE SET {is_online} = EXCLUDED.{is_online}, '
+        '{changed_at} = EXCLUDED.{changed_at} '
+        'WHERE {table}.{is_online} <> EXCLUDED.{is_online} '
+        'RETURNING {pk}'
+    ).format(
+        table=table,
+        pk=pk,
+        is_online=quote(is_online_field.column),
+        changed_at=quote(changed_at_field.column),
+        rows=', '.join(['(%s, %s, %s)'] * len(employee_ids)),
+    )
+    state = is_online_field.get_db_prep_save(is_online, connection)
+    changed_at = changed_at_field.get_db_prep_save(timezone.now(), connection)
+    params = []
+    for employee_id in employee_ids:
+        params.extend([employee_id, state, changed_at])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def set_online(employee, is_online):
+    """Store one employee's online state and publish it if it flipped, returns True on a flip"""
+    from accounts.models import Employee
+    from emp_management.models import EmployeePresence
+
+    flipped = bool(store_presence([employee.pk], is_online))
+    # Keep employee.is_online in step without another query
+    Employee.presence.related.set_cached_value(
+        employee, EmployeePresence(employee_id=employee.pk, is_online=is_online, changed_at=timezone.now())
+    )
+    if flipped:
+        publish_presence_change(employee)
+    return flipped
+
+
+def publish_presence_change(employee):
+    """
+    Record an online/offline flip and push it to every connected presence socket.
+
+    The event row gives polling clients a version cursor; the channel-layer
+    message goes out once the change is committed.
+    """
+    from emp_management.models import PresenceEvent
+
+    # Staff and admins are not on the employee list, nobody watches them
+    if employee.staff or employee.admin:
+        return
+
+    event = PresenceEvent.objects.create(employee=employee, is_online=employee.is_online)
+    if event.pk % PRESENCE_PRUNE_EVERY == 0:
+        PresenceEvent.objects.filter(created_at__lt=timezone.now() - PRESENCE_EVENT_RETENTION).delete()
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    message = {
+        'type': 'presence.update',
+        'slug': employee.slug,
+        'is_online': employee.is_online,
+        'version': event.pk,
+    }
+    transaction.on_commit(lambda: async_to_sync(channel_layer.group_send)(PRESENCE_GROUP, message))
+
+
+def publish_presence_changes(employees):
+    """publish_presence_change for many employees with one insert, used by bulk clock ingestion"""
+    from emp_management.models import PresenceEvent
+
+    employees = [employee for employee in employees if not (employee.staff or employee.admin)]
+    if not employees:
+        return
+
+    events = PresenceEvent.objects.bulk_create(
+        PresenceEvent(employee_id=employee.pk, is_online=employee.is_online) for employee in employees
+    )
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    messages = [
+        {
+            'type': 'presence.update',
+            'slug': employee.slug,
+            'is_online': employee.is_online,
+            'version': event.pk,
+        }
+        for employee, event in zip(employees, events)
+    ]
+
+    def send():
+        for message in messages:
+            async_to_sync(channel_layer.group_send)(PRESENCE_GROUP, message)
+
+    transaction.on_commit(send)
@@ -1,3 +1,128 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import Attendance
+from emp_management.consumers import PresenceConsumer
+from emp_management.models import PresenceEvent
+from emp_management.presence import PRESENCE_COMMIT_WINDOW, store_presence
+
+User = get_user_model()
+
+
+class PresenceConsumerTest(TransactionTestCase):
+    def setUp(self):
+        self.employee = User.objects.create_user(
+            email='presence@gmail.com',
+            password='password123',
+            first_name='Pre',
+            last_name='Sence',
+        )
+
+    def test_pushes_snapshot_then_updates(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(PresenceConsumer.as_asgi(), '/ws/presence/')
+            communicator.scope['user'] = self.employee
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot, {'type': 'snapshot', 'version': 0, 'statuses': {'pre-sence': False}})
+
+            await database_sync_to_async(Attendance.objects.create)(
+                employee=self.employee, time_in=timezone.now()
+            )
+            update = await communicator.receive_json_from()
+            self.assertEqual(update['slug'], 'pre-sence')
+            self.assertTrue(update['is_online'])
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_rejects_anonymous(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(PresenceConsumer.as_asgi(), '/ws/presence/')
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+        async_to_sync(scenario)()
+
+
+class EmployeeStatusDeltaTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='boss@gmail.com', password='password123', first_name='Big', last_name='Boss'
+        )
+        self.employee = User.objects.create_user(
+            email='worker@gmail.com', password='password123', first_name='Work', last_name='Er'
+        )
+        self.client.force_login(self.staff)
+        self.url = reverse('emp_management:employee_status_changes')
+
+    def test_original_endpoint_keeps_the_flat_map(self):
+        url = reverse('emp_management:employee_statuses')
+        self.assertEqual(self.client.get(url).json(), {'work-er': False})
+        Attendance.objects.create(employee=self.employee, time_in=timezone.now())
+        self.assertEqual(self.client.get(url).json(), {'work-er': True})
+
+    def test_full_then_delta_then_not_modified(self):
+        data = self.client.get(self.url).json()
+        self.assertTrue(data['full'])
+        self.assertEqual(data['statuses'], {'work-er': False})  # staff are not listed
+
+        self.assertEqual(self.client.get(self.url, {'since': data['version']}).status_code, 304)
+
+        Attendance.objects.create(employee=self.employee, time_in=timezone.now())
+        delta = self.client.get(self.url, {'since': data['version']}).json()
+        self.assertFalse(delta['full'])
+        self.assertEqual(delta['statuses'], {'work-er': True})
+        self.assertGreater(delta['version'], data['version'])
+
+        # Once the event is older than the commit window, polls go quiet again
+        PresenceEvent.objects.update(created_at=timezone.now() - PRESENCE_COMMIT_WINDOW - timedelta(seconds=1))
+        self.assertEqual(self.client.get(self.url, {'since': delta['version']}).status_code, 304)
+
+    def test_late_committed_event_is_not_skipped(self):
+        other = User.objects.create_user(
+            email='late@gmail.com', password='password123', first_name='Late', last_name='Commit'
+        )
+        Attendance.objects.create(employee=self.employee, time_in=timezone.now())
+        Attendance.objects.create(employee=other, time_in=timezone.now())
+        # A poll saw the newer event before the older one's transaction committed
+        seen = PresenceEvent.objects.get(employee=other).pk
+        delta = self.client.get(self.url, {'since': seen}).json()
+        self.assertEqual(delta['statuses'], {'work-er': True, 'late-commit': True})
+        self.assertEqual(delta['version'], seen)
+
+
+class PresenceStoreTest(TestCase):
+    def setUp(self):
+        self.employee = User.objects.create_user(
+            email='punch@gmail.com', password='password123', first_name='Pun', last_name='Ch'
+        )
+
+    def test_punch_does_not_touch_employees_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            Attendance.objects.create(employee=self.employee, time_in=timezone.now())
+        employee_writes = [
+            q['sql'] for q in queries
+            if q['sql'].startswith(('UPDATE "accounts_employee"', 'INSERT INTO "history_'))
+        ]
+        self.assertEqual(employee_writes, [])
+        self.assertTrue(self.employee.is_online)
+
+        self.employee = User.objects.get(pk=self.employee.pk)
+        self.assertTrue(self.employee.is_online)
+
+    def test_writes_only_on_change(self):
+        self.assertEqual(store_presence([self.employee.pk], True), {self.employee.pk})
+        self.assertEqual(store_presence([self.employee.pk], True), set())
+        self.assertEqual(store_presence([self.employee.pk], False), {self.employee.pk})
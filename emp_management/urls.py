@@ -9,6 +9,7 @@ from emp_management.views import (
     EmpUpdateView, 
     EmpDeleteView, 
     get_employee_statuses,
+    get_employee_status_changes,
     admin_panel,
     dashboard_view
 )
@@ -29,4 +30,6 @@ urlpatterns = [
 
     path('api/employee-statuses/', get_employee_statuses, name='employee_statuses'),
 
+    path('api/employee-statuses/changes/', get_employee_status_changes, name='employee_status_changes'),
+
 ]
\ No newline at end of file
@@ -1,14 +1,18 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import Max, Min, Q
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils import timezone
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import UpdateView, DetailView, ListView, DeleteView
 from django.urls import reverse_lazy, reverse
 from accounts.models import Employee
+from accounts.search import search_employees
 from emp_management.forms import EmployeeUpdateForm, AdminEmployeeUpdateForm
+from emp_management.models import PresenceEvent
+from emp_management.presence import PRESENCE_COMMIT_WINDOW, get_presence_employees, get_presence_snapshot
 
 
 class EmpListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
@@ -22,14 +26,13 @@ class EmpListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
 
     def get_queryset(self):
         # kase nakikita yung admins sa list view i don wan dat
-        queryset = Employee.objects.filter(staff=False, admin=False)
+        # This week's hours, overtime and earnings come annotated in the same query
+        queryset = Employee.objects.filter(staff=False, admin=False).with_work_stats('week')
         query = self.request.GET.get('q')
 
         if query:
-            queryset = queryset.filter(
-                Q(slug__icontains=query) |
-                Q(position__icontains=query) |
-                Q(department__icontains=query))
+            # Ranked, best match first
+            queryset = search_employees(queryset, query)
         return queryset
 
 
@@ -40,7 +43,8 @@ class EmpDetailView(LoginRequiredMixin, DetailView):
     template_name = 'emp_management/employee_detail.html'
 
     def get_object(self):
-        return Employee.objects.get(slug=self.kwargs["slug"])
+        # Today's and this week's attendance come in one prefetch for the work stats
+        return Employee.objects.with_current_attendance().get(slug=self.kwargs["slug"])
 
 class EmpUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Employee
@@ -95,12 +99,50 @@ class EmpDeleteView(LoginRequiredMixin, DeleteView):
 
 
 
-#function for polling
+#function for polling (fallback when the presence WebSocket is unavailable)
 @login_required
 def get_employee_statuses(request):
-    employees = Employee.objects.all().values('slug', 'is_online')
-    statuses = {emp['slug']: emp['is_online'] for emp in employees}
-    return JsonResponse(statuses)
+    """Online status of every listed employee as a flat {slug: is_online} map"""
+    return JsonResponse(get_presence_snapshot())
+
+
+@login_required
+def get_employee_status_changes(request):
+    """
+    Versioned employee online statuses keyed by slug.
+
+    Without ?since= every listed employee is returned. With ?since=<version>
+    only employees whose status flipped after that version are returned, or
+    a 304 when nothing changed. The response's version is the next cursor.
+
+    Event ids are handed out at insert, not at commit, so an event can become
+    visible after a poll already moved past its id. Deltas therefore also
+    re-send every employee with an event from the last PRESENCE_COMMIT_WINDOW;
+    statuses are current values, so sending one twice is harmless.
+    """
+    since = request.GET.get('since')
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        return JsonResponse({'error': 'since must be an integer version'}, status=400)
+
+    log = PresenceEvent.objects.aggregate(latest=Max('id'), oldest=Min('id'))
+    version = log['latest'] or 0
+
+    # A cursor older than the pruned log cannot be trusted for a delta
+    full = since is None or (log['oldest'] is not None and since < log['oldest'] - 1)
+    if full:
+        statuses = get_presence_snapshot()
+    else:
+        changed = PresenceEvent.objects.filter(
+            Q(id__gt=since) | Q(created_at__gte=timezone.now() - PRESENCE_COMMIT_WINDOW)
+        ).values('employee_id')
+        employees = get_presence_employees().filter(pk__in=changed).values('slug', 'presence__is_online')
+        statuses = {emp['slug']: bool(emp['presence__is_online']) for emp in employees}
+        if not statuses and since >= version:
+            return HttpResponseNotModified()
+
+    return JsonResponse({'version': version, 'full': full, 'statuses': statuses})
 
 @staff_member_required
 def admin_panel(request):
@@ -128,6 +170,8 @@ def dashboard_view(request):
             'recent_reports': Report.objects.select_related('reported_by').order_by('-created_at')[:5],
             'recent_notifications': PaycheckNotification.objects.select_related('employee').order_by('-sent_at')[:5],
             'today_attendance': Attendance.objects.filter(date=date.today()).count(),
+            'top_workers': Employee.objects.filter(active=True, staff=False, admin=False)
+                .with_work_stats('week').filter(worked_hours__gt=0).order_by('-worked_hours')[:5],
         }
     else:
         # Employee dashboard with personal information
@@ -0,0 +1,88 @@
+"""
+Cold storage for old attendance and employee history rows.
+
+archive_rows moves rows older than ARCHIVE_AFTER_DAYS from a live table into
+its archive twin in primary-key chunks, keeping ids. Reads that reach back
+past the cutoff union the two tables, so callers never see the difference.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+ARCHIVE_BATCH_SIZE = 2000
+
+
+def get_archive_cutoff():
+    """First day that is never archived; everything archived is dated before it"""
+    return timezone.now().date() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(start_date):
+    """True when a range starting at start_date (None = open-ended) may include archived rows"""
+    return start_date is None or start_date < get_archive_cutoff()
+
+
+def archive_rows(queryset, archive_model, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move the rows of queryset into archive_model, batch_size rows per transaction.
+
+    Each batch is one read, one bulk insert and one DELETE by primary key.
+    The DELETE is issued directly so it skips per-row delete signals, which
+    would otherwise rebuild summaries as if the rows were gone. Yields the
+    number of rows moved per batch.
+    """
+    model = queryset.model
+    fields = [field.attname for field in archive_model._meta.concrete_fields]
+    quote = connection.ops.quote_name
+    queryset = queryset.order_by('pk')
+
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update().values(*fields)[:batch_size])
+            if not rows:
+                return
+            archive_model.objects.bulk_create(
+                [archive_model(**row) for row in rows], ignore_conflicts=True
+            )
+            pks = [row[model._meta.pk.attname] for row in rows]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE {pk} IN ({params})'.format(
+                        table=quote(model._meta.db_table),
+                        pk=quote(model._meta.pk.column),
+                        params=', '.join(['%s'] * len(pks)),
+                    ),
+                    pks,
+                )
+        yield len(rows)
+
+
+def archive_employee_history(batch_size=ARCHIVE_BATCH_SIZE):
+    """Move EmployeeHistory rows from before the cutoff into ArchivedEmployeeHistory"""
+    from .models import ArchivedEmployeeHistory, EmployeeHistory
+
+    cutoff = timezone.make_aware(datetime.combine(get_archive_cutoff(), time.min))
+    return archive_rows(EmployeeHistory.objects.filter(updated_at__lt=cutoff), ArchivedEmployeeHistory, batch_size)
+
+
+def employee_history_sources(start_date=None, end_date=None, include_archive=True, **filters):
+    """
+    Querysets holding the history between two dates (inclusive) matching
+    filters: the live table, plus the archive when start_date reaches behind
+    the cutoff and include_archive is set. Both load employee and updated_by
+    in the same query.
+    """
+    from .models import ArchivedEmployeeHistory, EmployeeHistory
+
+    # Plain datetime bounds rather than __date, which would hide updated_at from its index
+    if start_date:
+        filters['updated_at__gte'] = timezone.make_aware(datetime.combine(start_date, time.min))
+    if end_date:
+        filters['updated_at__lt'] = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+    models = [EmployeeHistory]
+    if include_archive and reaches_archive(start_date):
+        models.append(ArchivedEmployeeHistory)
+    return [model.objects.filter(**filters).select_related('employee', 'updated_by') for model in models]
@@ -0,0 +1,155 @@
+"""
+Point-in-time ("as of") view of employees' tracked fields.
+
+The state at a timestamp is rebuilt from the latest EmployeeSnapshot taken
+at or before it, plus the EmployeeHistory rows between the two. Before an
+employee's first snapshot it is rebuilt backwards instead, from the next
+snapshot (or the current row) by undoing the history in between. Once
+take_employee_snapshots runs regularly, either way reads at most about
+HISTORY_SNAPSHOT_INTERVAL_DAYS of history, however long the log is.
+
+Changes made with queryset.update() never reach EmployeeHistory; the next
+snapshot puts such employees right again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from accounts.models import Employee
+from .archive import reaches_archive
+from .models import ArchivedEmployeeHistory, EmployeeHistory, EmployeeSnapshot
+from .signals import TRACKED_FIELDS, get_field_label
+
+FIELDS_BY_LABEL = {get_field_label(field_name): field_name for field_name in TRACKED_FIELDS}
+
+
+def encode_values(employee):
+    """Tracked field values of an Employee, as text the way EmployeeHistory stores them"""
+    return {field_name: str(getattr(employee, field_name)) for field_name in TRACKED_FIELDS}
+
+
+def decode_values(values):
+    """Stored text back to field values ("None" is a missing value on nullable fields)"""
+    decoded = {}
+    for field_name in TRACKED_FIELDS:
+        value = values.get(field_name)
+        field = Employee._meta.get_field(field_name)
+        decoded[field_name] = None if value is None or (value == 'None' and field.null) else field.to_python(value)
+    return decoded
+
+
+def take_snapshots(employees, taken_at=None):
+    """Snapshot the given employees' current tracked fields in one insert"""
+    taken_at = taken_at or timezone.now()
+    return EmployeeSnapshot.objects.bulk_create(
+        EmployeeSnapshot(employee=employee, taken_at=taken_at, values=encode_values(employee))
+        for employee in employees
+    )
+
+
+def _history_rows(employee_ids, after, until):
+    """(employee_id, updated_at, id, field_name, old_value, new_value) for after < updated_at <= until, oldest first"""
+    rows = []
+    models = [EmployeeHistory]
+    if reaches_archive(after.date()):
+        models.append(ArchivedEmployeeHistory)
+    for model in models:
+        rows.extend(
+            model.objects.filter(employee_id__in=employee_ids, updated_at__gt=after, updated_at__lte=until)
+            .values_list('employee_id', 'updated_at', 'id', 'field_name', 'old_value', 'new_value')
+            .order_by()
+        )
+    rows.sort(key=lambda row: (row[1], row[2]))
+    return rows
+
+
+def _nearest_snapshots(employee_ids, at, before):
+    """{employee_id: (taken_at, values)} of the latest snapshot at or before `at` (or the earliest after it)"""
+    snapshots = EmployeeSnapshot.objects.filter(employee=OuterRef('employee'))
+    if before:
+        nearest = snapshots.filter(taken_at__lte=at).order_by('-taken_at', '-id')
+    else:
+        nearest = snapshots.filter(taken_at__gt=at).order_by('taken_at', 'id')
+    rows = EmployeeSnapshot.objects.filter(
+        employee_id__in=employee_ids, id=Subquery(nearest.values('id')[:1])
+    ).values_list('employee_id', 'taken_at', 'values')
+    return {employee_id: (taken_at, values) for employee_id, taken_at, values in rows}
+
+
+def employees_as_of(employee_ids, at):
+    """
+    {employee_id: {field_name: value}} of tracked fields as they were at
+    `at`, for many employees with a fixed number of queries. Employees that
+    did not exist yet at `at` map to None.
+    """
+    employee_ids = list(employee_ids)
+    created = dict(Employee.objects.filter(pk__in=employee_ids).values_list('pk', 'timestamp'))
+    employee_ids = [pk for pk in employee_ids if pk in created]
+    states = {pk: None for pk in employee_ids if created[pk] > at}
+    employee_ids = [pk for pk in employee_ids if pk not in states]
+    if not employee_ids:
+        return states
+
+    # Forward: latest snapshot at or before `at`, then replay new values
+    forward = _nearest_snapshots(employee_ids, at, before=True)
+    if forward:
+        values = {pk: dict(snapshot_values) for pk, (_, snapshot_values) in forward.items()}
+        since = {pk: taken_at for pk, (taken_at, _) in forward.items()}
+        for employee_id, updated_at, _, label, _, new_value in _history_rows(list(forward), min(since.values()), at):
+            if updated_at > since[employee_id] and label in FIELDS_BY_LABEL:
+                values[employee_id][FIELDS_BY_LABEL[label]] = new_value
+        states.update((pk, decode_values(values[pk])) for pk in forward)
+
+    # Backward: earliest snapshot after `at` (or the current row), then undo to old values
+    remaining = [pk for pk in employee_ids if pk not in forward]
+    if remaining:
+        now = timezone.now()
+        backward = _nearest_snapshots(remaining, at, before=False)
+        current = {
+            employee.pk: (now, encode_values(employee))
+            for employee in Employee.objects.filter(pk__in=[pk for pk in remaining if pk not in backward]).only(*TRACKED_FIELDS)
+        }
+        backward.update(current)
+        values = {pk: dict(snapshot_values) for pk, (_, snapshot_values) in backward.items()}
+        until = {pk: taken_at for pk, (taken_at, _) in backward.items()}
+        for employee_id, updated_at, _, label, old_value, _ in reversed(_history_rows(remaining, at, max(until.values()))):
+            if updated_at <= until[employee_id] and label in FIELDS_BY_LABEL:
+                values[employee_id][FIELDS_BY_LABEL[label]] = old_value
+        states.update((pk, decode_values(values[pk])) for pk in backward)
+    return states
+
+
+def employee_as_of(employee, at):
+    """Tracked fields of one employee as they were at `at`, or None if it did not exist yet"""
+    return employees_as_of([employee.pk], at).get(employee.pk)
+
+
+def department_as_of(department, at):
+    """
+    {employee_id: state} for everyone who was in `department` at `at`.
+
+    Anyone in it then is either still in it or has a logged move out of it
+    since; snapshots from the interval before `at` add those moved by
+    unlogged updates.
+    """
+    label = get_field_label('department')
+    candidates = set(Employee.objects.filter(department=department).values_list('pk', flat=True))
+    for model in [EmployeeHistory, ArchivedEmployeeHistory] if reaches_archive(at.date()) else [EmployeeHistory]:
+        candidates.update(
+            model.objects.filter(field_name=label, old_value=department, updated_at__gt=at)
+            .values_list('employee_id', flat=True)
+        )
+    candidates.update(
+        EmployeeSnapshot.objects.filter(
+            taken_at__gt=at - timedelta(days=settings.HISTORY_SNAPSHOT_INTERVAL_DAYS),
+            taken_at__lte=at,
+            values__department=department,
+        ).values_list('employee_id', flat=True)
+    )
+
+    return {
+        pk: state for pk, state in employees_as_of(candidates, at).items()
+        if state is not None and state['department'] == department
+    }
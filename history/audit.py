@@ -0,0 +1,218 @@
+"""
+Buffered writer for EmployeeHistory rows.
+
+record() never inserts on its own when it can wait: inside a transaction
+the entries pile up and go in with one bulk insert at on_commit (and are
+dropped with it on rollback); inside buffered(), e.g. for the length of a
+request, they go in when the block ends. Outside both they are written
+straight away.
+
+With AUDIT_BACKGROUND_FLUSH the flush hands the batch to a writer thread
+through a bounded queue. A full queue makes the flushing request wait up
+to AUDIT_QUEUE_TIMEOUT seconds and then write the batch itself, so a slow
+database slows requests down instead of losing history. The writer retries
+a failed insert with backoff and logs the rows of a batch it gives up on;
+at interpreter exit it stores everything still queued before it stops.
+
+updated_at is stamped when a batch is inserted, i.e. at commit time.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = 1000
+# Tries per batch in the background writer, with 1s, 2s, ... in between
+AUDIT_WRITE_ATTEMPTS = 4
+
+_local = threading.local()
+_queue = None
+_worker = None
+_worker_lock = threading.Lock()
+# Queued after the last batch to stop the writer
+_STOP = object()
+
+
+def record(entries):
+    """Queue unsaved EmployeeHistory instances for writing"""
+    entries = list(entries)
+    if not entries:
+        return
+
+    if connection.in_atomic_block:
+        _transaction_batch().extend(entries)
+    elif getattr(_local, 'scopes', None):
+        _local.scopes[-1].extend(entries)
+    else:
+        flush(entries)
+
+
+@contextmanager
+def buffered():
+    """Collect record() calls made outside transactions and flush them once at the end"""
+    if not hasattr(_local, 'scopes'):
+        _local.scopes = []
+    batch = []
+    _local.scopes.append(batch)
+    try:
+        yield batch
+    finally:
+        _local.scopes.pop()
+        if batch:
+            flush(batch)
+
+
+class _TransactionFlush:
+    """on_commit callback that writes the batch of one transaction (or savepoint)"""
+
+    def __init__(self):
+        self.batch = []
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        flush(self.batch)
+
+
+def _transaction_batch():
+    """
+    The batch for the current transaction (or savepoint). Its flush is
+    registered with on_commit once, when the batch is started.
+
+    Flushes are tracked per thread and savepoint in a weak mapping: once
+    Django drops a callback, because it ran or because its transaction or
+    savepoint rolled back, the entry goes away with it and the next record()
+    starts a fresh batch.
+    """
+    flushes = getattr(_local, 'transaction_flushes', None)
+    if flushes is None:
+        flushes = _local.transaction_flushes = weakref.WeakValueDictionary()
+
+    key = tuple(connection.savepoint_ids)
+    pending = flushes.get(key)
+    if pending is None or pending.done:
+        pending = flushes[key] = _TransactionFlush()
+        transaction.on_commit(pending)
+    return pending.batch
+
+
+def flush(entries):
+    """Write entries now, or hand them to the background writer when it is enabled"""
+    if not entries:
+        return
+    if not getattr(settings, 'AUDIT_BACKGROUND_FLUSH', False):
+        write(entries)
+        return
+
+    try:
+        _get_queue().put(list(entries), timeout=settings.AUDIT_QUEUE_TIMEOUT)
+    except queue.Full:
+        # Backpressure: the writer is behind, this request pays for its own batch
+        logger.warning('Audit queue full, writing %d history rows inline', len(entries))
+        write(entries)
+
+
+def write(entries):
+    from .models import EmployeeHistory
+
+    EmployeeHistory.objects.bulk_create(entries, batch_size=AUDIT_BATCH_SIZE)
+
+
+def _get_queue():
+    global _queue, _worker
+    with _worker_lock:
+        if _queue is None:
+            _queue = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        if _worker is None or not _worker.is_alive():
+            # A daemon, or the exit would wait for it before stop_background_writer runs
+            _worker = threading.Thread(target=_drain_forever, name='audit-writer', daemon=True)
+            _worker.start()
+    return _queue
+
+
+def _drain_forever():
+    while True:
+        batch = _queue.get()
+        if batch is _STOP:
+            _queue.task_done()
+            return
+        stop = False
+        try:
+            # Merge whatever else is waiting into the same insert
+            while len(batch) < AUDIT_BATCH_SIZE:
+                try:
+                    more = _queue.get_nowait()
+                except queue.Empty:
+                    break
+                _queue.task_done()
+                if more is _STOP:
+                    stop = True
+                    break
+                batch.extend(more)
+            _write_with_retries(batch)
+        finally:
+            _queue.task_done()
+        if stop:
+            return
+
+
+def _write_with_retries(entries):
+    """write() for the background writer; a batch that keeps failing is logged row by row"""
+    for attempt in range(AUDIT_WRITE_ATTEMPTS):
+        if attempt:
+            time.sleep(2 ** (attempt - 1))
+        try:
+            # Also replaces a connection the previous failure left unusable
+            close_old_connections()
+            write(entries)
+            return
+        except Exception:
+            logger.warning('Audit writer failed to store %d history rows (attempt %d)',
+                           len(entries), attempt + 1, exc_info=True)
+
+    logger.error('Audit writer gave up on %d history rows: %s', len(entries), json.dumps([
+        {
+            'employee_id': entry.employee_id,
+            'updated_by_id': entry.updated_by_id,
+            'field_name': entry.field_name,
+            'old_value': entry.old_value,
+            'new_value': entry.new_value,
+        }
+        for entry in entries
+    ]))
+
+
+@atexit.register
+def stop_background_writer():
+    """Store everything queued so far and stop the writer thread (runs at exit)"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None and worker.is_alive():
+        _queue.put(_STOP)
+        worker.join()
+    elif _queue is not None:
+        # The writer is gone; whatever it left behind is written here
+        while True:
+            try:
+                batch = _queue.get_nowait()
+            except queue.Empty:
+                break
+            if batch is not _STOP:
+                _write_with_retries(batch)
+            _queue.task_done()
+
+
+def wait_for_background_writes():
+    """Block until the background writer has stored everything queued so far"""
+    if _queue is not None:
+        _queue.join()
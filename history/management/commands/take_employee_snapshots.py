@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from accounts.models import Employee
+from history.as_of import take_snapshots
+
+
+class Command(BaseCommand):
+    """Periodic full snapshots that bound point-in-time lookups."""
+    help = 'Snapshots the tracked fields of employees whose latest snapshot is older than HISTORY_SNAPSHOT_INTERVAL_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Snapshot every employee regardless of age.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Snapshots per insert.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        employees = Employee.objects.order_by('pk')
+        if not options['all']:
+            stale = timezone.now() - timedelta(days=settings.HISTORY_SNAPSHOT_INTERVAL_DAYS)
+            employees = employees.annotate(last_snapshot=Max('snapshots__taken_at')).filter(
+                Q(last_snapshot__isnull=True) | Q(last_snapshot__lte=stale)
+            )
+
+        taken, last_pk = 0, 0
+        while True:
+            batch = list(employees.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            taken += len(take_snapshots(batch))
+
+        self.stdout.write(self.style.SUCCESS(f'Took {taken} employee snapshots.'))
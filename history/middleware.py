@@ -0,0 +1,12 @@
+from .audit import buffered
+
+
+class AuditBufferMiddleware:
+    """Write the history a request produces outside transactions in one insert, after the view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered():
+            return self.get_response(request)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0002_archivedemployeehistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employeehistory',
+            index=models.Index(fields=['employee', 'updated_at'], name='history_employee_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeehistory',
+            index=models.Index(fields=['updated_at'], name='history_updated_at_idx'),
+        ),
+    ]
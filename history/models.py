@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class EmployeeHistory(models.Model):
     employee = models.ForeignKey("accounts.Employee", on_delete=models.CASCADE, related_name="history")
@@ -9,5 +10,50 @@ class EmployeeHistory(models.Model):
     new_value = models.TextField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-employee history and the newest-first keyset pages of HistoryListView
+            models.Index(fields=['employee', 'updated_at'], name='history_employee_updated_idx'),
+            models.Index(fields=['updated_at'], name='history_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"{self.employee} | {self.field_name} updated by {self.updated_by} at {self.updated_at}"
+
+
+class ArchivedEmployeeHistory(models.Model):
+    """
+    Cold storage for EmployeeHistory rows older than ARCHIVE_AFTER_DAYS.
+
+    Same columns and ids as the live table, moved by archive_old_records;
+    history.archive reads both when a requested range reaches this far back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey("accounts.Employee", on_delete=models.CASCADE, related_name="archived_history")
+    updated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    field_name = models.CharField(max_length=100)
+    old_value = models.TextField(null=True, blank=True)
+    new_value = models.TextField(null=True, blank=True)
+    updated_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.employee} | {self.field_name} updated by {self.updated_by} at {self.updated_at} (archived)"
+
+
+class EmployeeSnapshot(models.Model):
+    """
+    Full copy of an employee's tracked fields at one moment, taken by
+    take_employee_snapshots. history.as_of starts from the latest snapshot
+    before a timestamp and replays only the EmployeeHistory rows after it.
+    """
+    employee = models.ForeignKey("accounts.Employee", on_delete=models.CASCADE, related_name="snapshots")
+    taken_at = models.DateTimeField(default=timezone.now)
+    values = models.JSONField(help_text="Tracked field values, stored as EmployeeHistory stores them")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'taken_at'], name='history_snapshot_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} | snapshot at {self.taken_at}"
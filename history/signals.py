@@ -1,57 +1,64 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from crum import get_current_user
 from accounts.models import Employee
+from .audit import record
 from .models import EmployeeHistory
 
-# A dictionary to hold the old state of the instance before it's saved
-_old_instance_map = {}
+# The fields we want to track for changes
+TRACKED_FIELDS = [
+    'first_name', 'last_name', 'position', 'department', 'salary',
+    'phone_number', 'address', 'vacation_days', 'sick_leaves'
+]
 
-@receiver(pre_save, sender=Employee)
-def capture_old_instance(sender, instance, **kwargs):
-    """Before an Employee object is saved, capture its current state from the database."""
-    if instance.pk:
-        try:
-            # Store the old instance in our map, keyed by its primary key
-            _old_instance_map[instance.pk] = sender.objects.get(pk=instance.pk)
-        except sender.DoesNotExist:
-            # This happens on creation, so there's no old instance to capture
-            pass
+def get_field_label(field_name):
+    """How a tracked field is named in EmployeeHistory.field_name"""
+    return field_name.replace('_', ' ').title()
+
+def take_snapshot(instance, fields=TRACKED_FIELDS):
+    """Remember the tracked values an Employee holds right now, as the baseline for its next save."""
+    snapshot = instance.__dict__.setdefault('_history_snapshot', {})
+    for field_name in fields:
+        # Deferred fields are not in __dict__; reading them would cost a query
+        if field_name in instance.__dict__:
+            snapshot[field_name] = instance.__dict__[field_name]
+
+@receiver(post_init, sender=Employee)
+def capture_loaded_values(sender, instance, **kwargs):
+    """Snapshot the tracked fields as they were loaded (from_db) or constructed, no extra query."""
+    take_snapshot(instance)
 
 @receiver(post_save, sender=Employee)
-def log_employee_changes(sender, instance, created, **kwargs):
-    """After an Employee object is saved, compare its old and new state and log changes."""
+def log_employee_changes(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """After an Employee object is saved, compare it with its snapshot and log the changes."""
+    fields = TRACKED_FIELDS
+    if update_fields is not None:
+        # e.g. save(update_fields=['last_login']) cannot have touched a tracked field
+        fields = [field_name for field_name in TRACKED_FIELDS if field_name in update_fields]
+        if not fields:
+            return
+
     # Don't log anything if the instance was just created
-    if created:
-        return
-
-    # Retrieve the old instance from our map
-    old_instance = _old_instance_map.pop(instance.pk, None)
-    if not old_instance:
-        return
-
-    # Get the user who made the change
-    user = get_current_user()
-    if not user or not user.pk: # Check if user is anonymous or not saved
-        user = None
-
-    # Define the fields we want to track for changes
-    tracked_fields = [
-        'first_name', 'last_name', 'position', 'department', 'salary',
-        'phone_number', 'address', 'vacation_days', 'sick_leaves'
-    ]
-
-    # Compare old and new values for each tracked field
-    for field_name in tracked_fields:
-        old_value = getattr(old_instance, field_name)
-        new_value = getattr(instance, field_name)
-
-        # If a value has changed, create a history record
-        if old_value != new_value:
-            EmployeeHistory.objects.create(
+    snapshot = instance.__dict__.get('_history_snapshot', {})
+    if not created and not raw:
+        # Get the user who made the change
+        user = get_current_user()
+        if not user or not user.pk: # Check if user is anonymous or not saved
+            user = None
+
+        # Written by the audit buffer, one insert per transaction or request
+        record(
+            EmployeeHistory(
                 employee=instance,
                 updated_by=user,
-                field_name=field_name.replace('_', ' ').title(), # e.g., 'first_name' -> 'First Name'
-                old_value=str(old_value),
-                new_value=str(new_value),
+                field_name=get_field_label(field_name), # e.g., 'first_name' -> 'First Name'
+                old_value=str(snapshot[field_name]),
+                new_value=str(instance.__dict__[field_name]),
             )
+            for field_name in fields
+            if field_name in snapshot and field_name in instance.__dict__
+            and snapshot[field_name] != instance.__dict__[field_name]
+        )
+
+    # What was just saved is the baseline for the next save of this instance
+    take_snapshot(instance, fields)
@@ -1,3 +1,368 @@
-from django.test import TestCase
+import queue
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import audit
+from .as_of import department_as_of, employee_as_of, employees_as_of, encode_values
+from .models import ArchivedEmployeeHistory, EmployeeHistory, EmployeeSnapshot
+
+User = get_user_model()
+
+
+class HistoryListViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_staffuser(
+            email='auditor@gmail.com', password='password123', first_name='Au', last_name='Ditor'
+        )
+        self.employees = [
+            User.objects.create_user(
+                email=f'logged{i}@gmail.com', password='password123', first_name='Logged', last_name=f'Person{i}'
+            )
+            for i in range(2)
+        ]
+        self.add_history(60)
+        # Several rows per timestamp so the id tie-breaker matters
+        start = timezone.now() - timedelta(days=1)
+        for i, pk in enumerate(EmployeeHistory.objects.order_by('pk').values_list('pk', flat=True)):
+            EmployeeHistory.objects.filter(pk=pk).update(updated_at=start + timedelta(minutes=i // 3))
+        self.client.force_login(self.staff)
+        self.url = reverse('history:history_list')
+
+    def add_history(self, count):
+        EmployeeHistory.objects.bulk_create(
+            EmployeeHistory(
+                employee=self.employees[i % 2],
+                updated_by=self.staff if i % 3 else None,
+                field_name='Position' if i % 2 else 'Department',
+                old_value=str(i), new_value=str(i + 1),
+            )
+            for i in range(count)
+        )
+
+    def walk(self, params):
+        seen = []
+        while True:
+            page = self.client.get(self.url, params).context['page_obj']
+            seen.extend(log.pk for log in page)
+            if not page.has_next():
+                return seen
+            params = {**params, 'after': page.next_cursor}
+
+    def test_cursor_walk_covers_every_row_once(self):
+        expected = list(EmployeeHistory.objects.order_by('-updated_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk({}), expected)
+
+        first = self.client.get(self.url).context['page_obj']
+        second = self.client.get(self.url, {'after': first.next_cursor}).context['page_obj']
+        back = self.client.get(self.url, {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual([log.pk for log in back], [log.pk for log in first])
+
+    def test_filters(self):
+        employee = self.employees[1]
+        expected = list(
+            EmployeeHistory.objects.filter(employee=employee, field_name='Position', updated_by=self.staff)
+            .order_by('-updated_at', '-id').values_list('pk', flat=True)
+        )
+        self.assertTrue(expected)
+        self.assertEqual(self.walk({'q': 'Person1', 'field': 'Position', 'editor': self.staff.pk}), expected)
+        self.assertEqual(self.walk({'end_date': (timezone.localdate() - timedelta(days=3)).isoformat()}), [])
+
+    def test_employee_filter_is_exact(self):
+        employee = self.employees[0]
+        expected = list(
+            EmployeeHistory.objects.filter(employee=employee).order_by('-updated_at', '-id').values_list('pk', flat=True)
+        )
+        self.assertEqual(self.walk({'employee': employee.pk}), expected)
+        self.assertEqual(self.walk({'employee': 0}), [])
+
+    def test_unarchived_old_rows_are_shown_by_default(self):
+        # Older than the cutoff, but the archive command has not run yet
+        old = EmployeeHistory.objects.create(employee=self.employees[0], field_name='Salary', old_value='1', new_value='2')
+        EmployeeHistory.objects.filter(pk=old.pk).update(updated_at=timezone.make_aware(datetime(2020, 5, 1, 9, 0)))
+        self.assertEqual(self.walk({})[-1], old.pk)
+
+    def test_archived_rows_join_older_ranges(self):
+        ArchivedEmployeeHistory.objects.create(
+            id=10_000, employee=self.employees[0], field_name='Salary', old_value='1', new_value='2',
+            updated_at=timezone.make_aware(datetime(2020, 5, 1, 9, 0)),
+        )
+        self.assertNotIn(10_000, self.walk({}))
+        self.assertEqual(self.walk({'start_date': '2020-01-01', 'field': 'Salary'}), [10_000])
+        self.assertEqual(self.walk({'start_date': '2020-01-01'})[-1], 10_000)
+
+    def test_page_cost_does_not_grow_with_rows(self):
+        def page_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url)
+            return len(queries)
+
+        before = page_queries()
+        self.add_history(200)
+        self.assertEqual(page_queries(), before)
+
+
+class ChangeCaptureTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            email='tracked@gmail.com', password='password123', first_name='Tra', last_name='Cked',
+            position='Clerk', department='Ops', salary=400,
+        )
+        self.employee = User.objects.get(email='tracked@gmail.com')
+
+    def save_and_capture(self, **kwargs):
+        # History is written when the surrounding transaction commits
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.employee.save(**kwargs)
+        return [query['sql'] for query in queries]
+
+    def test_changes_logged_with_one_insert_and_no_reload(self):
+        self.employee.position = 'Lead'
+        self.employee.department = 'Finance'
+        self.employee.vacation_days = None  # unchanged
+        sql = self.save_and_capture()
+
+        self.assertFalse([q for q in sql if q.startswith('SELECT') and 'FROM "accounts_employee"' in q])
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "history_employeehistory"')]), 1)
+        self.assertEqual(
+            sorted(EmployeeHistory.objects.values_list('field_name', 'old_value', 'new_value')),
+            [('Department', 'Ops', 'Finance'), ('Position', 'Clerk', 'Lead')],
+        )
+
+        # The saved values become the baseline for the next save
+        self.employee.position = 'Manager'
+        self.save_and_capture()
+        self.assertTrue(EmployeeHistory.objects.filter(old_value='Lead', new_value='Manager').exists())
+        self.assertEqual(EmployeeHistory.objects.count(), 3)
+
+    def test_untracked_update_fields_are_skipped(self):
+        self.employee.last_login = timezone.now()
+        sql = self.save_and_capture(update_fields=['last_login'])
+        self.assertEqual(len(sql), 1)  # just the UPDATE
+
+        # Only the listed tracked fields are compared
+        self.employee.position = 'Lead'
+        self.employee.sick_leaves = 3
+        self.save_and_capture(update_fields=['sick_leaves'])
+        self.assertEqual(list(EmployeeHistory.objects.values_list('field_name', flat=True)), ['Sick Leaves'])
+
+
+def history_inserts(queries):
+    return [query for query in queries if query['sql'].startswith('INSERT INTO "history_employeehistory"')]
+
+
+class AuditBufferTest(TestCase):
+    def setUp(self):
+        for i in range(20):
+            User.objects.create_user(
+                email=f'moved{i}@gmail.com', password='password123', first_name='Mo', last_name=f'Ved{i}',
+                department='Ops', salary=400,
+            )
+
+    def test_bulk_change_is_one_insert_at_commit(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for employee in User.objects.filter(email__startswith='moved'):
+                    employee.department = 'Finance'
+                    employee.salary = 450
+                    employee.save()
+            self.assertEqual(EmployeeHistory.objects.count(), 0)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(history_inserts(queries)), 1)
+        self.assertEqual(EmployeeHistory.objects.count(), 40)
+
+    def test_rolled_back_changes_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employees = list(User.objects.filter(email__startswith='moved')[:2])
+            employees[0].position = 'Kept'
+            employees[0].save()
+            try:
+                with transaction.atomic():
+                    employees[1].position = 'Rolled back'
+                    employees[1].save()
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(list(EmployeeHistory.objects.values_list('new_value', flat=True)), ['Kept'])
+
+
+class AuditWriterTest(TransactionTestCase):
+    def setUp(self):
+        User.objects.create_user(
+            email='writer@gmail.com', password='password123', first_name='Wri', last_name='Ter', salary=400,
+        )
+        self.employee = User.objects.get(email='writer@gmail.com')
+
+    def test_buffered_block_writes_once_at_the_end(self):
+        with CaptureQueriesContext(connection) as queries:
+            with audit.buffered():
+                for position in ['A', 'B', 'C']:
+                    self.employee.position = position
+                    self.employee.save()
+                self.assertEqual(EmployeeHistory.objects.count(), 0)
+        self.assertEqual(len(history_inserts(queries)), 1)
+        self.assertEqual(EmployeeHistory.objects.count(), 3)
+
+    def test_rolled_back_transaction_does_not_keep_its_batch(self):
+        try:
+            with transaction.atomic():
+                self.employee.position = 'Rolled back'
+                self.employee.save()
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            self.employee.position = 'Committed'
+            self.employee.save()
+        self.assertEqual(list(EmployeeHistory.objects.values_list('new_value', flat=True)), ['Committed'])
+
+    @override_settings(AUDIT_BACKGROUND_FLUSH=True)
+    def test_background_writer(self):
+        self.employee.position = 'Remote'
+        self.employee.save()
+        audit.wait_for_background_writes()
+        self.assertEqual(EmployeeHistory.objects.get().new_value, 'Remote')
+
+    @override_settings(AUDIT_BACKGROUND_FLUSH=True)
+    def test_stopping_the_writer_stores_queued_batches(self):
+        for position in ['Before', 'Exit']:
+            self.employee.position = position
+            self.employee.save()
+        audit.stop_background_writer()
+        self.assertIsNone(audit._worker)
+        self.assertEqual(audit._queue.unfinished_tasks, 0)
+        self.assertEqual(list(EmployeeHistory.objects.order_by('id').values_list('new_value', flat=True)), ['Before', 'Exit'])
+
+    @override_settings(AUDIT_BACKGROUND_FLUSH=True)
+    def test_failed_batch_is_retried(self):
+        attempts = []
+
+        def flaky_write(entries):
+            attempts.append(len(entries))
+            if len(attempts) == 1:
+                raise DatabaseError('connection lost')
+            write(entries)
+
+        write = audit.write
+        with mock.patch.object(audit, 'write', flaky_write), mock.patch.object(audit.time, 'sleep'), \
+                self.assertLogs('history.audit', 'WARNING'):
+            self.employee.position = 'Retried'
+            self.employee.save()
+            audit.wait_for_background_writes()
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(EmployeeHistory.objects.get().new_value, 'Retried')
+
+    def test_batch_that_keeps_failing_is_logged(self):
+        entry = EmployeeHistory(employee=self.employee, field_name='Position', old_value='A', new_value='B')
+        with mock.patch.object(audit, 'write', side_effect=DatabaseError('down')), \
+                mock.patch.object(audit.time, 'sleep'), self.assertLogs('history.audit', 'ERROR') as logs:
+            audit._write_with_retries([entry])
+        self.assertIn('"new_value": "B"', logs.output[-1])
+
+    @override_settings(AUDIT_BACKGROUND_FLUSH=True, AUDIT_QUEUE_TIMEOUT=0.01)
+    def test_full_queue_writes_inline(self):
+        full = queue.Queue(maxsize=1)
+        full.put([])
+        with mock.patch.object(audit, '_get_queue', return_value=full), self.assertLogs('history.audit', 'WARNING'):
+            self.employee.position = 'Pressured'
+            self.employee.save()
+        self.assertEqual(EmployeeHistory.objects.get().new_value, 'Pressured')
+
+
+def moment(month, day=1):
+    return timezone.make_aware(datetime(2024, month, day, 12, 0))
+
+
+class AsOfTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='historian@gmail.com', password='password123', first_name='His', last_name='Torian'
+        )
+        # Created on Jan 1st as an Ops clerk, now a Finance lead on 500
+        self.employee = User.objects.create_user(
+            email='timeline@gmail.com', password='password123', first_name='Time', last_name='Line',
+            position='Lead', department='Finance', salary=500,
+        )
+        self.other = User.objects.create_user(
+            email='bystander@gmail.com', password='password123', first_name='By', last_name='Stander',
+            position='Clerk', department='Finance', salary=400,
+        )
+        User.objects.filter(pk__in=[self.employee.pk, self.other.pk]).update(timestamp=moment(1))
+        for when, field_name, old_value, new_value in [
+            (moment(2), 'Position', 'Clerk', 'Lead'),
+            (moment(3), 'Department', 'Ops', 'Finance'),
+            (moment(4), 'Salary', '400.0', '500.0'),
+        ]:
+            history = EmployeeHistory.objects.create(
+                employee=self.employee, field_name=field_name, old_value=old_value, new_value=new_value,
+            )
+            EmployeeHistory.objects.filter(pk=history.pk).update(updated_at=when)
+
+    def snapshot(self, when, **values):
+        state = encode_values(self.employee)
+        state.update(values)
+        return EmployeeSnapshot.objects.create(employee=self.employee, taken_at=when, values=state)
+
+    def fields(self, state):
+        return state['position'], state['department'], state['salary']
+
+    def test_rebuilt_backwards_without_snapshots(self):
+        self.assertEqual(self.fields(employee_as_of(self.employee, moment(2, 15))), ('Lead', 'Ops', 400.0))
+        self.assertEqual(self.fields(employee_as_of(self.employee, moment(1, 15))), ('Clerk', 'Ops', 400.0))
+        self.assertIsNone(employee_as_of(self.employee, timezone.make_aware(datetime(2023, 12, 1))))
+
+    def test_rebuilt_forward_from_latest_snapshot(self):
+        self.snapshot(moment(2, 20), department='Ops', salary='400.0')
+        # Deltas before the snapshot are never read
+        EmployeeHistory.objects.filter(field_name='Position').delete()
+
+        self.assertEqual(self.fields(employee_as_of(self.employee, moment(3, 15))), ('Lead', 'Finance', 400.0))
+        self.assertEqual(self.fields(employee_as_of(self.employee, moment(5))), ('Lead', 'Finance', 500.0))
+        # Before the first snapshot, rebuilt backwards from it
+        self.assertEqual(self.fields(employee_as_of(self.employee, moment(1, 15))), ('Lead', 'Ops', 400.0))
+
+    def test_batch_queries_do_not_grow_with_employees(self):
+        self.snapshot(moment(2, 20), department='Ops', salary='400.0')
+        # Both directions read the live and (2024 is behind the cutoff) the archived history
+        with self.assertNumQueries(8):
+            states = employees_as_of([self.employee.pk, self.other.pk, self.staff.pk], moment(3, 15))
+        self.assertEqual(self.fields(states[self.employee.pk]), ('Lead', 'Finance', 400.0))
+        self.assertEqual(self.fields(states[self.other.pk]), ('Clerk', 'Finance', 400.0))
+        self.assertIsNone(states[self.staff.pk])  # created today
+
+    def test_department_as_of(self):
+        self.assertEqual(list(department_as_of('Ops', moment(2, 15))), [self.employee.pk])
+        self.assertEqual(list(department_as_of('Finance', moment(2, 15))), [self.other.pk])
+        self.assertEqual(sorted(department_as_of('Finance', moment(5))), [self.employee.pk, self.other.pk])
+
+    def test_api(self):
+        self.client.force_login(self.staff)
+        url = reverse('history:employee_as_of', args=[self.employee.slug])
+        response = self.client.get(url, {'at': '2024-02-15'})
+        self.assertEqual(response.json()['fields']['department'], 'Ops')
+        self.assertEqual(self.client.get(url, {'at': '2023-01-01'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'at': 'yesterday'}).status_code, 400)
+
+        response = self.client.get(reverse('history:department_as_of'), {'department': 'Ops', 'at': '2024-02-15'})
+        self.assertEqual([row['employee'] for row in response.json()['employees']], [self.employee.slug])
+
+    def test_api_bare_date_means_end_of_day(self):
+        self.client.force_login(self.staff)
+        url = reverse('history:employee_as_of', args=[self.employee.slug])
+        # Created at noon on Jan 1st and moved to Finance at noon on Mar 1st
+        response = self.client.get(url, {'at': '2024-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['fields']['department'], 'Ops')
+        self.assertEqual(self.client.get(url, {'at': '2024-03-01'}).json()['fields']['department'], 'Finance')
+        self.assertEqual(self.client.get(url, {'at': '2024-03-01T11:00:00'}).json()['fields']['department'], 'Ops')
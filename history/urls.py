@@ -17,10 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
-from history.views import HistoryListView
+from history.views import HistoryListView, department_as_of_api, employee_as_of_api
 app_name = 'history'
 urlpatterns = [
-    path('', HistoryListView.as_view(), name='history_list')
+    path('', HistoryListView.as_view(), name='history_list'),
+    path('api/as-of/department/', department_as_of_api, name='department_as_of'),
+    path('api/as-of/<slug:slug>/', employee_as_of_api, name='employee_as_of'),
 
 
 
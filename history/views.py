@@ -1,10 +1,21 @@
+from datetime import datetime, time
+
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.generic import ListView
+from .archive import employee_history_sources, get_archive_cutoff
+from .as_of import department_as_of, employee_as_of
 from .models import EmployeeHistory
+from .signals import TRACKED_FIELDS, get_field_label
 
 from accounts.models import Employee
+from accounts.search import filter_by_employee_search
+from attendance.pagination import paginate_by_date
 
 
 
@@ -12,10 +23,134 @@ class HistoryListView(UserPassesTestMixin, ListView):
     template_name = 'history.html'
     context_object_name = 'histories'
     model = EmployeeHistory
-    ordering = ['-updated_at']  # Order by most recent updates first
+    paginate_by = 50
 
     def test_func(self):
         # This function must return True or False.
         # It should check if the logged-in user is a staff member (which includes superusers).
         return self.request.user.is_staff
 
+    def get_filters(self):
+        """Server-side filters from the query string; bad values are ignored"""
+        params = self.request.GET
+        try:
+            self.start_date = parse_date(params.get('start_date') or '')
+            self.end_date = parse_date(params.get('end_date') or '')
+        except ValueError:
+            self.start_date = self.end_date = None
+
+        filters = {}
+        if params.get('field') in self.field_choices:
+            filters['field_name'] = params['field']
+        if (params.get('editor') or '').isdigit():
+            filters['updated_by_id'] = int(params['editor'])
+        if (params.get('employee') or '').isdigit():
+            filters['employee_id'] = int(params['employee'])
+        return filters
+
+    def get_queryset(self):
+        # Without a start date the whole live table is shown (rows not yet
+        # archived included); an older start date pulls in the archive as well
+        self.field_choices = [get_field_label(field) for field in TRACKED_FIELDS]
+        filters = self.get_filters()
+        sources = employee_history_sources(
+            self.start_date, self.end_date, include_archive=self.start_date is not None, **filters
+        )
+        query = (self.request.GET.get('q') or '').strip()
+        if query:
+            # Indexed employee search (FTS5 locally, tsvector/trigram on PostgreSQL)
+            sources = [filter_by_employee_search(source, query) for source in sources]
+        return sources
+
+    def paginate_queryset(self, queryset, page_size):
+        # Keyset pagination on (updated_at, id), newest first: ?after=/?before= cursors
+        page = paginate_by_date(
+            queryset, page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+            field='updated_at',
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filters = self.request.GET.copy()
+        filters.pop('after', None)
+        filters.pop('before', None)
+        context.update({
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'archive_cutoff': get_archive_cutoff(),
+            'field_choices': self.field_choices,
+            'editors': Employee.objects.filter(staff=True).order_by('first_name', 'last_name'),
+            'employee_filter': Employee.objects.filter(pk=filters.get('employee')).first()
+            if (filters.get('employee') or '').isdigit() else None,
+            'filter_query': filters.urlencode(),
+        })
+        return context
+
+
+def is_staff(user):
+    return user.is_staff
+
+
+def parse_as_of(value):
+    """?at= as an aware datetime; a bare date means the end of that day"""
+    if not value:
+        return timezone.now()
+    # parse_datetime also accepts a bare date (as midnight), so check for one first
+    day = parse_date(value)
+    if day is not None:
+        at = datetime.combine(day, time.max)
+    else:
+        at = parse_datetime(value)
+        if at is None:
+            raise ValueError(value)
+    return timezone.make_aware(at) if timezone.is_naive(at) else at
+
+
+def serialize_state(state):
+    return {field_name: None if value is None else str(value) for field_name, value in state.items()}
+
+
+@login_required
+@user_passes_test(is_staff)
+def employee_as_of_api(request, slug):
+    """
+    Tracked fields of one employee as they were at ?at= (ISO date or
+    datetime, default now). 404 if the employee did not exist yet.
+    """
+    employee = get_object_or_404(Employee, slug=slug)
+    try:
+        at = parse_as_of(request.GET.get('at'))
+    except ValueError:
+        return JsonResponse({'error': 'at must be an ISO date or datetime'}, status=400)
+
+    state = employee_as_of(employee, at)
+    if state is None:
+        return JsonResponse({'error': f'{employee} did not exist at {at.isoformat()}'}, status=404)
+    return JsonResponse({'employee': employee.slug, 'at': at.isoformat(), 'fields': serialize_state(state)})
+
+
+@login_required
+@user_passes_test(is_staff)
+def department_as_of_api(request):
+    """Everyone in ?department= at ?at=, with their tracked fields as of then"""
+    department = request.GET.get('department')
+    if not department:
+        return JsonResponse({'error': 'department is required'}, status=400)
+    try:
+        at = parse_as_of(request.GET.get('at'))
+    except ValueError:
+        return JsonResponse({'error': 'at must be an ISO date or datetime'}, status=400)
+
+    states = department_as_of(department, at)
+    slugs = dict(Employee.objects.filter(pk__in=states).values_list('pk', 'slug'))
+    return JsonResponse({
+        'department': department,
+        'at': at.isoformat(),
+        'employees': [
+            {'employee': slugs[pk], 'fields': serialize_state(state)}
+            for pk, state in sorted(states.items())
+        ],
+    })
@@ -0,0 +1,166 @@
+"""
+Streaming writers for the payroll register export.
+
+Both writers take an iterable of row dicts and yield bytes as soon as each
+row is formatted, so StreamingHttpResponse can send them without holding
+the whole file in memory. XLSX is written with the standard library only:
+the worksheet is a zip member streamed through a small drain buffer.
+Under ASGI the writers are wrapped in as_async_stream, since Django would
+otherwise load a synchronous iterator into memory before sending it.
+"""
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+
+# Employees computed per payroll query while exporting
+EXPORT_CHUNK_SIZE = 200
+
+# Same fields as notifications.views.get_employee_payroll_data, in column order
+PAYROLL_REGISTER_COLUMNS = [
+    'id', 'name', 'position', 'department', 'photo',
+    'hourly_rate', 'overtime_rate', 'weekly_hours',
+    'regular_hours', 'overtime_hours', 'total_overtime_hours', 'unapproved_overtime_hours',
+    'pending_overtime_hours', 'regular_pay', 'overtime_pay', 'total_earnings',
+    'period_start', 'period_end', 'paycheck_already_sent', 'has_pending_overtime',
+]
+
+NUMERIC_COLUMNS = {
+    'hourly_rate', 'overtime_rate', 'weekly_hours', 'regular_hours', 'overtime_hours',
+    'total_overtime_hours', 'unapproved_overtime_hours', 'pending_overtime_hours',
+    'regular_pay', 'overtime_pay', 'total_earnings',
+}
+
+
+class _Echo:
+    """File-like object that hands back whatever is written to it (for csv.writer)"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns).encode('utf-8')
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns]).encode('utf-8')
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that zipfile writes into and the generator drains"""
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(reference, value, numeric):
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if value is None or value == '':
+        return ''
+    if numeric or isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    return f'<c r="{reference}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Payroll Register" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def stream_xlsx(columns, rows):
+    buffer = _DrainBuffer()
+    letters = [_column_letter(index) for index in range(len(columns))]
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(
+                _xlsx_cell(f'{letter}1', column, False) for letter, column in zip(letters, columns)
+            )
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                f'<row r="1">{header}</row>'
+            ).encode('utf-8'))
+            yield buffer.drain()
+
+            for row_number, row in enumerate(rows, start=2):
+                cells = ''.join(
+                    _xlsx_cell(f'{letter}{row_number}', row[column], column in NUMERIC_COLUMNS)
+                    for letter, column in zip(letters, columns)
+                )
+                sheet.write(f'<row r="{row_number}">{cells}</row>'.encode('utf-8'))
+                # The compressor holds data back, only send when it let something through
+                data = buffer.drain()
+                if data:
+                    yield data
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield buffer.drain()
+
+
+async def as_async_stream(chunks):
+    """
+    Async iterator over a synchronous one: each chunk is produced in the
+    sync thread (so payroll queries keep their database connection) and
+    handed to the ASGI server before the next one is computed.
+    """
+    done = object()
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
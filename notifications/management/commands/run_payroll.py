@@ -0,0 +1,108 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.payroll import get_week_range
+from notifications.models import PayrollRun
+from notifications.payroll_runs import init_worker, plan_shards, process_shard
+
+
+class Command(BaseCommand):
+    """Compute payroll for every active employee for a period, sharded over a process pool."""
+    help = 'Runs payroll for a whole period. Interrupted runs can be resumed with --resume.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Period start (YYYY-MM-DD). Defaults to this Monday.')
+        parser.add_argument('--end', help='Period end (YYYY-MM-DD). Defaults to this Sunday.')
+        parser.add_argument('--shard-by', choices=['department', 'id_range'], default='department',
+                            help='Split the work per department or per employee ID range.')
+        parser.add_argument('--shard-size', type=int, default=500, help='Employees per shard when sharding by ID range.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes. Use 1 to run in the current process.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the latest unfinished run for the same period instead of starting a new one.')
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
+
+    def get_run(self, start_date, end_date, options):
+        if options['resume']:
+            run = PayrollRun.objects.filter(
+                period_start=start_date,
+                period_end=end_date,
+                shard_by=options['shard_by'],
+                status='running',
+            ).first()
+            if run is not None:
+                self.stdout.write(self.style.WARNING(f'Resuming payroll run {run.pk}.'))
+                return run
+            self.stdout.write(self.style.WARNING('No unfinished run for this period, starting a new one.'))
+
+        run = PayrollRun.objects.create(period_start=start_date, period_end=end_date, shard_by=options['shard_by'])
+        plan_shards(run, options['shard_size'])
+        return run
+
+    def handle(self, *args, **options):
+        if bool(options['start']) != bool(options['end']):
+            raise CommandError('Provide both --start and --end, or neither.')
+        if options['start']:
+            start_date = self.parse_date(options['start'])
+            end_date = self.parse_date(options['end'])
+        else:
+            start_date, end_date = get_week_range()
+
+        run = self.get_run(start_date, end_date, options)
+        pending = list(run.shards.exclude(status='done').values_list('pk', flat=True))
+        self.stdout.write(
+            f'Payroll run {run.pk} for {start_date} - {end_date}: '
+            f'{len(pending)} of {run.shards.count()} shards to process.'
+        )
+
+        processed = 0
+        failed = 0
+        started = time.monotonic()
+
+        if options['workers'] <= 1:
+            for shard_id in pending:
+                label, count = process_shard(shard_id)
+                processed += count
+                self.stdout.write(f'  {label}: {count} employees')
+        else:
+            # Workers must not inherit this process' database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+                futures = {executor.submit(process_shard, shard_id): shard_id for shard_id in pending}
+                for future in as_completed(futures):
+                    try:
+                        label, count = future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f'  shard {futures[future]} failed: {e}'))
+                        continue
+                    processed += count
+                    self.stdout.write(f'  {label}: {count} employees')
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed > 0 else 0
+
+        if failed or run.shards.exclude(status='done').exists():
+            self.stdout.write(self.style.ERROR(
+                f'Payroll run {run.pk} is incomplete ({failed} shards failed). Re-run with --resume to finish it.'
+            ))
+        else:
+            run.employee_count = run.shards.aggregate(total=Sum('employee_count'))['total'] or 0
+            run.status = 'completed'
+            run.finished_at = timezone.now()
+            run.save(update_fields=['employee_count', 'status', 'finished_at'])
+            self.stdout.write(self.style.SUCCESS(f'Payroll run {run.pk} completed for {run.employee_count} employees.'))
+
+        self.stdout.write(f'Processed {processed} employees in {elapsed:.2f}s ({rate:.1f} employees/sec).')
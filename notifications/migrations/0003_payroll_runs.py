@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_paychecknotification_week_end_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('shard_by', models.CharField(choices=[('department', 'Department'), ('id_range', 'Employee ID range')], default='department', max_length=20)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20)),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('regular_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('approved_overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('total_overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('unapproved_overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('regular_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('overtime_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('hourly_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('overtime_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_results', to=settings.AUTH_USER_MODEL)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='notifications.payrollrun')),
+            ],
+            options={
+                'unique_together': {('run', 'employee')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollRunShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=255)),
+                ('department', models.CharField(blank=True, max_length=255, null=True)),
+                ('first_employee_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_employee_id', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done')], default='pending', max_length=20)),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='notifications.payrollrun')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'unique_together': {('run', 'label')},
+            },
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.utils import timezone
 from accounts.models import Employee
 from django.apps import AppConfig
 from datetime import timedelta
+from decimal import Decimal
 
 class PaycheckNotification(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='paycheck_notifications')
@@ -44,3 +45,97 @@ class PaycheckNotification(models.Model):
         start_of_week = today - timedelta(days=today.weekday())  # Monday
         end_of_week = start_of_week + timedelta(days=6)  # Sunday
         return start_of_week, end_of_week
+
+
+class PayrollRun(models.Model):
+    """A payroll batch computed by the run_payroll command for one period"""
+    SHARD_CHOICES = [
+        ('department', 'Department'),
+        ('id_range', 'Employee ID range'),
+    ]
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    ]
+
+    period_start = models.DateField()
+    period_end = models.DateField()
+    shard_by = models.CharField(max_length=20, choices=SHARD_CHOICES, default='department')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    employee_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Payroll run {self.pk} for {self.period_start} - {self.period_end} ({self.status})"
+
+
+class PayrollRunShard(models.Model):
+    """One unit of work of a payroll run; finished shards are skipped when a run is resumed"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ]
+
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='shards')
+    label = models.CharField(max_length=255)
+    department = models.CharField(max_length=255, null=True, blank=True)
+    first_employee_id = models.BigIntegerField(null=True, blank=True)
+    last_employee_id = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    employee_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['pk']
+        unique_together = ['run', 'label']
+
+    def __str__(self):
+        return f"Shard {self.label} of run {self.run_id} ({self.status})"
+
+    def get_employees(self):
+        """Active employees covered by this shard"""
+        employees = Employee.objects.filter(active=True)
+        if self.department is not None:
+            return employees.filter(department=self.department)
+        return employees.filter(pk__range=[self.first_employee_id, self.last_employee_id])
+
+
+class PayrollResult(models.Model):
+    """Payroll breakdown of one employee within a payroll run"""
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='results')
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='payroll_results')
+    regular_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    approved_overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    total_overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    unapproved_overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    regular_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    overtime_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    overtime_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    BREAKDOWN_FIELDS = [
+        'regular_hours', 'approved_overtime_hours', 'total_overtime_hours', 'unapproved_overtime_hours',
+        'regular_pay', 'overtime_pay', 'total_pay', 'hourly_rate', 'overtime_rate',
+    ]
+
+    class Meta:
+        unique_together = ['run', 'employee']
+
+    def __str__(self):
+        return f"Payroll result for {self.employee} in run {self.run_id}"
+
+    @classmethod
+    def from_breakdown(cls, run, employee, breakdown):
+        """Build an unsaved result from an Employee.calculate_payroll_breakdown dict"""
+        return cls(
+            run=run,
+            employee=employee,
+            **{field: Decimal(str(breakdown[field])) for field in cls.BREAKDOWN_FIELDS}
+        )
@@ -0,0 +1,84 @@
+"""
+Shard planning and shard workers for the run_payroll command.
+
+Model imports stay inside the functions so this module can be loaded by
+freshly spawned worker processes before Django is set up.
+"""
+import django
+
+
+def init_worker():
+    """Process pool initializer: make sure Django is ready in the worker process"""
+    django.setup()
+
+
+def plan_shards(run, shard_size=500):
+    """Create the shard rows for a new payroll run and return them"""
+    from accounts.models import Employee
+    from .models import PayrollRunShard
+
+    employees = Employee.objects.filter(active=True)
+
+    if run.shard_by == 'department':
+        departments = employees.order_by('department').values_list('department', flat=True).distinct()
+        shards = [
+            PayrollRunShard(run=run, label=department or '(no department)', department=department)
+            for department in departments
+        ]
+    else:
+        employee_ids = list(employees.order_by('pk').values_list('pk', flat=True))
+        shards = []
+        for offset in range(0, len(employee_ids), shard_size):
+            chunk = employee_ids[offset:offset + shard_size]
+            shards.append(PayrollRunShard(
+                run=run,
+                label=f"{chunk[0]}-{chunk[-1]}",
+                first_employee_id=chunk[0],
+                last_employee_id=chunk[-1],
+            ))
+
+    return PayrollRunShard.objects.bulk_create(shards)
+
+
+def process_shard(shard_id):
+    """
+    Compute payroll for every employee in a shard and store the results.
+
+    Results and the shard's "done" checkpoint are written in the same
+    transaction, so a crash either keeps the whole shard or none of it.
+    Returns (shard label, number of employees processed).
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from accounts.payroll import calculate_payroll_breakdowns
+    from .models import PayrollResult, PayrollRunShard
+
+    shard = PayrollRunShard.objects.select_related('run').get(pk=shard_id)
+    if shard.status == 'done':
+        return shard.label, 0
+
+    run = shard.run
+    PayrollRunShard.objects.filter(pk=shard.pk).update(status='running', started_at=timezone.now())
+
+    employees = list(shard.get_employees())
+    breakdowns = calculate_payroll_breakdowns(employees, run.period_start, run.period_end)
+    results = [
+        PayrollResult.from_breakdown(run, employee, breakdowns[employee.pk])
+        for employee in employees
+    ]
+
+    with transaction.atomic():
+        PayrollResult.objects.bulk_create(
+            results,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['run', 'employee'],
+            update_fields=PayrollResult.BREAKDOWN_FIELDS,
+        )
+        PayrollRunShard.objects.filter(pk=shard.pk).update(
+            status='done',
+            employee_count=len(employees),
+            finished_at=timezone.now(),
+        )
+
+    return shard.label, len(employees)
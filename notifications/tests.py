@@ -0,0 +1,345 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.payroll import calculate_payroll_breakdowns
+from attendance.models import Attendance
+from .exports import PAYROLL_REGISTER_COLUMNS
+from .models import PaycheckNotification, PayrollResult, PayrollRun, PayrollRunShard
+from .payroll_runs import process_shard
+from .views import MAX_BATCH_EMPLOYEES
+
+User = get_user_model()
+
+WEEK_START = date(2025, 3, 3)  # Monday
+WEEK_END = WEEK_START + timedelta(days=6)
+
+
+def create_employees(count, departments=('Ops', 'Finance', 'Sales')):
+    """Employees spread over the departments, each with a few days of attendance in WEEK_START's week"""
+    employees = []
+    for index in range(count):
+        employee = User.objects.create_user(
+            email=f'worker{index}@gmail.com', password='password123',
+            first_name='Worker', last_name=f'No{index}',
+            department=departments[index % len(departments)], salary=400 + 25 * index,
+        )
+        for day in range(3):
+            time_in = timezone.make_aware(datetime(2025, 3, 3 + day, 8, 0))
+            Attendance.objects.create(
+                employee=employee,
+                date=WEEK_START + timedelta(days=day),
+                time_in=time_in,
+                time_out=time_in + timedelta(hours=8, minutes=30 * (index + day)),
+            )
+        employees.append(employee)
+    return employees
+
+
+class RunPayrollCommandTest(TransactionTestCase):
+    """Worker processes read the on-disk test database, hence TransactionTestCase"""
+
+    def setUp(self):
+        self.employees = create_employees(6)
+
+    def run_payroll(self, **options):
+        call_command(
+            'run_payroll', start=str(WEEK_START), end=str(WEEK_END), stdout=StringIO(), **options
+        )
+        return PayrollRun.objects.first()
+
+    def assertResultsMatch(self, run):
+        """Exactly one result per employee, equal to calculate_payroll_breakdown"""
+        results = {result.employee_id: result for result in run.results.all()}
+        self.assertEqual(run.results.count(), len(results))
+        self.assertEqual(set(results), {employee.pk for employee in self.employees})
+        for employee in self.employees:
+            breakdown = employee.calculate_payroll_breakdown(WEEK_START, WEEK_END)
+            for field in PayrollResult.BREAKDOWN_FIELDS:
+                self.assertEqual(getattr(results[employee.pk], field), Decimal(str(breakdown[field])), field)
+
+    def result_values(self, run):
+        return {
+            tuple(row[1:]) for row in
+            run.results.values_list('run', 'employee', *PayrollResult.BREAKDOWN_FIELDS)
+        }
+
+    def test_one_worker_and_several_workers_agree(self):
+        single = self.run_payroll(workers=1)
+        self.assertEqual(single.status, 'completed')
+        self.assertEqual(single.employee_count, 6)
+        self.assertResultsMatch(single)
+
+        parallel = self.run_payroll(workers=2)
+        self.assertNotEqual(parallel.pk, single.pk)
+        self.assertEqual(parallel.status, 'completed')
+        self.assertEqual(set(parallel.shards.values_list('status', flat=True)), {'done'})
+        self.assertResultsMatch(parallel)
+        self.assertEqual(self.result_values(parallel), self.result_values(single))
+
+    def test_id_range_shards(self):
+        run = self.run_payroll(workers=2, shard_by='id_range', shard_size=4)
+        self.assertEqual(run.shards.count(), 2)
+        self.assertEqual(run.status, 'completed')
+        self.assertResultsMatch(run)
+
+    def test_interrupted_run_is_resumed(self):
+        calls = []
+
+        def crash_on_second_shard(shard_id):
+            calls.append(shard_id)
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return process_shard(shard_id)
+
+        with mock.patch('notifications.management.commands.run_payroll.process_shard', crash_on_second_shard):
+            with self.assertRaises(RuntimeError):
+                self.run_payroll(workers=1)
+
+        run = PayrollRun.objects.get()
+        self.assertEqual(run.status, 'running')
+        done = set(run.shards.filter(status='done').values_list('pk', flat=True))
+        self.assertEqual(done, {calls[0]})
+        finished_at = PayrollRunShard.objects.get(pk=calls[0]).finished_at
+
+        resumed = self.run_payroll(workers=2, resume=True)
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual(resumed.status, 'completed')
+        # The checkpointed shard was not processed again
+        self.assertEqual(PayrollRunShard.objects.get(pk=calls[0]).finished_at, finished_at)
+        self.assertResultsMatch(resumed)
+
+    def test_processing_a_shard_twice_keeps_one_result_per_employee(self):
+        run = self.run_payroll(workers=1)
+        shard = run.shards.first()
+        PayrollRunShard.objects.filter(pk=shard.pk).update(status='running')
+        process_shard(shard.pk)
+        self.assertResultsMatch(run)
+
+
+class BulkPaycheckNotificationTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='payroll@gmail.com', password='password123', first_name='Pay', last_name='Master'
+        )
+        self.employees = create_employees(4)
+        self.client.force_login(self.staff)
+        self.url = reverse('notifications:bulk_send_paycheck')
+
+    def send(self, employees):
+        return self.client.post(self.url, {
+            'employee_ids': [employee.pk for employee in employees],
+            'week_start_date': str(WEEK_START),
+            'week_end_date': str(WEEK_END),
+        })
+
+    def test_already_notified_employee_is_skipped(self):
+        notified = self.employees[0]
+        PaycheckNotification.objects.create(
+            employee=notified, amount=Decimal('1.00'), week_start_date=WEEK_START, week_end_date=WEEK_END,
+        )
+
+        # session, user, employees, already sent, weekly summaries, one insert, sent count
+        with self.assertNumQueries(7):
+            response = self.send(self.employees)
+        self.assertRedirects(response, self.url)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            [f'Sent 3 notification(s) for {WEEK_START} to {WEEK_END}.',
+             'Skipped 1 employee(s) who were already notified for this period.'],
+        )
+
+        self.assertEqual(PaycheckNotification.objects.get(employee=notified).amount, Decimal('1.00'))
+        self.assertEqual(PaycheckNotification.objects.count(), len(self.employees))
+        for employee in self.employees[1:]:
+            notification = PaycheckNotification.objects.get(employee=employee)
+            breakdown = employee.calculate_payroll_breakdown(WEEK_START, WEEK_END)
+            self.assertEqual(notification.amount, Decimal(str(breakdown['total_pay'])))
+            self.assertEqual(notification.sent_by, self.staff)
+
+    def test_concurrent_send_is_reported_as_skipped(self):
+        bulk_create = PaycheckNotification.objects.bulk_create
+
+        def racing_bulk_create(notifications, **kwargs):
+            # Another request notifies the first employee between the check and the insert
+            PaycheckNotification.objects.create(
+                employee=self.employees[0], amount=Decimal('1.00'), week_start_date=WEEK_START, week_end_date=WEEK_END,
+            )
+            return bulk_create(notifications, **kwargs)
+
+        with mock.patch.object(PaycheckNotification.objects, 'bulk_create', racing_bulk_create):
+            response = self.send(self.employees)
+
+        self.assertEqual(PaycheckNotification.objects.get(employee=self.employees[0]).amount, Decimal('1.00'))
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            [f'Sent 3 notification(s) for {WEEK_START} to {WEEK_END}.',
+             'Skipped 1 employee(s) who were already notified for this period.'],
+        )
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        with self.assertNumQueries(7):
+            self.send(self.employees[:1])
+        PaycheckNotification.objects.all().delete()
+        with self.assertNumQueries(7):
+            self.send(self.employees)
+        self.assertEqual(PaycheckNotification.objects.count(), len(self.employees))
+
+
+class EmployeesPayrollDataTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='payroll@gmail.com', password='password123', first_name='Pay', last_name='Master'
+        )
+        self.employees = create_employees(5)
+        self.client.force_login(self.staff)
+
+    def fetch(self, employees, **headers):
+        return self.client.get(reverse('notifications:get_employees_payroll_data'), {
+            'ids': ','.join(str(employee.pk) for employee in employees),
+            'start_date': str(WEEK_START),
+            'end_date': str(WEEK_END),
+        }, headers=headers)
+
+    def test_payload_matches_breakdowns(self):
+        response = self.fetch(self.employees)
+        self.assertEqual(response.status_code, 200)
+        rows = {row['id']: row for row in response.json()['employees']}
+        for employee in self.employees:
+            breakdown = employee.calculate_payroll_breakdown(WEEK_START, WEEK_END)
+            self.assertEqual(rows[employee.pk]['total_earnings'], str(breakdown['total_pay']))
+            self.assertEqual(rows[employee.pk]['regular_hours'], breakdown['regular_hours'])
+
+    def test_not_modified_until_attendance_changes(self):
+        response = self.fetch(self.employees)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+
+        response = self.fetch(self.employees, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        record = Attendance.objects.filter(employee=self.employees[0]).first()
+        record.time_out += timedelta(hours=1)
+        record.save()
+
+        response = self.fetch(self.employees, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_send_page_prefetches_in_accepted_batches(self):
+        response = self.client.get(reverse('notifications:create_notification'))
+        self.assertEqual(response.context['payroll_batch_size'], MAX_BATCH_EMPLOYEES)
+        self.assertContains(response, f'const payrollBatchSize = {MAX_BATCH_EMPLOYEES};')
+        self.assertContains(response, "headers['If-None-Match']")
+
+    def test_query_count_does_not_grow_with_employees(self):
+        # session, user, employees, attendance and paycheck validators,
+        # weekly summaries, pending overtime, sent paychecks
+        with self.assertNumQueries(8):
+            self.fetch(self.employees[:1])
+        with self.assertNumQueries(8):
+            self.fetch(self.employees)
+        # A 304 stops after the validators
+        etag = self.fetch(self.employees).headers['ETag']
+        with self.assertNumQueries(5):
+            self.fetch(self.employees, if_none_match=etag)
+
+
+SHEET_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def read_xlsx_rows(content):
+    """Cell texts of the first worksheet, row by row"""
+    with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+    rows = []
+    for row in sheet.iterfind('s:sheetData/s:row', SHEET_NS):
+        cells = {}
+        for cell in row.iterfind('s:c', SHEET_NS):
+            column = cell.get('r').rstrip('0123456789')
+            value = cell.find('s:v', SHEET_NS)
+            if value is None:
+                value = cell.find('s:is/s:t', SHEET_NS)
+            cells[column] = value.text
+        rows.append(cells)
+    return rows
+
+
+@mock.patch('notifications.views.EXPORT_CHUNK_SIZE', 2)
+class PayrollRegisterExportTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_staffuser(
+            email='payroll@gmail.com', password='password123', first_name='Pay', last_name='Master'
+        )
+        create_employees(5)
+        self.client.force_login(self.staff)
+        # Six active employees, three export chunks
+        self.employees = list(User.objects.filter(active=True).order_by('pk'))
+        self.breakdowns = calculate_payroll_breakdowns(self.employees, WEEK_START, WEEK_END)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('notifications:export_payroll_register'), {
+            'format': export_format, 'start_date': str(WEEK_START), 'end_date': str(WEEK_END),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def assertRowsMatch(self, rows):
+        self.assertEqual([int(row['id']) for row in rows], [employee.pk for employee in self.employees])
+        for row, employee in zip(rows, self.employees):
+            breakdown = self.breakdowns[employee.pk]
+            self.assertEqual(row['name'], employee.get_full_name())
+            self.assertEqual(float(row['regular_hours']), breakdown['regular_hours'])
+            self.assertEqual(float(row['overtime_hours']), breakdown['approved_overtime_hours'])
+            self.assertEqual(Decimal(row['total_earnings']), Decimal(str(breakdown['total_pay'])))
+
+    def test_csv(self):
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('payroll_register_20250303_20250309.csv', response['Content-Disposition'])
+
+        reader = csv.reader(io.StringIO(content.decode('utf-8')))
+        self.assertEqual(next(reader), PAYROLL_REGISTER_COLUMNS)
+        self.assertRowsMatch([dict(zip(PAYROLL_REGISTER_COLUMNS, row)) for row in reader])
+
+    def test_xlsx(self):
+        response, content = self.export('xlsx')
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        header, *rows = read_xlsx_rows(content)
+        self.assertEqual(list(header.values()), PAYROLL_REGISTER_COLUMNS)
+        self.assertRowsMatch([{header[letter]: value for letter, value in row.items()} for row in rows])
+
+    async def test_asgi_response_is_streamed(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('notifications:export_payroll_register'), {
+            'format': 'csv', 'start_date': str(WEEK_START), 'end_date': str(WEEK_END),
+        })
+        self.assertEqual(response.status_code, 200)
+        # An async iterator is sent chunk by chunk instead of being loaded into a list first
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # Header plus one line per employee
+        self.assertEqual(len(chunks), len(self.employees) + 1)
+        reader = csv.reader(io.StringIO(b''.join(chunks).decode('utf-8')))
+        self.assertEqual(next(reader), PAYROLL_REGISTER_COLUMNS)
+        self.assertRowsMatch([dict(zip(PAYROLL_REGISTER_COLUMNS, row)) for row in reader])
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get(reverse('notifications:export_payroll_register'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
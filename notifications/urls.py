@@ -4,7 +4,10 @@ from .views import (
     PaycheckNotificationDetailView,
     PaycheckNotificationCreateView,
     PaycheckDashboardView,
+    BulkPaycheckNotificationView,
     get_employee_payroll_data,
+    get_employees_payroll_data,
+    export_payroll_register,
 )
 
 app_name = 'notifications'
@@ -14,5 +17,8 @@ urlpatterns = [
     path('create/', PaycheckNotificationCreateView.as_view(), name='create_notification'),
     path('<int:pk>/', PaycheckNotificationDetailView.as_view(), name='notification_detail'),
     path('dashboard/', PaycheckDashboardView.as_view(), name='paycheck_dashboard'),
+    path('bulk-send/', BulkPaycheckNotificationView.as_view(), name='bulk_send_paycheck'),
     path('ajax/employee/<int:employee_id>/payroll/', get_employee_payroll_data, name='get_employee_payroll_data'),
+    path('ajax/payroll/', get_employees_payroll_data, name='get_employees_payroll_data'),
+    path('export/payroll-register/', export_payroll_register, name='export_payroll_register'),
 ]
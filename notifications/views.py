@@ -1,12 +1,21 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import admin
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
 from django.urls import reverse_lazy
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from .models import PaycheckNotification
+from .exports import EXPORT_CHUNK_SIZE, PAYROLL_REGISTER_COLUMNS, as_async_stream, stream_csv, stream_xlsx
 from accounts.models import Employee
+from accounts.payroll import calculate_payroll_breakdowns, get_week_range, get_weekly_payroll_breakdowns, is_payroll_week
 from django import forms
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -65,6 +74,12 @@ class PaycheckNotificationCreateView(LoginRequiredMixin, UserPassesTestMixin, Cr
         # Render the form with errors
         return self.render_to_response(self.get_context_data(form=form))
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The page prefetches payroll in batches the batch endpoint accepts
+        context['payroll_batch_size'] = MAX_BATCH_EMPLOYEES
+        return context
+
 
 class PaycheckDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     template_name = 'notifications/paycheck_dashboard.html'
@@ -80,14 +95,15 @@ class PaycheckDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateVie
         # Get all active employees with their payroll breakdown
         active_employees = Employee.objects.filter(active=True).order_by('first_name', 'last_name')
 
-        # Calculate payroll breakdown for each employee
+        # This week's payroll comes from the summary table, one row per employee
+        breakdowns = get_weekly_payroll_breakdowns(active_employees)
         employees_with_payroll = []
         for employee in active_employees:
-            payroll_breakdown = employee.calculate_payroll_breakdown()
+            payroll_breakdown = breakdowns[employee.pk]
             employees_with_payroll.append({
                 'employee': employee,
                 'breakdown': payroll_breakdown,
-                'suggested_amount': employee.get_suggested_paycheck_amount()
+                'suggested_amount': payroll_breakdown['total_pay']
             })
 
         context.update({
@@ -98,6 +114,177 @@ class PaycheckDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateVie
         return context
 
 
+class BulkPaycheckNotificationView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    template_name = 'admin/bulk_send_paycheck.html'
+
+    def test_func(self):
+        # Only staff/admin can send notifications
+        return self.request.user.is_staff or self.request.user.is_superuser or self.request.user.admin
+
+    def get_period(self, data):
+        """Read week_start_date/week_end_date from the request, defaulting to the current week"""
+        start_date = data.get('week_start_date')
+        end_date = data.get('week_end_date')
+        if start_date and end_date:
+            return (
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+            )
+        return get_week_range()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        start_date, end_date = self.get_period(self.request.GET)
+        context.update(admin.site.each_context(self.request))
+        context.update({
+            'title': 'Send Bulk Paycheck Notifications',
+            'employees': Employee.objects.filter(staff=False, admin=False, active=True).order_by('first_name', 'last_name'),
+            'week_start_date': start_date,
+            'week_end_date': end_date,
+        })
+        return context
+
+    def post(self, request, *args, **kwargs):
+        employee_ids = request.POST.getlist('employee_ids')
+        notification_type = request.POST.get('notification_type') or 'paycheck'
+        message = request.POST.get('message') or PaycheckNotification._meta.get_field('message').default
+
+        try:
+            start_date, end_date = self.get_period(request.POST)
+            amount = Decimal(request.POST['amount']) if request.POST.get('amount') else None
+        except (ValueError, InvalidOperation):
+            messages.error(request, 'Please enter a valid period and amount.')
+            return redirect('notifications:bulk_send_paycheck')
+
+        employees = list(Employee.objects.filter(pk__in=employee_ids, staff=False, admin=False, active=True))
+        if not employees:
+            messages.error(request, 'Select at least one employee.')
+            return redirect('notifications:bulk_send_paycheck')
+
+        # One query finds every employee that already has this notification for the period
+        already_sent = set(PaycheckNotification.objects.filter(
+            employee__in=employees,
+            week_start_date=start_date,
+            week_end_date=end_date,
+            notification_type=notification_type,
+        ).values_list('employee_id', flat=True))
+        recipients = [employee for employee in employees if employee.pk not in already_sent]
+
+        if amount is None and recipients:
+            if is_payroll_week(start_date, end_date):
+                breakdowns = get_weekly_payroll_breakdowns(recipients, start_date)
+            else:
+                breakdowns = calculate_payroll_breakdowns(recipients, start_date, end_date)
+
+        # One timestamp for the whole send, so the rows it inserted can be told apart
+        sent_at = timezone.now()
+        notifications = [
+            PaycheckNotification(
+                employee=employee,
+                message=message,
+                amount=amount if amount is not None else Decimal(str(breakdowns[employee.pk]['total_pay'])),
+                sent_at=sent_at,
+                sent_by=request.user,
+                notification_type=notification_type,
+                week_start_date=start_date,
+                week_end_date=end_date,
+            )
+            for employee in recipients
+        ]
+        sent = 0
+        if notifications:
+            # ignore_conflicts covers a concurrent send that slipped in after the check
+            # above; those rows are not returned, so count what this send inserted
+            PaycheckNotification.objects.bulk_create(notifications, batch_size=500, ignore_conflicts=True)
+            sent = PaycheckNotification.objects.filter(
+                employee__in=recipients,
+                week_start_date=start_date,
+                week_end_date=end_date,
+                notification_type=notification_type,
+                sent_at=sent_at,
+                sent_by=request.user,
+            ).count()
+        skipped = len(already_sent) + len(notifications) - sent
+
+        if sent:
+            messages.success(request, f'Sent {sent} notification(s) for {start_date} to {end_date}.')
+        if skipped:
+            messages.warning(request, f'Skipped {skipped} employee(s) who were already notified for this period.')
+        return redirect('notifications:bulk_send_paycheck')
+
+
+def get_payroll_period(request):
+    """Read start_date/end_date from the query string, defaulting to the current week"""
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+
+    if start_date and end_date:
+        return (
+            datetime.strptime(start_date, '%Y-%m-%d').date(),
+            datetime.strptime(end_date, '%Y-%m-%d').date(),
+        )
+    return get_week_range()
+
+
+def build_payroll_response(employee, breakdown, pending_overtime, paycheck_already_sent, start_date, end_date):
+    """JSON payload describing one employee's payroll for a period"""
+    return {
+        'id': employee.id,
+        'name': employee.get_full_name(),
+        'position': employee.position,
+        'department': employee.department,
+        'photo': employee.photo.url if employee.photo else None,
+        'hourly_rate': str(breakdown['hourly_rate']),
+        'overtime_rate': str(breakdown['overtime_rate']),
+        'weekly_hours': str(employee.weekly_hours),
+        'regular_hours': breakdown['regular_hours'],
+        'overtime_hours': breakdown['approved_overtime_hours'],  # Only approved overtime
+        'total_overtime_hours': breakdown['total_overtime_hours'],  # All overtime for reference
+        'unapproved_overtime_hours': breakdown['unapproved_overtime_hours'],
+        'pending_overtime_hours': float(pending_overtime),
+        'regular_pay': str(breakdown['regular_pay']),
+        'overtime_pay': str(breakdown['overtime_pay']),  # Only from approved overtime
+        'total_earnings': str(breakdown['total_pay']),  # Only includes approved overtime
+        'period_start': start_date.strftime('%Y-%m-%d'),
+        'period_end': end_date.strftime('%Y-%m-%d'),
+        'paycheck_already_sent': paycheck_already_sent,
+        'has_pending_overtime': pending_overtime > 0,
+    }
+
+
+def build_payroll_responses(employees, start_date, end_date):
+    """build_payroll_response for a list of employees using a fixed number of queries"""
+    from attendance.models import Attendance
+
+    if is_payroll_week(start_date, end_date):
+        breakdowns = get_weekly_payroll_breakdowns(employees, start_date)
+    else:
+        breakdowns = calculate_payroll_breakdowns(employees, start_date, end_date)
+
+    pending_by_employee = dict(Attendance.objects.filter(
+        employee__in=employees,
+        date__range=[start_date, end_date],
+        overtime_hours__gt=0,
+        overtime_approved=False,
+        overtime_rejected=False,
+    ).values_list('employee_id').annotate(pending=Sum('overtime_hours')).order_by())
+    paid_ids = set(PaycheckNotification.objects.filter(
+        employee__in=employees, sent_at__date__range=[start_date, end_date]
+    ).values_list('employee_id', flat=True))
+
+    return [
+        build_payroll_response(
+            employee,
+            breakdowns[employee.pk],
+            pending_by_employee.get(employee.pk, 0),
+            employee.pk in paid_ids,
+            start_date,
+            end_date,
+        )
+        for employee in employees
+    ]
+
+
 @login_required
 @user_passes_test(lambda u: u.is_staff or u.is_superuser or u.admin)
 def get_employee_payroll_data(request, employee_id):
@@ -106,49 +293,29 @@ def get_employee_payroll_data(request, employee_id):
         employee = get_object_or_404(Employee, id=employee_id, active=True)
 
         # Get date range from request or default to current week
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
+        start_date, end_date = get_payroll_period(request)
 
-        if start_date and end_date:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        # Whole weeks are served from the maintained summary table
+        summary = None
+        if is_payroll_week(start_date, end_date):
+            summary = employee.get_weekly_payroll_summary(start_date)
+
+        if summary is not None:
+            breakdown = summary.to_breakdown(employee)
+            pending_overtime = summary.pending_overtime_hours
         else:
-            # Default to current week
-            today = timezone.now().date()
-            start_date = today - timedelta(days=today.weekday())
-            end_date = start_date + timedelta(days=6)
+            # Get payroll breakdown with overtime approval logic
+            breakdown = employee.calculate_payroll_breakdown(start_date, end_date)
 
-        # Get payroll breakdown with overtime approval logic
-        breakdown = employee.calculate_payroll_breakdown(start_date, end_date)
+            # Get pending overtime hours
+            pending_overtime = employee.get_pending_overtime_hours(start_date, end_date)
 
         # Check if paycheck already sent for this period
         paycheck_already_sent = employee.has_paycheck_sent_for_period(start_date, end_date)
 
-        # Get pending overtime hours
-        pending_overtime = employee.get_pending_overtime_hours(start_date, end_date)
-
-        response_data = {
-            'id': employee.id,
-            'name': employee.get_full_name(),
-            'position': employee.position,
-            'department': employee.department,
-            'photo': employee.photo.url if employee.photo else None,
-            'hourly_rate': str(breakdown['hourly_rate']),
-            'overtime_rate': str(breakdown['overtime_rate']),
-            'weekly_hours': str(employee.weekly_hours),
-            'regular_hours': breakdown['regular_hours'],
-            'overtime_hours': breakdown['approved_overtime_hours'],  # Only approved overtime
-            'total_overtime_hours': breakdown['total_overtime_hours'],  # All overtime for reference
-            'unapproved_overtime_hours': breakdown['unapproved_overtime_hours'],
-            'pending_overtime_hours': float(pending_overtime),
-            'regular_pay': str(breakdown['regular_pay']),
-            'overtime_pay': str(breakdown['overtime_pay']),  # Only from approved overtime
-            'total_earnings': str(breakdown['total_pay']),  # Only includes approved overtime
-            'period_start': start_date.strftime('%Y-%m-%d'),
-            'period_end': end_date.strftime('%Y-%m-%d'),
-            'paycheck_already_sent': paycheck_already_sent,
-            'has_pending_overtime': pending_overtime > 0,
-        }
+        response_data = build_payroll_response(
+            employee, breakdown, pending_overtime, paycheck_already_sent, start_date, end_date
+        )
 
         return JsonResponse(response_data)
 
@@ -158,3 +325,113 @@ def get_employee_payroll_data(request, employee_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+MAX_BATCH_EMPLOYEES = 500
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff or u.is_superuser or u.admin)
+def get_employees_payroll_data(request):
+    """
+    Batch version of get_employee_payroll_data.
+
+    Takes ?ids=1,2,3 (or repeated employee_ids) plus the optional period and
+    answers with every breakdown in one response. ETag/Last-Modified come
+    from the newest attendance or paycheck change for those employees, so
+    repeated polls get a 304 until something changes.
+    """
+    from attendance.models import Attendance
+
+    try:
+        raw_ids = request.GET.getlist('employee_ids') or request.GET.get('ids', '').split(',')
+        employee_ids = {int(value) for value in raw_ids if value.strip()}
+        start_date, end_date = get_payroll_period(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid employee ids or period'}, status=400)
+
+    if not employee_ids:
+        return JsonResponse({'error': 'No employee ids given'}, status=400)
+    if len(employee_ids) > MAX_BATCH_EMPLOYEES:
+        return JsonResponse({'error': f'At most {MAX_BATCH_EMPLOYEES} employees per request'}, status=400)
+
+    employees = list(Employee.objects.filter(pk__in=employee_ids, active=True).order_by('pk'))
+
+    # Validators: newest change to anything the payload is built from
+    attendance_state = Attendance.objects.filter(
+        employee__in=employees, date__range=[start_date, end_date]
+    ).aggregate(last_change=Max('updated_at'), rows=Count('pk'))
+    paycheck_state = PaycheckNotification.objects.filter(
+        employee__in=employees, sent_at__date__range=[start_date, end_date]
+    ).aggregate(last_change=Max('sent_at'), rows=Count('pk'))
+
+    profiles = [
+        (e.pk, e.first_name, e.last_name, e.position, e.department, str(e.photo),
+         e.hourly_rate, e.overtime_rate, e.weekly_hours)
+        for e in employees
+    ]
+    etag = hashlib.md5(repr((
+        start_date, end_date, profiles,
+        attendance_state['last_change'], attendance_state['rows'],
+        paycheck_state['last_change'], paycheck_state['rows'],
+    )).encode()).hexdigest()
+    changes = [value for value in (attendance_state['last_change'], paycheck_state['last_change']) if value]
+    last_modified = int(max(changes).timestamp()) if changes else None
+
+    response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if response is None:
+        response = JsonResponse({
+            'period_start': start_date.strftime('%Y-%m-%d'),
+            'period_end': end_date.strftime('%Y-%m-%d'),
+            'employees': build_payroll_responses(employees, start_date, end_date),
+            'missing_ids': sorted(employee_ids - {employee.pk for employee in employees}),
+        })
+
+    response.headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # Let browsers revalidate instead of reusing a stale payroll
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff or u.is_superuser or u.admin)
+def export_payroll_register(request):
+    """
+    Stream the payroll register for every active employee as CSV or XLSX.
+
+    Employees are walked in primary-key chunks and each chunk's rows are
+    written as soon as they are computed, so memory stays flat and the
+    header goes out before any payroll query runs. ASGI requests get an
+    async iterator so the server streams it instead of buffering it.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return JsonResponse({'error': 'format must be csv or xlsx'}, status=400)
+    try:
+        start_date, end_date = get_payroll_period(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid period'}, status=400)
+
+    def payroll_rows():
+        employees = Employee.objects.filter(active=True).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(employees.filter(pk__gt=last_pk)[:EXPORT_CHUNK_SIZE])
+            if not chunk:
+                return
+            yield from build_payroll_responses(chunk, start_date, end_date)
+            last_pk = chunk[-1].pk
+
+    filename = f"payroll_register_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format}"
+    if export_format == 'xlsx':
+        content = stream_xlsx(PAYROLL_REGISTER_COLUMNS, payroll_rows())
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        content = stream_csv(PAYROLL_REGISTER_COLUMNS, payroll_rows())
+        content_type = 'text/csv'
+    if isinstance(request, ASGIRequest):
+        content = as_async_stream(content)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -2,5 +2,6 @@
 # exit on error
 set -o errexit
 
-# Start the application
-gunicorn Employee_System.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+# Start the application (HTTP and /ws/). Set REDIS_URL when more than one
+# process runs, so presence broadcasts share one channel layer
+daphne -b 0.0.0.0 -p $PORT Employee_System.asgi:application
\ No newline at end of file